@@ -11,6 +11,9 @@ LINES_DELETED = 'lines_deleted'
 # table recognition max time default value
 TABLE_MAX_TIME_VALUE = 400
 
+# page image cache max bytes default value, about 20 pages of A4 rendered at 200 dpi
+PAGE_IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 # pp_table_result_max_length
 TABLE_MAX_LEN = 480
 
@@ -53,6 +56,18 @@ class MODEL_NAME:
     RAPID_TABLE = 'rapid_table'
 
 
+class PRECISION_MODE:
+    # the default of each model, layoutreader runs in bf16 on cuda devices supporting it, the others in fp32
+    AUTO = 'auto'
+
+    FP32 = 'fp32'
+
+    BF16 = 'bf16'
+
+    # dynamic int8 quantization of the linear layers, cpu only
+    INT8_DYNAMIC = 'int8-dynamic'
+
+
 PARSE_TYPE_TXT = 'txt'
 PARSE_TYPE_OCR = 'ocr'
 
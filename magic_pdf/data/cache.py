@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+from magic_pdf.config.constants import PAGE_IMAGE_CACHE_MAX_BYTES
+
+
+class PageImageCache:
+    def __init__(self, max_bytes: int = PAGE_IMAGE_CACHE_MAX_BYTES):
+        """LRU cache of rendered page images bounded by the total size of the
+        cached arrays.
+
+        Args:
+            max_bytes (int, optional): the byte budget of the cache, 0 disables the cache. Defaults to PAGE_IMAGE_CACHE_MAX_BYTES.
+        """
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        """The bytes currently held by the cache."""
+        return self._nbytes
+
+    def get(self, key):
+        """Get the cached image dict and mark it as recently used.
+
+        Args:
+            key (Hashable): the cache key
+
+        Returns:
+            dict | None: a copy of the cached image dict, None if not cached. The image is shared by all the
+                callers and is read-only
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return dict(self._entries[key][0])
+
+    def put(self, key, img_dict: dict):
+        """Cache the image dict, the least recently used entries are evicted
+        until the cache fits in the byte budget. The cached image is made
+        read-only, so that no caller modifies the page seen by the others.
+
+        Args:
+            key (Hashable): the cache key
+            img_dict (dict): {'img': np.ndarray, 'width': int, 'height': int}
+        """
+        size = img_dict['img'].nbytes
+        if size > self._max_bytes:
+            return
+        img_dict['img'].setflags(write=False)
+        img_dict = dict(img_dict)
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (img_dict, size)
+            self._nbytes += size
+            while self._nbytes > self._max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_size
+
+    def clear(self):
+        """Drop all cached images."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
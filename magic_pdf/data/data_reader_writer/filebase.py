@@ -1,3 +1,4 @@
+import mmap
 import os
 
 from magic_pdf.data.data_reader_writer.base import DataReader, DataWriter
@@ -23,9 +24,7 @@ class FileBasedDataReader(DataReader):
         Returns:
             bytes: the content of file
         """
-        fn_path = path
-        if not os.path.isabs(fn_path) and len(self._parent_dir) > 0:
-            fn_path = os.path.join(self._parent_dir, path)
+        fn_path = self._abs_path(path)
 
         with open(fn_path, 'rb') as f:
             f.seek(offset)
@@ -34,6 +33,29 @@ class FileBasedDataReader(DataReader):
             else:
                 return f.read(limit)
 
+    def read_mmap(self, path: str) -> memoryview:
+        """Read the file through a read-only memory map, the content stays in
+        the page cache instead of the python heap.
+
+        Args:
+            path (str): the path of file, if the path is relative path, it will be joined with parent_dir.
+
+        Returns:
+            memoryview: the content of file, the file is unmapped when the memoryview is released
+        """
+        fn_path = self._abs_path(path)
+
+        with open(fn_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'')
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _abs_path(self, path: str) -> str:
+        fn_path = path
+        if not os.path.isabs(fn_path) and len(self._parent_dir) > 0:
+            fn_path = os.path.join(self._parent_dir, path)
+        return fn_path
+
 
 class FileBasedDataWriter(DataWriter):
     def __init__(self, parent_dir: str = '') -> None:
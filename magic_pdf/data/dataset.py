@@ -4,9 +4,12 @@ from typing import Callable, Iterator
 
 import fitz
 
+from magic_pdf.config.constants import PAGE_IMAGE_CACHE_MAX_BYTES
 from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.data.cache import PageImageCache
+from magic_pdf.data.data_reader_writer import FileBasedDataReader
 from magic_pdf.data.schemas import PageInfo
-from magic_pdf.data.utils import fitz_doc_to_image
+from magic_pdf.data.utils import fitz_doc_image_size, fitz_doc_to_image
 from magic_pdf.filter import classify
 
 
@@ -16,6 +19,16 @@ class PageableData(ABC):
         """Transform data to image."""
         pass
 
+    @abstractmethod
+    def get_image_size(self) -> tuple:
+        """Get the size of the image returned by `get_image` without
+        rendering it.
+
+        Returns:
+            tuple: (width, height)
+        """
+        pass
+
     @abstractmethod
     def get_doc(self) -> fitz.Page:
         """Get the pymudoc page."""
@@ -133,16 +146,19 @@ class Dataset(ABC):
 
 
 class PymuDocDataset(Dataset):
-    def __init__(self, bits: bytes):
+    def __init__(self, bits: bytes | memoryview, image_cache_bytes: int = PAGE_IMAGE_CACHE_MAX_BYTES):
         """Initialize the dataset, which wraps the pymudoc documents.
 
         Args:
-            bits (bytes): the bytes of the pdf
+            bits (bytes | memoryview): the bytes of the pdf, the memoryview returned by `FileBasedDataReader.read_mmap` is opened without copying
+            image_cache_bytes (int, optional): the byte budget of the rendered page image cache. Defaults to PAGE_IMAGE_CACHE_MAX_BYTES.
         """
         self._raw_fitz = fitz.open('pdf', bits)
-        self._records = [Doc(v) for v in self._raw_fitz]
+        self._image_cache = PageImageCache(image_cache_bytes)
+        self._records = [Doc(v, self._image_cache) for v in self._raw_fitz]
         self._data_bits = bits
         self._raw_data = bits
+        self._image_cache_bytes = image_cache_bytes
 
     def __len__(self) -> int:
         """The page number of the pdf."""
@@ -210,21 +226,69 @@ class PymuDocDataset(Dataset):
     def clone(self):
         """clone this dataset
         """
-        return PymuDocDataset(self._raw_data)
+        return PymuDocDataset(self._raw_data, self._image_cache_bytes)
+
+
+class PymuDocFileDataset(PymuDocDataset):
+    def __init__(self, file_path: str, image_cache_bytes: int = PAGE_IMAGE_CACHE_MAX_BYTES):
+        """Initialize the dataset from a pdf file, the pages are read from the
+        file by pymudoc on demand instead of holding the whole file in memory.
+
+        Args:
+            file_path (str): the path of the pdf file
+            image_cache_bytes (int, optional): the byte budget of the rendered page image cache. Defaults to PAGE_IMAGE_CACHE_MAX_BYTES.
+        """
+        self._file_path = file_path
+        self._raw_fitz = fitz.open(file_path, filetype='pdf')
+        self._image_cache = PageImageCache(image_cache_bytes)
+        self._records = [Doc(v, self._image_cache) for v in self._raw_fitz]
+        self._data_bits = None
+        self._image_cache_bytes = image_cache_bytes
+
+    @property
+    def file_path(self) -> str:
+        """The path of the pdf file."""
+        return self._file_path
+
+    def data_bits(self) -> memoryview:
+        """The pdf bits, the file is memory-mapped on the first call.
+
+        Returns:
+            memoryview: the read-only content of the pdf file
+        """
+        if self._data_bits is None:
+            self._data_bits = FileBasedDataReader().read_mmap(self._file_path)
+        return self._data_bits
+
+    def classify(self) -> SupportedPdfParseMethod:
+        """classify the dataset
+
+        Returns:
+            SupportedPdfParseMethod: _description_
+        """
+        return classify(self.data_bits())
+
+    def clone(self):
+        """clone this dataset
+        """
+        return PymuDocFileDataset(self._file_path, self._image_cache_bytes)
 
 
 class ImageDataset(Dataset):
-    def __init__(self, bits: bytes):
+    def __init__(self, bits: bytes, image_cache_bytes: int = PAGE_IMAGE_CACHE_MAX_BYTES):
         """Initialize the dataset, which wraps the pymudoc documents.
 
         Args:
             bits (bytes): the bytes of the photo which will be converted to pdf first. then converted to pymudoc.
+            image_cache_bytes (int, optional): the byte budget of the rendered page image cache. Defaults to PAGE_IMAGE_CACHE_MAX_BYTES.
         """
         pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
         self._raw_fitz = fitz.open('pdf', pdf_bytes)
-        self._records = [Doc(v) for v in self._raw_fitz]
+        self._image_cache = PageImageCache(image_cache_bytes)
+        self._records = [Doc(v, self._image_cache) for v in self._raw_fitz]
         self._raw_data = bits
         self._data_bits = pdf_bytes
+        self._image_cache_bytes = image_cache_bytes
 
     def __len__(self) -> int:
         """The length of the dataset."""
@@ -291,16 +355,24 @@ class ImageDataset(Dataset):
     def clone(self):
         """clone this dataset
         """
-        return ImageDataset(self._raw_data)
+        return ImageDataset(self._raw_data, self._image_cache_bytes)
 
 class Doc(PageableData):
     """Initialized with pymudoc object."""
 
-    def __init__(self, doc: fitz.Page):
+    def __init__(self, doc: fitz.Page, image_cache: PageImageCache | None = None):
         self._doc = doc
+        self._image_cache = image_cache
+
+    def get_image(self, dpi=200, mode='RGB', max_side=4500):
+        """Return the image info. The page is rendered on the first call, the
+        later calls are served from the image cache of the dataset. The cached
+        image is shared and read-only, copy it before modifying it.
 
-    def get_image(self):
-        """Return the image info.
+        Args:
+            dpi (int, optional): the dpi of the rendered image. Defaults to 200.
+            mode (str, optional): 'RGB' or 'L' (grayscale). Defaults to 'RGB'.
+            max_side (int | None, optional): the page is downscaled to fit in max_side. Defaults to 4500.
 
         Returns:
             dict: {
@@ -309,7 +381,27 @@ class Doc(PageableData):
                 height: int
             }
         """
-        return fitz_doc_to_image(self._doc)
+        if self._image_cache is None:
+            return fitz_doc_to_image(self._doc, dpi=dpi, mode=mode, max_side=max_side)
+        key = (self._doc.number, dpi, mode, max_side)
+        img_dict = self._image_cache.get(key)
+        if img_dict is None:
+            img_dict = fitz_doc_to_image(self._doc, dpi=dpi, mode=mode, max_side=max_side)
+            self._image_cache.put(key, img_dict)
+        return img_dict
+
+    def get_image_size(self, dpi=200, max_side=4500) -> tuple:
+        """Get the size of the image returned by `get_image` without
+        rendering it.
+
+        Args:
+            dpi (int, optional): the dpi of the rendered image. Defaults to 200.
+            max_side (int | None, optional): the page is downscaled to fit in max_side. Defaults to 4500.
+
+        Returns:
+            tuple: (width, height)
+        """
+        return fitz_doc_image_size(self._doc, dpi=dpi, max_side=max_side)
 
     def get_doc(self) -> fitz.Page:
         """Get the pymudoc object.
@@ -0,0 +1,132 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator
+
+import fitz
+import numpy as np
+
+from magic_pdf.data.utils import fitz_doc_to_pixmap
+
+# the pdf document opened by each worker process, PyMuPDF objects can not be shared between processes or threads
+_worker_doc = None
+
+
+def _init_worker(pdf: bytes | str):
+    global _worker_doc
+    if isinstance(pdf, str):
+        _worker_doc = fitz.open(pdf)
+    else:
+        _worker_doc = fitz.open('pdf', pdf)
+
+
+def _render_page(page_id: int, dpi: int, mode: str, max_side: int | None) -> tuple:
+    """Render the page in worker process and put the pixels in a shared memory
+    block, the block is unlinked by the parent process."""
+    pm = fitz_doc_to_pixmap(_worker_doc[page_id], dpi=dpi, mode=mode, max_side=max_side)
+    samples = pm.samples_mv
+    shm = shared_memory.SharedMemory(create=True, size=max(len(samples), 1))
+    shm.buf[:len(samples)] = samples
+    shm_name = shm.name
+    shm.close()
+    return shm_name, pm.width, pm.height, pm.n
+
+
+def _take_shared_image(render_res: tuple) -> dict:
+    shm_name, width, height, n = render_res
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shape = (height, width) if n == 1 else (height, width, n)
+        view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        img = view.copy()
+        del view
+    finally:
+        shm.close()
+        shm.unlink()
+    return {'img': img, 'width': width, 'height': height}
+
+
+class PageRasterizer:
+    def __init__(
+        self,
+        pdf: bytes | memoryview | str,
+        workers: int = 2,
+        dpi: int = 200,
+        mode: str = 'RGB',
+        max_side: int | None = 4500,
+        prefetch: int | None = None,
+    ):
+        """Render pdf pages in a pool of worker processes.
+
+        Args:
+            pdf (bytes | memoryview | str): the bytes or the path of the pdf, each worker opens its own document from them,
+                pass the path of a file-backed pdf to avoid sending the bytes to every worker
+            workers (int, optional): the number of worker processes. Defaults to 2.
+            dpi (int, optional): the dpi of the rendered images. Defaults to 200.
+            mode (str, optional): 'RGB' or 'L' (grayscale). Defaults to 'RGB'.
+            max_side (int | None, optional): the pages are downscaled to fit in max_side. Defaults to 4500.
+            prefetch (int | None, optional): the max number of pages rendered ahead of the consumer. Defaults to twice the number of workers.
+        """
+        if not isinstance(pdf, (bytes, str)):
+            # memoryview (e.g. a memory-mapped file) can not be pickled to the workers
+            pdf = bytes(pdf)
+        self._render_args = (dpi, mode, max_side)
+        self._prefetch = prefetch if prefetch is not None and prefetch > 0 else workers * 2
+        # spawn the workers, forking a process which has loaded the models is not safe
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(pdf,),
+        )
+
+    def imap(self, page_ids: Iterable[int], render_options: dict | None = None) -> Iterator[dict]:
+        """Yield the images of pages in the order of page_ids, while the pool
+        renders the following pages.
+
+        Args:
+            page_ids (Iterable[int]): the index of pages to render
+            render_options (dict | None, optional): {page_id: (dpi, max_side)} of the pages rendered with their own
+                dpi and max_side. Defaults to None, all pages use the ones of the rasterizer.
+
+        Yields:
+            dict: {'img': numpy array, 'width': width, 'height': height }
+        """
+        def submit(page_id):
+            dpi, mode, max_side = self._render_args
+            if render_options is not None and page_id in render_options:
+                dpi, max_side = render_options[page_id]
+            return self._executor.submit(_render_page, page_id, dpi, mode, max_side)
+
+        page_ids = iter(page_ids)
+        pending = deque()
+        try:
+            for page_id in page_ids:
+                pending.append(submit(page_id))
+                if len(pending) >= self._prefetch:
+                    break
+            while pending:
+                img_dict = _take_shared_image(pending.popleft().result())
+                next_page_id = next(page_ids, None)
+                if next_page_id is not None:
+                    pending.append(submit(next_page_id))
+                yield img_dict
+        finally:
+            # release the shared memory of the pages rendered but not consumed
+            for future in pending:
+                if future.cancel():
+                    continue
+                try:
+                    _take_shared_image(future.result())
+                except Exception:  # noqa
+                    pass
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -5,7 +5,8 @@ from pathlib import Path
 from magic_pdf.config.exceptions import EmptyData, InvalidParams
 from magic_pdf.data.data_reader_writer import (FileBasedDataReader,
                                                MultiBucketS3DataReader)
-from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
+from magic_pdf.data.dataset import (ImageDataset, PymuDocDataset,
+                                    PymuDocFileDataset)
 
 
 def read_jsonl(
@@ -25,7 +26,7 @@ def read_jsonl(
     Returns:
         list[PymuDocDataset]: each line in the jsonl file will be converted to a PymuDocDataset
     """
-    bits_arr = []
+    datasets = []
     if s3_path_or_local.startswith('s3://'):
         if s3_client is None:
             raise InvalidParams('s3_client is required when s3_path is provided')
@@ -42,10 +43,10 @@ def read_jsonl(
         if pdf_path.startswith('s3://'):
             if s3_client is None:
                 raise InvalidParams('s3_client is required when s3_path is provided')
-            bits_arr.append(s3_client.read(pdf_path))
+            datasets.append(PymuDocDataset(s3_client.read(pdf_path)))
         else:
-            bits_arr.append(FileBasedDataReader('').read(pdf_path))
-    return [PymuDocDataset(bits) for bits in bits_arr]
+            datasets.append(PymuDocFileDataset(pdf_path))
+    return datasets
 
 
 def read_local_pdfs(path: str) -> list[PymuDocDataset]:
@@ -55,18 +56,15 @@ def read_local_pdfs(path: str) -> list[PymuDocDataset]:
         path (str): pdf file path or directory that contains pdf files
 
     Returns:
-        list[PymuDocDataset]: each pdf file will converted to a PymuDocDataset
+        list[PymuDocDataset]: each pdf file will converted to a PymuDocFileDataset, which reads the file on demand
     """
     if os.path.isdir(path):
-        reader = FileBasedDataReader(path)
         return [
-            PymuDocDataset(reader.read(doc_path.name))
+            PymuDocFileDataset(str(doc_path))
             for doc_path in Path(path).glob('*.pdf')
         ]
     else:
-        reader = FileBasedDataReader()
-        bits = reader.read(path)
-        return [PymuDocDataset(bits)]
+        return [PymuDocFileDataset(path)]
 
 
 def read_local_images(path: str, suffixes: list[str]) -> list[ImageDataset]:
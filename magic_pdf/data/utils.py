@@ -1,32 +1,108 @@
-
 import fitz
 import numpy as np
 
-from magic_pdf.utils.annotations import ImportPIL
+SUPPORTED_IMAGE_MODES = {
+    'RGB': fitz.csRGB,
+    'L': fitz.csGRAY,
+}
 
 
-@ImportPIL
-def fitz_doc_to_image(doc, dpi=200) -> dict:
-    """Convert fitz.Document to image, Then convert the image to numpy array.
+class _PixmapArrayInterface:
+    """Expose the samples of a pixmap to numpy without copying, the pixmap is
+    kept alive as long as the array built on it."""
+
+    def __init__(self, pm: fitz.Pixmap):
+        self._pm = pm
+        shape = (pm.height, pm.width) if pm.n == 1 else (pm.height, pm.width, pm.n)
+        self.__array_interface__ = {
+            'shape': shape,
+            'typestr': '|u1',
+            'data': (pm.samples_ptr, False),
+            'strides': None if pm.n == 1 else (pm.stride, pm.n, 1),
+            'version': 3,
+        }
+
+
+def fitz_doc_to_matrix(doc, dpi=200, max_side=4500) -> fitz.Matrix:
+    """Get the matrix used to render the page at dpi, the page is downscaled
+    to fit in max_side if the rendered image would be larger.
 
     Args:
         doc (_type_): pymudoc page
         dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        max_side (int | None, optional): the max width and height of the rendered image, None means no limit. Defaults to 4500.
 
     Returns:
-        dict:  {'img': numpy array, 'width': width, 'height': height }
+        fitz.Matrix: the render matrix
+    """
+    zoom = dpi / 72
+    irect = (doc.rect * fitz.Matrix(zoom, zoom)).irect
+    if max_side and (irect.width > max_side or irect.height > max_side):
+        zoom = max_side / max(doc.rect.width, doc.rect.height)
+    return fitz.Matrix(zoom, zoom)
+
+
+def fitz_doc_to_pixmap(doc, dpi=200, mode='RGB', max_side=4500) -> fitz.Pixmap:
+    """Render fitz.Page to a pixmap.
+
+    Args:
+        doc (_type_): pymudoc page
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        mode (str, optional): the colorspace of the pixmap, 'RGB' or 'L' (grayscale). Defaults to 'RGB'.
+        max_side (int | None, optional): the max width and height of the rendered image, None means no limit. Defaults to 4500.
+
+    Returns:
+        fitz.Pixmap: the pixmap without alpha channel
+    """
+    if mode not in SUPPORTED_IMAGE_MODES:
+        raise ValueError(f'mode: {mode} is not supported.')
+    mat = fitz_doc_to_matrix(doc, dpi=dpi, max_side=max_side)
+    return doc.get_pixmap(matrix=mat, colorspace=SUPPORTED_IMAGE_MODES[mode], alpha=False)
+
+
+def pixmap_to_ndarray(pm: fitz.Pixmap) -> np.ndarray:
+    """Wrap the samples of the pixmap as numpy array without copying.
+
+    Args:
+        pm (fitz.Pixmap): the pixmap
+
+    Returns:
+        np.ndarray: (height, width, n) array, (height, width) for single channel pixmap
     """
-    from PIL import Image
-    mat = fitz.Matrix(dpi / 72, dpi / 72)
-    pm = doc.get_pixmap(matrix=mat, alpha=False)
+    return np.asarray(_PixmapArrayInterface(pm))
+
+
+def fitz_doc_to_image(doc, dpi=200, mode='RGB', max_side=4500) -> dict:
+    """Convert fitz.Document to image, Then convert the image to numpy array.
 
-    # If the width or height exceeds 4500 after scaling, do not scale further.
-    if pm.width > 4500 or pm.height > 4500:
-        pm = doc.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+    Args:
+        doc (_type_): pymudoc page
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        mode (str, optional): 'RGB' or 'L', grayscale images take a third of the memory. Defaults to 'RGB'.
+        max_side (int | None, optional): the max width and height of the image, None means no limit. Defaults to 4500.
 
-    img = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
-    img = np.array(img)
+    Returns:
+        dict:  {'img': numpy array, 'width': width, 'height': height }
+    """
+    pm = fitz_doc_to_pixmap(doc, dpi=dpi, mode=mode, max_side=max_side)
+    img = pixmap_to_ndarray(pm)
 
     img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
 
     return img_dict
+
+
+def fitz_doc_image_size(doc, dpi=200, max_side=4500) -> tuple:
+    """Get the size of the image `fitz_doc_to_image` would render, without
+    rendering the page.
+
+    Args:
+        doc (_type_): pymudoc page
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        max_side (int | None, optional): the max width and height of the image, None means no limit. Defaults to 4500.
+
+    Returns:
+        tuple: (width, height)
+    """
+    irect = (doc.rect * fitz_doc_to_matrix(doc, dpi=dpi, max_side=max_side)).irect
+    return irect.width, irect.height
@@ -1,10 +1,234 @@
 # Copyright (c) Opendatalab. All rights reserved.
-import torch
 import gc
+import os
+import threading
+import time
+from typing import Callable
+
+from loguru import logger
 
 
 def clean_memory():
-    if torch.cuda.is_available():
+    try:
+        import torch
+    except ImportError:
+        torch = None
+    if torch is not None and torch.cuda.is_available():
         torch.cuda.empty_cache()
         torch.cuda.ipc_collect()
-    gc.collect()
\ No newline at end of file
+    gc.collect()
+
+
+def get_process_rss() -> int:
+    """Get the resident memory of the current process in bytes, 0 if it can
+    not be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def get_physical_memory() -> int:
+    """Get the physical memory of the machine in bytes, 0 if it can not be
+    read."""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def get_accelerator_memory(device: str) -> tuple | None:
+    """Get the memory reserved by torch on the accelerator and the total
+    memory of the accelerator.
+
+    Args:
+        device (str): the device, e.g. 'cuda' or 'cuda:1'
+
+    Returns:
+        tuple | None: (reserved, total) in bytes, None on cpu or if torch is not installed
+    """
+    if str(device).startswith('cpu'):
+        return None
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    device = torch.device(device)
+    if device.index is None:
+        device = torch.device('cuda', torch.cuda.current_device())
+    return torch.cuda.memory_reserved(device), torch.cuda.get_device_properties(device).total_memory
+
+
+class MemoryManager:
+    # 回收后内存仍高于阈值时, 需再增长阈值的该比例才会再次回收, 避免常驻的模型导致每次都回收
+    GROWTH_RATIO = 0.1
+
+    def __init__(
+        self,
+        rss_high_water: int | None = None,
+        vram_high_water_ratio: float | None = 0.8,
+        device: str = 'cpu',
+        adaptive: bool = True,
+        rss_reader: Callable[[], int] = get_process_rss,
+        vram_reader: Callable[[str], tuple | None] = get_accelerator_memory,
+        collector: Callable[[], None] = clean_memory,
+    ):
+        """Run the garbage collection and free the cached accelerator memory
+        only when the memory of the process crosses a high water mark. The
+        memory still in use after a collection, e.g. the loaded models, raises
+        the mark until the memory falls below it again.
+
+        Args:
+            rss_high_water (int | None, optional): the resident memory of the process in bytes above which
+                the memory is collected, None means the resident memory is not checked. Defaults to None.
+            vram_high_water_ratio (float | None, optional): the fraction of the accelerator memory reserved by
+                torch above which the memory is collected, None means the accelerator memory is not checked.
+                Defaults to 0.8.
+            device (str, optional): the accelerator device. Defaults to 'cpu'.
+            adaptive (bool, optional): False collects on every call like `clean_memory`. Defaults to True.
+            rss_reader (Callable[[], int], optional): reads the resident memory. Defaults to get_process_rss.
+            vram_reader (Callable[[str], tuple | None], optional): reads the (reserved, total) accelerator
+                memory. Defaults to get_accelerator_memory.
+            collector (Callable[[], None], optional): collects the memory. Defaults to clean_memory.
+        """
+        self.rss_high_water = rss_high_water
+        self.vram_high_water_ratio = vram_high_water_ratio
+        self.device = device
+        self.adaptive = adaptive
+        self._rss_reader = rss_reader
+        self._vram_reader = vram_reader
+        self._collector = collector
+        # 上次回收后仍在使用的内存
+        self._rss_floor = 0
+        self._vram_floor = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'checks': 0,
+            'collections': 0,
+            'collect_time': 0.0,
+            'last_collect_time': 0.0,
+            'reasons': {'rss': 0, 'vram': 0, 'always': 0, 'force': 0},
+        }
+
+    def _over(self, used: int, high_water: float, floor: int) -> bool:
+        return used > max(high_water, floor + high_water * self.GROWTH_RATIO)
+
+    @staticmethod
+    def _floor(used: int, high_water: float) -> int:
+        # 内存低于阈值时恢复原阈值
+        return used if used > high_water else 0
+
+    def _read_vram(self) -> tuple | None:
+        if self.vram_high_water_ratio is None:
+            return None
+        return self._vram_reader(self.device)
+
+    def maybe_collect(self, force: bool = False) -> bool:
+        """Collect the memory if a high water mark is crossed.
+
+        Args:
+            force (bool, optional): collect regardless of the marks. Defaults to False.
+
+        Returns:
+            bool: whether the memory was collected
+        """
+        with self._lock:
+            self._stats['checks'] += 1
+            reasons = []
+            if force:
+                reasons.append('force')
+            elif not self.adaptive:
+                reasons.append('always')
+            else:
+                if self.rss_high_water:
+                    rss = self._rss_reader()
+                    if self._over(rss, self.rss_high_water, self._rss_floor):
+                        reasons.append('rss')
+                    elif rss <= self.rss_high_water:
+                        self._rss_floor = 0
+                vram = self._read_vram()
+                if vram is not None:
+                    reserved, total = vram
+                    if self._over(reserved, total * self.vram_high_water_ratio, self._vram_floor):
+                        reasons.append('vram')
+                    elif reserved <= total * self.vram_high_water_ratio:
+                        self._vram_floor = 0
+            if not reasons:
+                return False
+
+            collect_start = time.time()
+            self._collector()
+            collect_time = time.time() - collect_start
+
+            if self.rss_high_water:
+                self._rss_floor = self._floor(self._rss_reader(), self.rss_high_water)
+            vram = self._read_vram()
+            if vram is not None:
+                reserved, total = vram
+                self._vram_floor = self._floor(reserved, total * self.vram_high_water_ratio)
+
+            self._stats['collections'] += 1
+            self._stats['collect_time'] += collect_time
+            self._stats['last_collect_time'] = collect_time
+            for reason in reasons:
+                self._stats['reasons'][reason] += 1
+        logger.info(f"gc time: {round(collect_time, 2)}, reason: {', '.join(reasons)}")
+        return True
+
+    def stats(self) -> dict:
+        """Get the counters of the manager.
+
+        Returns:
+            dict: {'checks': int, 'collections': int, 'collect_time': float, 'last_collect_time': float,
+                'reasons': {reason: int}}, the times are in seconds
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['reasons'] = dict(self._stats['reasons'])
+            return stats
+
+
+_memory_manager = None
+_memory_manager_lock = threading.Lock()
+
+
+def get_memory_manager() -> MemoryManager:
+    """Get the memory manager of the process, configured by memory-config."""
+    global _memory_manager
+    with _memory_manager_lock:
+        if _memory_manager is None:
+            from magic_pdf.libs.config_reader import get_device, get_memory_config
+
+            memory_config = get_memory_config()
+            rss_high_water_gb = memory_config.get('rss_high_water_gb', 0)
+            if rss_high_water_gb > 0:
+                rss_high_water = int(rss_high_water_gb * 1024 ** 3)
+            else:
+                # 默认为物理内存的75%
+                rss_high_water = int(get_physical_memory() * 0.75) or None
+            _memory_manager = MemoryManager(
+                rss_high_water=rss_high_water,
+                vram_high_water_ratio=memory_config.get('vram_high_water_ratio', 0.8) or None,
+                device=get_device(),
+                adaptive=memory_config.get('adaptive', True),
+            )
+    return _memory_manager
+
+
+def maybe_clean_memory(force: bool = False) -> bool:
+    """`clean_memory` if the memory of the process crosses a high water mark
+    of memory-config, see `MemoryManager.maybe_collect`."""
+    return get_memory_manager().maybe_collect(force)
@@ -5,7 +5,7 @@ import os
 
 from loguru import logger
 
-from magic_pdf.config.constants import MODEL_NAME
+from magic_pdf.config.constants import MODEL_NAME, PRECISION_MODE
 from magic_pdf.libs.commons import parse_bucket_key
 
 # 定义配置文件名常量
@@ -87,6 +87,16 @@ def get_device():
         return device
 
 
+def get_precision_mode():
+    config = read_config()
+    precision_mode = config.get('precision-mode')
+    if precision_mode is None:
+        logger.warning(f"'precision-mode' not found in {CONFIG_FILE_NAME}, use '{PRECISION_MODE.AUTO}' as default")
+        return PRECISION_MODE.AUTO
+    else:
+        return precision_mode
+
+
 def get_table_recog_config():
     config = read_config()
     table_config = config.get('table-config')
@@ -102,7 +112,7 @@ def get_layout_config():
     layout_config = config.get('layout-config')
     if layout_config is None:
         logger.warning(f"'layout-config' not found in {CONFIG_FILE_NAME}, use '{MODEL_NAME.LAYOUTLMv3}' as default")
-        return json.loads(f'{{"model": "{MODEL_NAME.LAYOUTLMv3}"}}')
+        return json.loads(f'{{"model": "{MODEL_NAME.LAYOUTLMv3}", "batch_size": 1}}')
     else:
         return layout_config
 
@@ -112,10 +122,88 @@ def get_formula_config():
     formula_config = config.get('formula-config')
     if formula_config is None:
         logger.warning(f"'formula-config' not found in {CONFIG_FILE_NAME}, use 'True' as default")
-        return json.loads(f'{{"mfd_model": "{MODEL_NAME.YOLO_V8_MFD}","mfr_model": "{MODEL_NAME.UniMerNet_v2_Small}","enable": true}}')
+        return {
+            'mfd_model': MODEL_NAME.YOLO_V8_MFD,
+            'mfr_model': MODEL_NAME.UniMerNet_v2_Small,
+            'enable': True,
+            'mfd_batch_size': 1,
+            'mfd_imgsz': 1888,
+            'mfr_batch_size': 64,
+            'prefilter': False,
+            'prefilter_imgsz': 640,
+        }
     else:
         return formula_config
 
 
+def get_render_config():
+    config = read_config()
+    render_config = config.get('render-config')
+    if render_config is None:
+        logger.warning(f"'render-config' not found in {CONFIG_FILE_NAME}, use '200' dpi as default")
+        return json.loads('{"dpi": 200, "max_side": 4500, "workers": 0}')
+    else:
+        return render_config
+
+
+def get_resolution_config():
+    config = read_config()
+    resolution_config = config.get('resolution-config')
+    if resolution_config is None:
+        logger.warning(f"'resolution-config' not found in {CONFIG_FILE_NAME}, use 'False' as default")
+        return {
+            'enable': False,
+            'min_dpi': 120,
+            'max_dpi': 400,
+            'min_imgsz_ratio': 0.5,
+            'max_imgsz_ratio': 1.5,
+            'tile': True,
+            'tile_max_side': 12000,
+            'tile_overlap': 0.2,
+        }
+    else:
+        return resolution_config
+
+
+def get_pipeline_config():
+    config = read_config()
+    pipeline_config = config.get('pipeline-config')
+    if pipeline_config is None:
+        logger.warning(f"'pipeline-config' not found in {CONFIG_FILE_NAME}, use 'False' as default")
+        return json.loads('{"enable": false, "queue_size": 2}')
+    else:
+        return pipeline_config
+
+
+def get_onnx_config():
+    config = read_config()
+    onnx_config = config.get('onnx-config')
+    if onnx_config is None:
+        logger.warning(f"'onnx-config' not found in {CONFIG_FILE_NAME}, use 'False' as default")
+        return json.loads('{"enable": false, "cache_dir": "", "intra_op_num_threads": 0, "inter_op_num_threads": 0}')
+    else:
+        return onnx_config
+
+
+def get_model_residency_config():
+    config = read_config()
+    model_residency_config = config.get('model-residency-config')
+    if model_residency_config is None:
+        logger.warning(f"'model-residency-config' not found in {CONFIG_FILE_NAME}, use no memory limit as default")
+        return json.loads('{"max_memory_gb": 0, "max_pipelines": 8}')
+    else:
+        return model_residency_config
+
+
+def get_memory_config():
+    config = read_config()
+    memory_config = config.get('memory-config')
+    if memory_config is None:
+        logger.warning(f"'memory-config' not found in {CONFIG_FILE_NAME}, use adaptive collection as default")
+        return json.loads('{"adaptive": true, "rss_high_water_gb": 0, "vram_high_water_ratio": 0.8}')
+    else:
+        return memory_config
+
+
 if __name__ == '__main__':
     ak, sk, endpoint = get_s3_config('llm-raw')
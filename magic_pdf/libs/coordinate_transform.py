@@ -1,7 +1,8 @@
 def get_scale_ratio(model_page_info, page):
-    pix = page.get_pixmap(dpi=72)
-    pymu_width = int(pix.w)
-    pymu_height = int(pix.h)
+    # the size of the pixmap rendered at 72 dpi, computed without rendering the page
+    irect = page.rect.irect
+    pymu_width = int(irect.width)
+    pymu_height = int(irect.height)
     width_from_json = model_page_info['page_info']['width']
     height_from_json = model_page_info['page_info']['height']
     horizontal_scale_ratio = width_from_json / pymu_width
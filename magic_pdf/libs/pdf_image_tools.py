@@ -1,17 +1,84 @@
-from io import BytesIO
 import cv2
 import fitz
 import numpy as np
 from PIL import Image
 from magic_pdf.data.data_reader_writer import DataWriter
+from magic_pdf.data.utils import fitz_doc_to_image, pixmap_to_ndarray
 from magic_pdf.libs.commons import join_path
 from magic_pdf.libs.hash_utils import compute_sha256
 
+# 截图的缩放倍数
+CROP_ZOOM = 3
+# 整页渲染后的图片超过该大小时，退化为按区域渲染
+CROP_PAGE_MAX_BYTES = 64 * 1024 * 1024
 
-def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: DataWriter):
+
+class PageCropper:
+    def __init__(self, page, zoom: int = CROP_ZOOM, max_page_bytes: int = CROP_PAGE_MAX_BYTES):
+        """Crop regions of a page from a single raster of the page, the page
+        is rendered once at the crop zoom on the first crop.
+
+        Args:
+            page (fitz.Page | PageableData): the page, the raster of PageableData is taken from the image cache of its dataset
+            zoom (int, optional): the zoom of the crops. Defaults to CROP_ZOOM.
+            max_page_bytes (int, optional): render each region separately when the raster of the whole page would
+                be larger. Defaults to CROP_PAGE_MAX_BYTES.
+        """
+        self._page = page
+        self._dpi = 72 * zoom
+        self._matrix = fitz.Matrix(zoom, zoom)
+        page_irect = (page.rect * self._matrix).irect
+        self._render_page = page_irect.width * page_irect.height * 3 <= max_page_bytes
+        self._img = None
+
+    def _page_image(self) -> np.ndarray:
+        if self._img is None:
+            if hasattr(self._page, 'get_image'):
+                self._img = self._page.get_image(dpi=self._dpi, max_side=None)['img']
+            else:
+                self._img = fitz_doc_to_image(self._page, dpi=self._dpi, max_side=None)['img']
+        return self._img
+
+    def crop(self, bbox: tuple) -> np.ndarray:
+        """Crop the region of bbox, the region is clipped to the page like
+        `page.get_pixmap(clip=bbox)`.
+
+        Args:
+            bbox (tuple): the region in pdf coordinates, [x0, y0, x1, y1]
+
+        Returns:
+            np.ndarray: (height, width, 3) RGB array, it is a view of the page raster and should not be modified
+        """
+        rect = fitz.Rect(*bbox) & self._page.rect
+        irect = (rect * self._matrix).irect
+        if irect.is_empty:
+            return np.zeros((0, 0, 3), dtype=np.uint8)
+        if not self._render_page:
+            pm = self._page.get_pixmap(clip=rect, matrix=self._matrix, colorspace=fitz.csRGB, alpha=False)
+            return pixmap_to_ndarray(pm)
+        return self._page_image()[irect.y0:irect.y1, irect.x0:irect.x1]
+
+
+def image_to_jpeg_bytes(img: np.ndarray, quality: int = 95) -> bytes:
+    """Encode RGB array to jpeg with the same encoder as `fitz.Pixmap.tobytes`.
+
+    Args:
+        img (np.ndarray): (height, width, 3) RGB array
+        quality (int, optional): the jpeg quality. Defaults to 95.
+
+    Returns:
+        bytes: the jpeg bytes
+    """
+    height, width = img.shape[:2]
+    pix = fitz.Pixmap(fitz.csRGB, width, height, np.ascontiguousarray(img).tobytes(), False)
+    return pix.tobytes(output='jpeg', jpg_quality=quality)
+
+
+def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWriter: DataWriter, cropper: PageCropper = None):
     """从第page_num页的page中，根据bbox进行裁剪出一张jpg图片，返回图片路径 save_path：需要同时支持s3和本地,
     图片存放在save_path下，文件名是:
-    {page_num}_{bbox[0]}_{bbox[1]}_{bbox[2]}_{bbox[3]}.jpg , bbox内数字取整。"""
+    {page_num}_{bbox[0]}_{bbox[1]}_{bbox[2]}_{bbox[3]}.jpg , bbox内数字取整。
+    同一页的多次截图应共用一个cropper，整页只渲染一次。"""
     # 拼接文件名
     filename = f'{page_num}_{int(bbox[0])}_{int(bbox[1])}_{int(bbox[2])}_{int(bbox[3])}'
 
@@ -21,38 +88,30 @@ def cut_image(bbox: tuple, page_num: int, page: fitz.Page, return_path, imageWri
     # 新版本生成平铺路径
     img_hash256_path = f'{compute_sha256(img_path)}.jpg'
 
-    # 将坐标转换为fitz.Rect对象
-    rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
-    # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
+    if cropper is None:
+        cropper = PageCropper(page)
+    # 从3倍缩放的整页图片中截取
+    img = cropper.crop(bbox)
 
-    byte_data = pix.tobytes(output='jpeg', jpg_quality=95)
+    byte_data = image_to_jpeg_bytes(img, quality=95)
 
     imageWriter.write(img_hash256_path, byte_data)
 
     return img_hash256_path
 
 
-def cut_image_to_pil_image(bbox: tuple, page: fitz.Page, mode="pillow"):
+def cut_image_to_pil_image(bbox: tuple, page: fitz.Page, mode="pillow", cropper: PageCropper = None):
 
-    # 将坐标转换为fitz.Rect对象
-    rect = fitz.Rect(*bbox)
-    # 配置缩放倍数为3倍
-    zoom = fitz.Matrix(3, 3)
-    # 截取图片
-    pix = page.get_pixmap(clip=rect, matrix=zoom)
+    if cropper is None:
+        cropper = PageCropper(page)
+    # 从3倍缩放的整页图片中截取
+    img = cropper.crop(bbox)
 
-    # 将字节数据转换为文件对象
-    image_file = BytesIO(pix.tobytes(output='png'))
-    # 使用 Pillow 打开图像
-    pil_image = Image.open(image_file)
     if mode == "cv2":
-        image_result = cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+        image_result = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
     elif mode == "pillow":
-        image_result = pil_image
+        image_result = Image.fromarray(img)
     else:
         raise ValueError(f"mode: {mode} is not supported.")
 
-    return image_result
\ No newline at end of file
+    return image_result
@@ -1,8 +1,9 @@
 import os
+import threading
 import time
+from contextlib import nullcontext
 
 import fitz
-import numpy as np
 from loguru import logger
 
 # 关闭paddle的信号处理
@@ -21,14 +22,30 @@ except ImportError:
     pass
 
 import magic_pdf.model as model_config
-from magic_pdf.data.dataset import Dataset
-from magic_pdf.libs.clean_memory import clean_memory
+from magic_pdf.data.dataset import Dataset, PymuDocFileDataset
+from magic_pdf.data.rasterizer import PageRasterizer
+from magic_pdf.data.utils import fitz_doc_to_image, fitz_doc_to_matrix
+from magic_pdf.libs.clean_memory import maybe_clean_memory
 from magic_pdf.libs.config_reader import (get_device, get_formula_config,
                                           get_layout_config,
                                           get_local_models_dir,
+                                          get_model_residency_config,
+                                          get_onnx_config,
+                                          get_pipeline_config,
+                                          get_precision_mode,
+                                          get_render_config,
+                                          get_resolution_config,
                                           get_table_recog_config)
 from magic_pdf.model.model_list import MODEL
+from magic_pdf.model.model_residency import ModelResidency
 from magic_pdf.model.operators import InferenceResult
+from magic_pdf.model.pipeline import Stage, StagePipeline
+from magic_pdf.model.sub_modules.mfd.math_prefilter import \
+    text_layer_math_hint
+from magic_pdf.model.sub_modules.ocr.text_layer import get_text_layer_lines
+from magic_pdf.model.sub_modules.resolution import (estimate_font_size,
+                                                    plan_page_resolution)
+from magic_pdf.model.sub_modules.model_utils import PageImage
 
 
 def dict_compare(d1, d2):
@@ -48,12 +65,6 @@ def remove_duplicates_dicts(lst):
 def load_images_from_pdf(
     pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None
 ) -> list:
-    try:
-        from PIL import Image
-    except ImportError:
-        logger.error('Pillow not installed, please install by pip.')
-        exit(1)
-
     images = []
     with fitz.open('pdf', pdf_bytes) as doc:
         pdf_page_num = doc.page_count
@@ -68,17 +79,7 @@ def load_images_from_pdf(
 
         for index in range(0, doc.page_count):
             if start_page_id <= index <= end_page_id:
-                page = doc[index]
-                mat = fitz.Matrix(dpi / 72, dpi / 72)
-                pm = page.get_pixmap(matrix=mat, alpha=False)
-
-                # If the width or height exceeds 4500 after scaling, do not scale further.
-                if pm.width > 4500 or pm.height > 4500:
-                    pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
-
-                img = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
-                img = np.array(img)
-                img_dict = {'img': img, 'width': pm.width, 'height': pm.height}
+                img_dict = fitz_doc_to_image(doc[index], dpi=dpi)
             else:
                 img_dict = {'img': [], 'width': 0, 'height': 0}
 
@@ -88,7 +89,9 @@ def load_images_from_pdf(
 
 class ModelSingleton:
     _instance = None
-    _models = {}
+    # the models of the different flags share their atom models, only the max_pipelines last used are kept
+    _models = None
+    _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -104,17 +107,24 @@ class ModelSingleton:
         formula_enable=None,
         table_enable=None,
     ):
+        with self._lock:
+            if ModelSingleton._models is None:
+                max_pipelines = get_model_residency_config().get('max_pipelines', 8)
+                ModelSingleton._models = ModelResidency(
+                    max_models=max_pipelines if max_pipelines > 0 else None, sizeof=None
+                )
         key = (ocr, show_log, lang, layout_model, formula_enable, table_enable)
-        if key not in self._models:
-            self._models[key] = custom_model_init(
+        return self._models.get(
+            key,
+            lambda: custom_model_init(
                 ocr=ocr,
                 show_log=show_log,
                 lang=lang,
                 layout_model=layout_model,
                 formula_enable=formula_enable,
                 table_enable=table_enable,
-            )
-        return self._models[key]
+            ),
+        )
 
 
 def custom_model_init(
@@ -167,9 +177,11 @@ def custom_model_init(
                 'show_log': show_log,
                 'models_dir': local_models_dir,
                 'device': device,
+                'precision': get_precision_mode(),
                 'table_config': table_config,
                 'layout_config': layout_config,
                 'formula_config': formula_config,
+                'onnx_config': get_onnx_config(),
                 'lang': lang,
             }
 
@@ -186,6 +198,106 @@ def custom_model_init(
     return custom_model
 
 
+def batched(items, batch_size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def sequential_analyze(
+    custom_model, page_ids, images, page_batch_size, mfr_queue, math_hints, page_stats, text_layers, resolution_plans
+) -> dict:
+    """Analyze the pages batch by batch, each batch goes through all the models
+    before the next batch is rendered. math_hints, page_stats, text_layers and
+    resolution_plans are dicts keyed by page_id, see `CustomPEKModel.batch_call`.
+
+    Returns:
+        dict: {page_id: (layout_dets, width, height)}
+    """
+    page_results = {}
+    for batch in batched(zip(page_ids, images), page_batch_size):
+        batch_start = time.time()
+        batch_page_ids = [page_id for page_id, _ in batch]
+        batch_images = [img_dict for _, img_dict in batch]
+        if not hasattr(custom_model, 'batch_call'):
+            results = [custom_model(batch_images[0]['img'])]
+            logger.info(f'-----page_id : {batch_page_ids[0]}, page total time: {round(time.time() - batch_start, 2)}-----')
+        else:
+            results = custom_model.batch_call(
+                [img_dict['img'] for img_dict in batch_images],
+                mfr_queue=mfr_queue,
+                math_hints=[math_hints.get(page_id) for page_id in batch_page_ids],
+                page_stats=[page_stats[page_id] for page_id in batch_page_ids],
+                text_layers=[text_layers.get(page_id) for page_id in batch_page_ids],
+                resolution_plans=[resolution_plans.get(page_id) for page_id in batch_page_ids],
+            )
+            logger.info(
+                f'-----page_id : {batch_page_ids[0]}-{batch_page_ids[-1]}, '
+                f'batch total time: {round(time.time() - batch_start, 2)}-----'
+            )
+        for page_id, img_dict, result in zip(batch_page_ids, batch_images, results):
+            page_results[page_id] = (result, img_dict['width'], img_dict['height'])
+    return page_results
+
+
+def pipeline_analyze(
+    custom_model, page_ids, images, page_batch_size, mfr_queue, math_hints, page_stats, text_layers, resolution_plans,
+    pipeline_config
+) -> dict:
+    """Analyze the pages in a pipeline of detection, recognition (OCR) and
+    table stages, which run in their own threads, so the rendering of the next
+    pages and the OCR of the previous pages overlap with the detection models.
+    The result is the same as `sequential_analyze`.
+
+    Returns:
+        dict: {page_id: (layout_dets, width, height)}
+    """
+    def detect(batch):
+        page_images = [PageImage(img_dict['img']) for _, img_dict in batch]
+        layout_res_list = custom_model.detect_pages(
+            page_images,
+            mfr_queue=mfr_queue,
+            math_hints=[math_hints.get(page_id) for page_id, _ in batch],
+            page_stats=[page_stats[page_id] for page_id, _ in batch],
+            resolution_plans=[resolution_plans.get(page_id) for page_id, _ in batch],
+        )
+        return [
+            (page_id, img_dict, page_image, layout_res)
+            for (page_id, img_dict), page_image, layout_res in zip(batch, page_images, layout_res_list)
+        ]
+
+    def recognize(item):
+        page_id, _, page_image, layout_res = item
+        table_ocr_res_list = custom_model.ocr_page(page_image, layout_res, text_lines=text_layers.get(page_id))
+        return [item + (table_ocr_res_list,)]
+
+    def table(item):
+        page_id, img_dict, page_image, layout_res, table_ocr_res_list = item
+        custom_model.table_page(page_image, layout_res, table_ocr_res_list=table_ocr_res_list)
+        return [(page_id, layout_res, img_dict['width'], img_dict['height'])]
+
+    # 每个阶段的模型同时只被一个线程调用(detect_pages, ocr_page的锁和表格子进程), 每个阶段一个线程
+    for option in ['detection_workers', 'recognition_workers', 'table_workers']:
+        if pipeline_config.get(option, 1) > 1:
+            logger.warning(f'pipeline-config {option} is ignored, the models of each stage run in one thread at a time')
+    pipeline = StagePipeline(
+        [Stage('detection', detect), Stage('recognition', recognize), Stage('table', table)],
+        queue_size=pipeline_config.get('queue_size', 2),
+    )
+
+    page_results = {}
+    pipeline_start = time.time()
+    for page_id, result, page_width, page_height in pipeline.run(batched(zip(page_ids, images), page_batch_size)):
+        page_results[page_id] = (result, page_width, page_height)
+        logger.info(f'-----page_id : {page_id}, page done at: {round(time.time() - pipeline_start, 2)}-----')
+    return page_results
+
+
 def doc_analyze(
     dataset: Dataset,
     ocr: bool = False,
@@ -212,27 +324,108 @@ def doc_analyze(
     if end_page_id is None:
         end_page_id = len(dataset)
 
+    page_ids = [index for index in range(len(dataset)) if start_page_id <= index <= end_page_id]
+
+    render_config = get_render_config()
+    render_dpi = render_config.get('dpi', 200)
+    render_max_side = render_config.get('max_side', 4500)
+
+    # the render dpi and the detector input sizes are planned for each page from its size and font size
+    resolution_plans = {}
+    resolution_config = get_resolution_config()
+    plan_resolution = resolution_config.get('enable', False) and hasattr(custom_model, 'detect_pages')
+    # the formula prefilter checks the text layer for math, the pages without math skip the formula models
+    math_hints = {}
+    prefilter_formula = getattr(custom_model, 'apply_formula', False) and getattr(custom_model, 'formula_prefilter', False)
+    if plan_resolution or prefilter_formula:
+        for page_id in page_ids:
+            page = dataset.get_page(page_id).get_doc()
+            # the planner and the prefilter share one extraction of the text layer
+            text_dict = page.get_text('dict', flags=0)
+            if plan_resolution:
+                resolution_plans[page_id] = plan_page_resolution(
+                    page.rect.width,
+                    page.rect.height,
+                    estimate_font_size(page, text_dict),
+                    resolution_config,
+                    dpi=render_dpi,
+                    max_side=render_max_side,
+                    layout_imgsz=custom_model.layout_imgsz,
+                    mfd_imgsz=custom_model.mfd_imgsz,
+                )
+            if prefilter_formula:
+                math_hints[page_id] = text_layer_math_hint(page, text_dict)
+    render_options = {
+        page_id: (plan['dpi'], plan['max_side']) for page_id, plan in resolution_plans.items()
+    }
+
+    # render the pages in a process pool which runs ahead of the models
+    render_workers = render_config.get('workers', 0)
+    rasterizer = None
+    if render_workers > 1 and len(page_ids) > 1:
+        rasterizer = PageRasterizer(
+            dataset.file_path if isinstance(dataset, PymuDocFileDataset) else dataset.data_bits(),
+            workers=min(render_workers, len(page_ids)),
+            dpi=render_dpi,
+            max_side=render_max_side,
+        )
+        images = rasterizer.imap(page_ids, render_options=render_options)
+    else:
+        def render(index):
+            page_dpi, page_max_side = render_options.get(index, (render_dpi, render_max_side))
+            return dataset.get_page(index).get_image(dpi=page_dpi, max_side=page_max_side)
+
+        images = (render(index) for index in page_ids)
+
+    # the pages are analyzed in batches, CustomPEKModel runs its models on the whole batch
+    page_batch_size = getattr(custom_model, 'batch_size', 1)
+    # the formulas of the whole document are recognized together after the pages are analyzed
+    mfr_queue = []
+    page_stats = {page_id: {} for page_id in page_ids}
+    # in TXT mode the text boxes are taken from the text layer instead of the text detection
+    text_layers = {}
+    if not ocr and hasattr(custom_model, 'ocr_page'):
+        for page_id in page_ids:
+            page = dataset.get_page(page_id).get_doc()
+            page_dpi, page_max_side = render_options.get(page_id, (render_dpi, render_max_side))
+            matrix = fitz_doc_to_matrix(page, dpi=page_dpi, max_side=page_max_side)
+            text_layers[page_id] = get_text_layer_lines(page, matrix)
+    pipeline_config = get_pipeline_config()
+    # the atom models are not evicted while the document is analyzed
+    in_use = custom_model.in_use() if hasattr(custom_model, 'in_use') else nullcontext()
+    try:
+        with in_use:
+            if pipeline_config.get('enable', False) and hasattr(custom_model, 'detect_pages'):
+                page_results = pipeline_analyze(
+                    custom_model, page_ids, images, page_batch_size, mfr_queue, math_hints, page_stats, text_layers,
+                    resolution_plans, pipeline_config
+                )
+            else:
+                page_results = sequential_analyze(
+                    custom_model, page_ids, images, page_batch_size, mfr_queue, math_hints, page_stats, text_layers,
+                    resolution_plans
+                )
+            if len(mfr_queue) > 0:
+                custom_model.mfr_recognize(mfr_queue)
+    finally:
+        if rasterizer is not None:
+            images.close()
+            rasterizer.close()
+
     for index in range(len(dataset)):
-        page_data = dataset.get_page(index)
-        img_dict = page_data.get_image()
-        img = img_dict['img']
-        page_width = img_dict['width']
-        page_height = img_dict['height']
-        if start_page_id <= index <= end_page_id:
-            page_start = time.time()
-            result = custom_model(img)
-            logger.info(f'-----page_id : {index}, page total time: {round(time.time() - page_start, 2)}-----')
+        if index in page_results:
+            result, page_width, page_height = page_results[index]
         else:
+            # pages out of range are never rendered, only their size is needed
+            page_width, page_height = dataset.get_page(index).get_image_size(dpi=render_dpi, max_side=render_max_side)
             result = []
 
         page_info = {'page_no': index, 'height': page_height, 'width': page_width}
+        page_info.update(page_stats.get(index, {}))
         page_dict = {'layout_dets': result, 'page_info': page_info}
         model_json.append(page_dict)
 
-    gc_start = time.time()
-    clean_memory()
-    gc_time = round(time.time() - gc_start, 2)
-    logger.info(f'gc time: {gc_time}')
+    maybe_clean_memory()
 
     doc_analyze_time = round(time.time() - doc_analyze_start, 2)
     doc_analyze_speed = round((end_page_id + 1 - start_page_id) / doc_analyze_time, 2)
@@ -0,0 +1,280 @@
+import gc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Hashable
+
+from loguru import logger
+
+from magic_pdf.libs.clean_memory import get_process_rss
+
+
+def find_torch_modules(model, depth: int = 2) -> list:
+    """Find the torch modules of a model, the model object itself and the
+    modules held by its attributes, e.g. the predictor of a wrapper class.
+
+    Args:
+        model: the model, e.g. a torch.nn.Module or a wrapper class holding some
+        depth (int, optional): the depth of the attributes searched. Defaults to 2.
+
+    Returns:
+        list: the torch modules found, empty if torch is not installed
+    """
+    try:
+        import torch
+    except ImportError:
+        return []
+
+    modules = []
+    seen = set()
+
+    def collect(obj, depth):
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        if isinstance(obj, torch.nn.Module):
+            modules.append(obj)
+        elif depth > 0 and hasattr(obj, '__dict__'):
+            for value in vars(obj).values():
+                collect(value, depth - 1)
+
+    collect(model, depth)
+    return modules
+
+
+def estimate_model_bytes(model) -> int:
+    """Estimate the memory held by a model, the parameters and buffers of the
+    torch modules found in the model object and its attributes.
+
+    Args:
+        model: the model, e.g. a torch.nn.Module or a wrapper class holding some
+
+    Returns:
+        int: the bytes of the parameters and buffers, 0 if no torch module is found
+    """
+    nbytes = 0
+    tensors = set()
+    for module in find_torch_modules(model):
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) not in tensors:
+                tensors.add(id(tensor))
+                nbytes += tensor.numel() * tensor.element_size()
+    return nbytes
+
+
+class _Entry:
+    def __init__(self, model, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.refcount = 0
+
+
+class _KeyLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # the threads holding or waiting for the lock, the lock is dropped when none is left
+        self.waiters = 0
+
+
+class ModelResidency:
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        max_models: int | None = None,
+        sizeof: Callable | None = estimate_model_bytes,
+    ):
+        """Keep the loaded models within a memory budget, the least recently
+        used idle models are evicted when the budget is exceeded and loaded again
+        when they are used next time. The models acquired for in-flight calls are
+        never evicted. Only the models of this process are counted, the table
+        model of CustomPEKModel runs in a worker process and is not.
+
+        Args:
+            max_bytes (int | None, optional): the memory budget of the models, None means no limit. Defaults to None.
+            max_models (int | None, optional): the max number of models, None means no limit. Defaults to None.
+            sizeof (Callable | None, optional): estimate the bytes of a model, for the models got with measure_rss
+                the growth of the process memory during the load is used when it returns 0 and max_bytes is set, None
+                means the models are not measured and only max_models applies. Defaults to estimate_model_bytes.
+        """
+        self._max_bytes = max_bytes
+        self._max_models = max_models
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # 按进程内存增长测量的模型单独加载, 其它模型可以同时加载
+        self._load_cond = threading.Condition()
+        self._loads_in_flight = 0
+        self._exclusive_load = False
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def models(self) -> list:
+        """The resident models, the least recently used first."""
+        with self._lock:
+            return [entry.model for entry in self._entries.values()]
+
+    def get(self, key: Hashable, loader: Callable, measure_rss: bool = False):
+        """Get the model, load it with loader if it is not resident.
+
+        Args:
+            key (Hashable): the key of the model
+            loader (Callable): called without arguments to load the model
+            measure_rss (bool, optional): the model can not be measured by sizeof, e.g. it holds no torch module, it
+                is measured by the growth of the process memory during its load, which runs while no other model
+                loads. The model is measured only when max_bytes is set. Defaults to False.
+
+        Returns:
+            the model
+        """
+        return self._get(key, loader, pin=False, measure_rss=measure_rss)
+
+    def acquire(self, key: Hashable, loader: Callable, measure_rss: bool = False):
+        """Get the model like `get` and keep it resident until `release`.
+
+        Args:
+            key (Hashable): the key of the model
+            loader (Callable): called without arguments to load the model
+            measure_rss (bool, optional): see `get`. Defaults to False.
+
+        Returns:
+            the model
+        """
+        return self._get(key, loader, pin=True, measure_rss=measure_rss)
+
+    def release(self, key: Hashable):
+        """Release the model acquired by `acquire`, it can be evicted again
+        once it is not acquired anymore.
+
+        Args:
+            key (Hashable): the key of the model
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refcount > 0:
+                entry.refcount -= 1
+                self._evict()
+
+    def stats(self) -> dict:
+        """The statistics of the residency, the models loaded in other
+        processes, e.g. the table recognition worker, are not included.
+
+        Returns:
+            dict: {'models': int, 'nbytes': int, 'hits': int, 'loads': int, 'evictions': int}
+        """
+        with self._lock:
+            return {
+                'models': len(self._entries),
+                'nbytes': self._nbytes,
+                'hits': self._hits,
+                'loads': self._loads,
+                'evictions': self._evictions,
+            }
+
+    @contextmanager
+    def _loading(self, exclusive: bool):
+        with self._load_cond:
+            if exclusive:
+                self._load_cond.wait_for(lambda: self._loads_in_flight == 0 and not self._exclusive_load)
+                self._exclusive_load = True
+            else:
+                self._load_cond.wait_for(lambda: not self._exclusive_load)
+                self._loads_in_flight += 1
+        try:
+            yield
+        finally:
+            with self._load_cond:
+                if exclusive:
+                    self._exclusive_load = False
+                else:
+                    self._loads_in_flight -= 1
+                self._load_cond.notify_all()
+
+    def _get(self, key, loader, pin: bool, measure_rss: bool = False):
+        with self._lock:
+            entry = self._lookup(key, pin)
+            if entry is not None:
+                return entry.model
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = _KeyLock()
+            key_lock.waiters += 1
+
+        # the same model is loaded once, the other models are loaded concurrently
+        try:
+            with key_lock.lock:
+                return self._load(key, loader, pin, measure_rss)
+        finally:
+            with self._lock:
+                key_lock.waiters -= 1
+                if key_lock.waiters == 0:
+                    del self._key_locks[key]
+
+    def _load(self, key, loader, pin: bool, measure_rss: bool):
+        with self._lock:
+            entry = self._lookup(key, pin)
+            if entry is not None:
+                return entry.model
+        if self._sizeof is None:
+            model = loader()
+            nbytes = 0
+        else:
+            # 其它线程同时加载的模型会计入进程内存的增长, 只在有内存预算时才需要单独加载来测量
+            measure_rss = measure_rss and self._max_bytes is not None
+            with self._loading(exclusive=measure_rss):
+                rss_before = get_process_rss()
+                model = loader()
+                nbytes = self._sizeof(model)
+                if nbytes == 0 and measure_rss:
+                    nbytes = max(get_process_rss() - rss_before, 0)
+        with self._lock:
+            entry = _Entry(model, nbytes)
+            entry.refcount = 1 if pin else 0
+            self._entries[key] = entry
+            self._nbytes += nbytes
+            self._loads += 1
+            self._evict(keep=key)
+        return model
+
+    def _lookup(self, key, pin: bool):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+            if pin:
+                entry.refcount += 1
+        return entry
+
+    def _over_budget(self) -> bool:
+        if self._max_bytes is not None and self._nbytes > self._max_bytes:
+            return True
+        if self._max_models is not None and len(self._entries) > self._max_models:
+            return True
+        return False
+
+    def _evict(self, keep=None):
+        evicted = False
+        while self._over_budget():
+            victim = next(
+                (key for key, entry in self._entries.items() if entry.refcount == 0 and key != keep), None
+            )
+            if victim is None:
+                logger.warning(
+                    f'models exceed the budget, {len(self._entries)} models, {self._nbytes} bytes, all in use'
+                )
+                break
+            entry = self._entries.pop(victim)
+            self._nbytes -= entry.nbytes
+            self._evictions += 1
+            evicted = True
+            logger.info(f'evict model {victim}, {entry.nbytes} bytes')
+        if evicted:
+            gc.collect()
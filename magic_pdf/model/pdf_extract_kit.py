@@ -1,8 +1,10 @@
 # flake8: noqa
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
-import cv2
 import numpy as np
 import torch
 import yaml
@@ -21,12 +23,65 @@ except ImportError:
     pass
 
 from magic_pdf.config.constants import *
+from magic_pdf.config.ocr_content_type import CategoryId
 from magic_pdf.model.model_list import AtomicModel
+from magic_pdf.model.pipeline import DeadlineRunner
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
 from magic_pdf.model.sub_modules.model_utils import (
-    clean_vram, crop_img, get_res_list_from_layout_res)
+    PageImage, clean_vram, get_res_list_from_layout_res)
 from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import (
-    get_adjusted_mfdetrec_res, get_ocr_result_list)
+    get_adjusted_mfdetrec_res, get_ocr_result_list, get_table_ocr_result,
+    get_text_layer_det_res)
+from magic_pdf.model.sub_modules.ocr.text_layer import crop_text_layer_boxes
+from magic_pdf.model.sub_modules.onnx_backend import get_onnx_cache_dir
+from magic_pdf.model.sub_modules.resolution import (dets_to_layout_res,
+                                                    get_tiles,
+                                                    layout_res_to_dets,
+                                                    merge_tiled_detections)
+
+
+# 表格识别子进程中的表格模型, 见 `init_table_worker`
+_table_worker_model = None
+
+
+def init_table_worker(table_model_name, table_model_path, table_max_time, device):
+    """Load the table model in the table recognition worker process of
+    CustomPEKModel."""
+    global _table_worker_model
+    table_model = AtomModelSingleton().get_atom_model(
+        atom_model_name=AtomicModel.Table,
+        table_model_name=table_model_name,
+        table_model_path=table_model_path,
+        table_max_time=table_max_time,
+        device=device,
+    )
+    _table_worker_model = (table_model_name, table_model)
+
+
+def table_predict(table_image, table_ocr_res=None):
+    """Recognize one table in the table recognition worker process.
+
+    Args:
+        table_image (np.ndarray): the RGB table image
+        table_ocr_res (list | None, optional): the text lines of the table for RapidTable. Defaults to None.
+
+    Returns:
+        str | None: the html of the table
+    """
+    table_model_name, table_model = _table_worker_model
+    html_code = None
+    if table_model_name == MODEL_NAME.STRUCT_EQTABLE:
+        with torch.no_grad():
+            table_result = table_model.predict(Image.fromarray(table_image), 'html')
+            if len(table_result) > 0:
+                html_code = table_result[0]
+    elif table_model_name == MODEL_NAME.TABLE_MASTER:
+        html_code = table_model.img2html(Image.fromarray(table_image))
+    elif table_model_name == MODEL_NAME.RAPID_TABLE:
+        html_code, table_cell_bboxes, elapse = table_model.predict(
+            table_image, ocr_result=table_ocr_res
+        )
+    return html_code
 
 
 class CustomPEKModel:
@@ -54,6 +109,8 @@ class CustomPEKModel:
         self.layout_model_name = self.layout_config.get(
             'model', MODEL_NAME.DocLayout_YOLO
         )
+        self.layout_batch_size = max(self.layout_config.get('batch_size', 1), 1)
+        self.layout_imgsz = 1024
 
         # formula config
         self.formula_config = kwargs.get('formula_config')
@@ -64,6 +121,12 @@ class CustomPEKModel:
             'mfr_model', MODEL_NAME.UniMerNet_v2_Small
         )
         self.apply_formula = self.formula_config.get('enable', True)
+        self.mfd_batch_size = max(self.formula_config.get('mfd_batch_size', 1), 1)
+        self.mfd_imgsz = self.formula_config.get('mfd_imgsz', 1888)
+        self.mfr_batch_size = max(self.formula_config.get('mfr_batch_size', 64), 1)
+        # 跳过没有公式的页面的公式检测和识别
+        self.formula_prefilter = self.formula_config.get('prefilter', False)
+        self.prefilter_imgsz = self.formula_config.get('prefilter_imgsz', 640)
 
         # table config
         self.table_config = kwargs.get('table_config')
@@ -89,17 +152,42 @@ class CustomPEKModel:
         # 初始化解析方案
         self.device = kwargs.get('device', 'cpu')
         logger.info('using device: {}'.format(self.device))
+        self.precision = kwargs.get('precision', PRECISION_MODE.AUTO)
         models_dir = kwargs.get(
             'models_dir', os.path.join(root_dir, 'resources', 'models')
         )
         logger.info('using models_dir: {}'.format(models_dir))
 
-        atom_model_manager = AtomModelSingleton()
+        # DocLayout-YOLO和公式检测模型在cpu上使用ONNX Runtime推理
+        self.onnx_config = None
+        onnx_config = kwargs.get('onnx_config') or {}
+        if onnx_config.get('enable', False):
+            if str(self.device).startswith('cpu'):
+                self.onnx_config = {
+                    'cache_dir': get_onnx_cache_dir(models_dir, onnx_config.get('cache_dir')),
+                    'intra_op_num_threads': onnx_config.get('intra_op_num_threads', 0),
+                    'inter_op_num_threads': onnx_config.get('inter_op_num_threads', 0),
+                }
+            else:
+                logger.warning(f'onnx backend only runs on cpu, use torch on {self.device}')
+
+        # 各模型在线程池中并发加载, 构造函数不等待加载完成, 模型在第一次使用时等待其加载结束
+        # 模型由AtomModelSingleton持有, 空闲时可能被换出, 每次使用时从AtomModelSingleton获取
+        self._atom_models = {}
+        self._atom_model_kwargs = {}
+        # in_use中获取的模型, 嵌套的in_use共用
+        self._pinned_models = {}
+        self._pin_count = 0
+        self._pin_lock = threading.Lock()
+        self.model_init_timings = {}
+        self._init_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix='model-init')
 
         # 初始化公式识别
         if self.apply_formula:
             # 初始化公式检测模型
-            self.mfd_model = atom_model_manager.get_atom_model(
+            self._atom_models['mfd'] = self._init_executor.submit(
+                self._init_atom_model,
+                'mfd',
                 atom_model_name=AtomicModel.MFD,
                 mfd_weights=str(
                     os.path.join(
@@ -107,6 +195,7 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                onnx_config=self.onnx_config,
             )
 
             # 初始化公式解析模型
@@ -114,16 +203,21 @@ class CustomPEKModel:
                 os.path.join(models_dir, self.configs['weights'][self.mfr_model_name])
             )
             mfr_cfg_path = str(os.path.join(model_config_dir, 'UniMERNet', 'demo.yaml'))
-            self.mfr_model = atom_model_manager.get_atom_model(
+            self._atom_models['mfr'] = self._init_executor.submit(
+                self._init_atom_model,
+                'mfr',
                 atom_model_name=AtomicModel.MFR,
                 mfr_weight_dir=mfr_weight_dir,
                 mfr_cfg_path=mfr_cfg_path,
                 device=self.device,
+                precision=self.precision,
             )
 
         # 初始化layout模型
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
-            self.layout_model = atom_model_manager.get_atom_model(
+            self._atom_models['layout'] = self._init_executor.submit(
+                self._init_atom_model,
+                'layout',
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.LAYOUTLMv3,
                 layout_weights=str(
@@ -139,7 +233,9 @@ class CustomPEKModel:
                 device=self.device,
             )
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
-            self.layout_model = atom_model_manager.get_atom_model(
+            self._atom_models['layout'] = self._init_executor.submit(
+                self._init_atom_model,
+                'layout',
                 atom_model_name=AtomicModel.Layout,
                 layout_model_name=MODEL_NAME.DocLayout_YOLO,
                 doclayout_yolo_weights=str(
@@ -148,78 +244,453 @@ class CustomPEKModel:
                     )
                 ),
                 device=self.device,
+                onnx_config=self.onnx_config,
             )
         # 初始化ocr
-        self.ocr_model = atom_model_manager.get_atom_model(
+        self._atom_models['ocr'] = self._init_executor.submit(
+            self._init_atom_model,
+            'ocr',
             atom_model_name=AtomicModel.OCR,
             ocr_show_log=show_log,
             det_db_box_thresh=0.3,
             lang=self.lang
         )
+        # 已提交的加载任务继续运行, 线程在加载结束后退出
+        self._init_executor.shutdown(wait=False)
+
+        # 流水线模式下各阶段在不同线程中运行, 同一模型同时只被一个线程调用
+        self._detect_lock = threading.Lock()
+        self._ocr_lock = threading.Lock()
+
         # init table model
+        # 表格模型在独立的子进程中加载和运行, 超过max_time的表格连同子进程一起被终止, 子进程在下一个表格前重启并重新加载表格模型
+        # 该模型不在AtomModelSingleton的ModelResidency中, 不计入model-residency-config的内存预算
+        self._table_runner = None
         if self.apply_table:
             table_model_dir = self.configs['weights'][self.table_model_name]
-            self.table_model = atom_model_manager.get_atom_model(
-                atom_model_name=AtomicModel.Table,
-                table_model_name=self.table_model_name,
-                table_model_path=str(os.path.join(models_dir, table_model_dir)),
-                table_max_time=self.table_max_time,
-                device=self.device,
+            self._table_runner = DeadlineRunner(
+                'table-recognition',
+                initializer=init_table_worker,
+                initargs=(
+                    self.table_model_name,
+                    str(os.path.join(models_dir, table_model_dir)),
+                    self.table_max_time,
+                    self.device,
+                ),
             )
+            # 子进程与其它模型同时加载表格模型
+            self._table_runner.start()
+
+        # doc_analyze把batch_size个页面一起送入batch_call
+        self.batch_size = self.layout_batch_size
+        if self.apply_formula:
+            self.batch_size = max(self.batch_size, self.mfd_batch_size)
 
         logger.info('DocAnalysis init done!')
 
+    def _init_atom_model(self, name: str, **kwargs):
+        self._atom_model_kwargs[name] = kwargs
+        if AtomModelSingleton().is_deferred(kwargs['atom_model_name']):
+            # 第一次使用时加载
+            return
+        model_init_start = time.time()
+        AtomModelSingleton().get_atom_model(**kwargs)
+        self.model_init_timings[name] = round(time.time() - model_init_start, 2)
+        logger.info(f'{name} model init cost: {self.model_init_timings[name]}')
+
+    def _get_atom_model(self, name: str):
+        if name not in self._atom_models:
+            raise AttributeError(f'{name} model is not enabled')
+        # 模型在in_use中已获取, 不再经过AtomModelSingleton, 也不会在处理中途被换出
+        model = self._pinned_models.get(name)
+        if model is not None:
+            return model
+        self._atom_models[name].result()
+        return AtomModelSingleton().get_atom_model(**self._atom_model_kwargs[name])
+
+    @property
+    def layout_model(self):
+        return self._get_atom_model('layout')
+
+    @property
+    def mfd_model(self):
+        return self._get_atom_model('mfd')
+
+    @property
+    def mfr_model(self):
+        return self._get_atom_model('mfr')
+
+    @property
+    def ocr_model(self):
+        return self._get_atom_model('ocr')
+
+    def wait_models(self) -> dict:
+        """Wait until all the models are loaded and the loading threads have
+        exited.
+
+        Returns:
+            dict: the load time in seconds of each model
+        """
+        for future in self._atom_models.values():
+            future.result()
+        self._init_executor.shutdown(wait=True)
+        return dict(self.model_init_timings)
+
+    def close_workers(self):
+        """Stop the worker processes of this instance, e.g. before a fork, the
+        next call starts them again."""
+        if self._table_runner is not None:
+            self._table_runner.close()
+
+    @contextmanager
+    def in_use(self):
+        """Keep the models of this instance loaded while the context is
+        active, the idle models are evicted only outside of it. The models are
+        resolved once when the outermost context is entered, the nested
+        contexts reuse them."""
+        self.wait_models()
+        atom_model_manager = AtomModelSingleton()
+        with self._pin_lock:
+            if self._pin_count == 0:
+                acquired = {}
+                try:
+                    for name, kwargs in self._atom_model_kwargs.items():
+                        acquired[name] = atom_model_manager.acquire_atom_model(**kwargs)
+                except BaseException:
+                    for name in acquired:
+                        atom_model_manager.release_atom_model(**self._atom_model_kwargs[name])
+                    raise
+                self._pinned_models = acquired
+            self._pin_count += 1
+        try:
+            yield self
+        finally:
+            with self._pin_lock:
+                self._pin_count -= 1
+                if self._pin_count == 0:
+                    for name in self._pinned_models:
+                        atom_model_manager.release_atom_model(**self._atom_model_kwargs[name])
+                    self._pinned_models = {}
+
     def __call__(self, image):
+        return self.batch_call([image])[0]
+
+    def batch_call(
+        self,
+        images: list,
+        mfr_queue: list | None = None,
+        math_hints: list | None = None,
+        page_stats: list | None = None,
+        text_layers: list | None = None,
+        resolution_plans: list | None = None,
+    ) -> list:
+        """Analyze several pages, the layout and formula detection models run
+        on batches of pages and the other models run page by page.
+
+        Args:
+            images (list): the RGB page images
+            mfr_queue (list | None, optional): queue the formulas for a later `mfr_recognize`, so that the formulas of
+                many pages are recognized together, the latex of the formulas stays empty until then.
+                Defaults to None, the formulas of the pages are recognized before return.
+            math_hints (list | None, optional): see `detect_pages`. Defaults to None.
+            page_stats (list | None, optional): see `detect_pages`. Defaults to None.
+            text_layers (list | None, optional): the text lines of each page for `ocr_page`. Defaults to None.
+            resolution_plans (list | None, optional): see `detect_pages`. Defaults to None.
+
+        Returns:
+            list: the layout_res of each page, in the order of images
+        """
+        # 每页的PIL/BGR等格式只转换一次, 所有模型共用
+        page_images = [PageImage(image) for image in images]
 
-        # layout检测
-        layout_start = time.time()
-        layout_res = []
+        with self.in_use():
+            layout_res_list = self.detect_pages(
+                page_images, mfr_queue=mfr_queue, math_hints=math_hints, page_stats=page_stats,
+                resolution_plans=resolution_plans,
+            )
+            if text_layers is None:
+                text_layers = [None] * len(page_images)
+            for page_image, layout_res, text_lines in zip(page_images, layout_res_list, text_layers):
+                table_ocr_res_list = self.ocr_page(page_image, layout_res, text_lines=text_lines)
+                self.table_page(page_image, layout_res, table_ocr_res_list=table_ocr_res_list)
+        return layout_res_list
+
+    def detect_pages(
+        self,
+        page_images: list,
+        mfr_queue: list | None = None,
+        math_hints: list | None = None,
+        page_stats: list | None = None,
+        resolution_plans: list | None = None,
+    ) -> list:
+        """Run layout and formula detection on a batch of pages, this is the
+        first stage of the pipelined doc_analyze.
+
+        Args:
+            page_images (list[PageImage]): the page images
+            mfr_queue (list | None, optional): see `batch_call`. Defaults to None.
+            math_hints (list | None, optional): whether the text layer of each page has math, None if unknown, used by
+                the formula prefilter, see `text_layer_math_hint`. Defaults to None, unknown for all pages.
+            page_stats (list | None, optional): a dict for each page, the formula prefilter sets 'formula_skipped' in
+                it. Defaults to None.
+            resolution_plans (list | None, optional): the detector input sizes and tiles of each page, see
+                `plan_page_resolution`, None for a page means the configured sizes. Defaults to None.
+
+        Returns:
+            list: the layout_res of each page, with the layout and formula items
+        """
+        with self._detect_lock:
+            # layout检测
+            layout_start = time.time()
+            if resolution_plans is None:
+                resolution_plans = [None] * len(page_images)
+            layout_res_list = self.layout_predict(page_images, resolution_plans)
+            layout_cost = round(time.time() - layout_start, 2)
+            logger.info(f'layout detection time: {layout_cost}, pages: {len(page_images)}')
+
+            if self.apply_formula:
+                formula_pages = list(range(len(page_images)))
+                if self.formula_prefilter:
+                    formula_pages = self.formula_prefilter_pages(page_images, layout_res_list, math_hints)
+                    if page_stats is not None:
+                        for index, stats in enumerate(page_stats):
+                            stats['formula_skipped'] = index not in formula_pages
+
+                # 公式检测
+                mfd_start = time.time()
+                mfd_res_list = self.mfd_predict(
+                    [page_images[index] for index in formula_pages], [resolution_plans[index] for index in formula_pages]
+                ) if formula_pages else []
+                logger.info(f'mfd time: {round(time.time() - mfd_start, 2)}, pages: {len(formula_pages)}')
+
+                # 公式的latex留空, 先把公式图片加入识别队列
+                queue = mfr_queue if mfr_queue is not None else []
+                for index, mfd_res in zip(formula_pages, mfd_res_list):
+                    page_image, layout_res = page_images[index], layout_res_list[index]
+                    formula_list, mf_image_list = self.mfr_model.get_formula_crops(mfd_res, page_image)
+                    layout_res.extend(formula_list)
+                    queue.append((formula_list, mf_image_list))
+                # 公式识别
+                if mfr_queue is None:
+                    self.mfr_recognize(queue)
+
+        return layout_res_list
+
+    def formula_prefilter_pages(self, page_images: list, layout_res_list: list, math_hints: list | None = None) -> list:
+        """Decide which pages need the formula detection and recognition. A
+        page needs them if the layout model finds an isolated formula or the
+        text layer has math, a page without reliable text layer is checked by
+        the formula detector at a low resolution.
+
+        Args:
+            page_images (list[PageImage]): the page images
+            layout_res_list (list): the layout_res of each page
+            math_hints (list | None, optional): see `detect_pages`. Defaults to None.
+
+        Returns:
+            list: the index of the pages which need the formula models
+        """
+        if math_hints is None:
+            math_hints = [None] * len(page_images)
+        formula_pages = []
+        unknown_pages = []
+        for index, (layout_res, math_hint) in enumerate(zip(layout_res_list, math_hints)):
+            if math_hint or any(int(res['category_id']) == CategoryId.InterlineEquation_Layout for res in layout_res):
+                formula_pages.append(index)
+            elif math_hint is None:
+                unknown_pages.append(index)
+
+        # 低分辨率的公式检测
+        if unknown_pages:
+            images = [page_images[index].rgb for index in unknown_pages]
+            mfd_res_list = self.mfd_model.batch_predict(images, self.mfd_batch_size, imgsz=self.prefilter_imgsz)
+            formula_pages.extend(index for index, mfd_res in zip(unknown_pages, mfd_res_list) if len(mfd_res.boxes) > 0)
+
+        formula_pages.sort()
+        logger.info(f'formula prefilter, skip formula models on {len(page_images) - len(formula_pages)} of {len(page_images)} pages')
+        return formula_pages
+
+    def layout_predict(self, page_images: list, resolution_plans: list | None = None) -> list:
+        """Run the layout model on the pages, layout_batch_size pages in each
+        model call.
+
+        Args:
+            page_images (list[PageImage]): the page images
+            resolution_plans (list | None, optional): see `detect_pages`, only DocLayout-YOLO follows the plans.
+                Defaults to None.
+
+        Returns:
+            list: the layout_res of each page
+        """
+        layout_res_list = []
         if self.layout_model_name == MODEL_NAME.LAYOUTLMv3:
             # layoutlmv3
-            layout_res = self.layout_model(image, ignore_catids=[])
+            images = [page_image.rgb for page_image in page_images]
+            if len(images) == 1:
+                layout_res_list = [self.layout_model(images[0], ignore_catids=[])]
+            else:
+                layout_res_list = self.layout_model.batch_predict(images, self.layout_batch_size, ignore_catids=[])
         elif self.layout_model_name == MODEL_NAME.DocLayout_YOLO:
-            # doclayout_yolo
-            img_pil = Image.fromarray(image)
-            width, height = img_pil.size
-            # logger.info(f'width: {width}, height: {height}')
-            input_res = {"poly":[0,0,width,0,width,height,0,height]}
-            new_image, useful_list = crop_img(input_res, img_pil, crop_paste_x=width//2, crop_paste_y=0)
-            paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
-            layout_res = self.layout_model.predict(new_image)
-            for res in layout_res:
-                p1, p2, p3, p4, p5, p6, p7, p8 = res['poly']
-                p1 = p1 - paste_x + xmin
-                p2 = p2 - paste_y + ymin
-                p3 = p3 - paste_x + xmin
-                p4 = p4 - paste_y + ymin
-                p5 = p5 - paste_x + xmin
-                p6 = p6 - paste_y + ymin
-                p7 = p7 - paste_x + xmin
-                p8 = p8 - paste_y + ymin
-                res['poly'] = [p1, p2, p3, p4, p5, p6, p7, p8]
-
-        layout_cost = round(time.time() - layout_start, 2)
-        logger.info(f'layout detection time: {layout_cost}')
-
-        pil_img = Image.fromarray(image)
+            if resolution_plans is None:
+                resolution_plans = [None] * len(page_images)
+            layout_res_list = [None] * len(page_images)
+            # 输入尺寸相同的页面一起检测
+            imgsz_groups = {}
+            for index, plan in enumerate(resolution_plans):
+                imgsz = plan['layout_imgsz'] if plan else self.layout_imgsz
+                imgsz_groups.setdefault(imgsz, []).append(index)
+            for imgsz, indexes in imgsz_groups.items():
+                # doclayout_yolo, 页面左右各填充半个页宽的白边后再检测
+                paste_x_list = []
+                padded_images = []
+                for index in indexes:
+                    page_image = page_images[index]
+                    paste_x = page_image.width // 2
+                    # yolo的numpy输入为BGR格式
+                    padded_image, _ = page_image.crop(
+                        {'poly': [0, 0, page_image.width, 0, page_image.width, page_image.height, 0, page_image.height]},
+                        crop_paste_x=paste_x, crop_paste_y=0, mode='bgr'
+                    )
+                    paste_x_list.append(paste_x)
+                    padded_images.append(padded_image)
+                if len(padded_images) == 1:
+                    group_res_list = [self.layout_model.predict(padded_images[0], imgsz=imgsz)]
+                else:
+                    group_res_list = self.layout_model.batch_predict(padded_images, self.layout_batch_size, imgsz=imgsz)
+                for index, layout_res, paste_x in zip(indexes, group_res_list, paste_x_list):
+                    for res in layout_res:
+                        poly = res['poly']
+                        res['poly'] = [p - paste_x if i % 2 == 0 else p for i, p in enumerate(poly)]
+                    layout_res_list[index] = layout_res
+            # 超大页面的小目标在分块上检测
+            for index, plan in enumerate(resolution_plans):
+                if plan and plan['layout_tile']:
+                    layout_res_list[index] = self.layout_tiled_predict(page_images[index], layout_res_list[index], plan)
+        return layout_res_list
+
+    def layout_tiled_predict(self, page_image, layout_res: list, plan: dict) -> list:
+        """Run the layout model on the overlapping tiles of the page and merge
+        the tile detections with the whole page detection.
+
+        Args:
+            page_image (PageImage): the page image
+            layout_res (list): the layout_res of the whole page
+            plan (dict): the resolution plan of the page, see `plan_page_resolution`
+
+        Returns:
+            list: the merged layout_res
+        """
+        width, height = page_image.width, page_image.height
+        tiles = get_tiles(width, height, plan['layout_tile'] * max(width, height), plan['tile_overlap'])
+        tile_images = [np.ascontiguousarray(page_image.bgr[y0:y1, x0:x1]) for x0, y0, x1, y1 in tiles]
+        tile_res_list = self.layout_model.batch_predict(tile_images, self.layout_batch_size, imgsz=plan['layout_imgsz'])
+        xyxy, conf, cls = merge_tiled_detections(
+            layout_res_to_dets(layout_res), [layout_res_to_dets(res) for res in tile_res_list], tiles, width, height
+        )
+        logger.info(f'layout detection on {len(tiles)} tiles, {len(xyxy)} boxes')
+        return dets_to_layout_res(xyxy, conf, cls)
 
-        if self.apply_formula:
-            # 公式检测
-            mfd_start = time.time()
-            mfd_res = self.mfd_model.predict(image)
-            logger.info(f'mfd time: {round(time.time() - mfd_start, 2)}')
-
-            # 公式识别
-            mfr_start = time.time()
-            formula_list = self.mfr_model.predict(mfd_res, image)
-            layout_res.extend(formula_list)
-            mfr_cost = round(time.time() - mfr_start, 2)
-            logger.info(f'formula nums: {len(formula_list)}, mfr time: {mfr_cost}')
+    def mfd_predict(self, page_images: list, resolution_plans: list | None = None) -> list:
+        """Run the formula detection model on the pages, mfd_batch_size pages
+        in each model call.
+
+        Args:
+            page_images (list[PageImage]): the page images
+            resolution_plans (list | None, optional): see `detect_pages`. Defaults to None.
+
+        Returns:
+            list: the mfd_res of each page
+        """
+        if resolution_plans is None:
+            resolution_plans = [None] * len(page_images)
+        mfd_res_list = [None] * len(page_images)
+        # 输入尺寸相同的页面一起检测
+        imgsz_groups = {}
+        for index, plan in enumerate(resolution_plans):
+            imgsz = plan['mfd_imgsz'] if plan else self.mfd_imgsz
+            imgsz_groups.setdefault(imgsz, []).append(index)
+        for imgsz, indexes in imgsz_groups.items():
+            images = [page_images[index].rgb for index in indexes]
+            if len(images) == 1:
+                group_res_list = [self.mfd_model.predict(images[0], imgsz=imgsz)]
+            else:
+                group_res_list = self.mfd_model.batch_predict(images, self.mfd_batch_size, imgsz=imgsz)
+            for index, mfd_res in zip(indexes, group_res_list):
+                mfd_res_list[index] = mfd_res
+        # 超大页面的公式在分块上检测
+        for index, plan in enumerate(resolution_plans):
+            if plan and plan['mfd_tile']:
+                mfd_res_list[index] = self.mfd_tiled_predict(page_images[index], mfd_res_list[index], plan)
+        return mfd_res_list
+
+    def mfd_tiled_predict(self, page_image, mfd_res, plan: dict):
+        """Run the formula detection model on the overlapping tiles of the page
+        and merge the tile detections with the whole page detection.
+
+        Args:
+            page_image (PageImage): the page image
+            mfd_res (ultralytics.engine.results.Results): the formula detection result of the whole page
+            plan (dict): the resolution plan of the page, see `plan_page_resolution`
+
+        Returns:
+            ultralytics.engine.results.Results: the merged result
+        """
+        def to_dets(res):
+            boxes = res.boxes
+            return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()
+
+        width, height = page_image.width, page_image.height
+        tiles = get_tiles(width, height, plan['mfd_tile'] * max(width, height), plan['tile_overlap'])
+        tile_images = [np.ascontiguousarray(page_image.rgb[y0:y1, x0:x1]) for x0, y0, x1, y1 in tiles]
+        tile_res_list = self.mfd_model.batch_predict(tile_images, self.mfd_batch_size, imgsz=plan['mfd_imgsz'])
+        xyxy, conf, cls = merge_tiled_detections(
+            to_dets(mfd_res), [to_dets(res) for res in tile_res_list], tiles, width, height
+        )
+        logger.info(f'mfd on {len(tiles)} tiles, {len(xyxy)} formulas')
+        merged_res = mfd_res.new()
+        merged_res.update(boxes=torch.from_numpy(np.concatenate([xyxy, conf[:, None], cls[:, None]], axis=1)))
+        return merged_res
+
+    def mfr_recognize(self, mfr_queue: list):
+        """Recognize the formulas queued by batch_call, the latex is filled in
+        the formula items of the pages and the queue is emptied.
 
+        Args:
+            mfr_queue (list): [(formula_list, mf_image_list), ...] of the queued pages
+        """
+        formula_list = []
+        mf_image_list = []
+        for page_formula_list, page_mf_image_list in mfr_queue:
+            formula_list.extend(page_formula_list)
+            mf_image_list.extend(page_mf_image_list)
+        mfr_queue.clear()
+        if len(formula_list) == 0:
+            return
+
+        mfr_start = time.time()
+        self.mfr_model.batch_recognize(formula_list, mf_image_list, batch_size=self.mfr_batch_size)
+        mfr_cost = round(time.time() - mfr_start, 2)
+        logger.info(f'formula nums: {len(formula_list)}, mfr time: {mfr_cost}')
+
+    def ocr_page(self, page_image, layout_res, text_lines: list | None = None):
+        """OCR the text regions of the page, the results are appended to
+        layout_res.
+
+        Args:
+            page_image (PageImage): the page image
+            layout_res (list): the layout_res of the page returned by `detect_pages`
+            text_lines (list | None, optional): the text lines of the pdf text layer returned by
+                `get_text_layer_lines`, in TXT mode the text boxes of the regions are taken from them and the text
+                detection only runs on the regions without text layer. Defaults to None.
+
+        Returns:
+            list | None: the text lines of each table region for `table_page`, None if the table model does not
+                take text lines or the page is not OCRed
+        """
         # 清理显存
         clean_vram(self.device, vram_threshold=8)
 
-        # 从layout_res中获取ocr区域、表格区域、公式区域
+        # 从layout_res中获取ocr区域、公式区域
         ocr_res_list, table_res_list, single_page_mfdetrec_res = (
             get_res_list_from_layout_res(layout_res)
         )
@@ -227,19 +698,49 @@ class CustomPEKModel:
         # ocr识别
         ocr_start = time.time()
         # Process each area that requires OCR processing
+        new_image_list, useful_list_list, adjusted_mfdetrec_res_list = [], [], []
         for res in ocr_res_list:
-            new_image, useful_list = crop_img(res, pil_img, crop_paste_x=50, crop_paste_y=50)
+            new_image, useful_list = page_image.crop(res, crop_paste_x=50, crop_paste_y=50, mode='bgr')
             adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list)
+            new_image_list.append(new_image)
+            useful_list_list.append(useful_list)
+            adjusted_mfdetrec_res_list.append(adjusted_mfdetrec_res)
+
+        # RapidTable的文本行也由页面OCR识别, 不再用表格模型自己的OCR重复识别
+        ocr_tables = self.apply_ocr and self.apply_table and self.table_model_name == MODEL_NAME.RAPID_TABLE
+        table_image_list, table_useful_list = [], []
+        if ocr_tables:
+            for res in table_res_list:
+                new_image, useful_list = page_image.crop(res, crop_paste_x=50, crop_paste_y=50, mode='bgr')
+                table_image_list.append(new_image)
+                table_useful_list.append(useful_list)
 
-            # OCR recognition
-            new_image = cv2.cvtColor(np.asarray(new_image), cv2.COLOR_RGB2BGR)
-
+        # OCR recognition, 各区域分别检测文本行, 整页的文本行一起识别
+        with self._ocr_lock:
             if self.apply_ocr:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res)[0]
+                region_ocr_res_list = self.ocr_model.batch_ocr(
+                    new_image_list + table_image_list,
+                    mfd_res_list=adjusted_mfdetrec_res_list + [None] * len(table_image_list),
+                )
+                region_ocr_res_list, table_ocr_res_list = (
+                    region_ocr_res_list[:len(new_image_list)], region_ocr_res_list[len(new_image_list):]
+                )
             else:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                region_ocr_res_list = []
+                for new_image, useful_list, adjusted_mfdetrec_res in zip(
+                    new_image_list, useful_list_list, adjusted_mfdetrec_res_list
+                ):
+                    # TXT模式下的文本框直接取自pdf文本层, 只有没有文本层的区域才运行文本检测
+                    text_boxes = crop_text_layer_boxes(text_lines, useful_list) if text_lines else []
+                    if text_boxes:
+                        region_ocr_res_list.append(get_text_layer_det_res(text_boxes, adjusted_mfdetrec_res))
+                    else:
+                        region_ocr_res_list.append(
+                            self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                        )
 
-            # Integration results
+        # Integration results
+        for ocr_res, useful_list in zip(region_ocr_res_list, useful_list_list):
             if ocr_res:
                 ocr_result_list = get_ocr_result_list(ocr_res, useful_list)
                 layout_res.extend(ocr_result_list)
@@ -250,29 +751,46 @@ class CustomPEKModel:
         else:
             logger.info(f"det time: {ocr_cost}")
 
+        if ocr_tables:
+            return [
+                get_table_ocr_result(ocr_res, useful_list)
+                for ocr_res, useful_list in zip(table_ocr_res_list, table_useful_list)
+            ]
+        return None
+
+    def table_page(self, page_image, layout_res, table_ocr_res_list: list | None = None):
+        """Recognize the tables of the page, the html is set on the table
+        items of layout_res.
+
+        Args:
+            page_image (PageImage): the page image
+            layout_res (list): the layout_res of the page returned by `detect_pages`
+            table_ocr_res_list (list | None, optional): the text lines of each table returned by `ocr_page`.
+                Defaults to None, the table model recognizes the text itself.
+        """
         # 表格识别 table recognition
         if self.apply_table:
+            _, table_res_list, _ = get_res_list_from_layout_res(layout_res)
+            if table_ocr_res_list is None:
+                table_ocr_res_list = [None] * len(table_res_list)
             table_start = time.time()
-            for res in table_res_list:
-                new_image, _ = crop_img(res, pil_img)
-                single_table_start_time = time.time()
-                html_code = None
-                if self.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
-                    with torch.no_grad():
-                        table_result = self.table_model.predict(new_image, 'html')
-                        if len(table_result) > 0:
-                            html_code = table_result[0]
-                elif self.table_model_name == MODEL_NAME.TABLE_MASTER:
-                    html_code = self.table_model.img2html(new_image)
-                elif self.table_model_name == MODEL_NAME.RAPID_TABLE:
-                    html_code, table_cell_bboxes, elapse = self.table_model.predict(
-                        new_image
+            for res, table_ocr_res in zip(table_res_list, table_ocr_res_list):
+                new_image, _ = page_image.crop(res)
+                try:
+                    html_code = self._table_runner.run(
+                        table_predict, new_image, table_ocr_res, timeout=self.table_max_time
                     )
-                run_time = time.time() - single_table_start_time
-                if run_time > self.table_max_time:
+                except TimeoutError:
+                    # 超时的表格保留为图片, 不输出html
                     logger.warning(
                         f'table recognition processing exceeds max time {self.table_max_time}s'
                     )
+                    res['timeout'] = True
+                    continue
+                except Exception as e:
+                    # 表格模型出错或子进程退出时该表格同样保留为图片, 不中断整个文档
+                    logger.exception(e)
+                    continue
                 # 判断是否返回正常
                 if html_code:
                     expected_ending = html_code.strip().endswith(
@@ -289,5 +807,3 @@ class CustomPEKModel:
                         'table recognition processing fails, not get html return'
                     )
             logger.info(f'table time: {round(time.time() - table_start, 2)}')
-
-        return layout_res
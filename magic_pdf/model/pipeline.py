@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+import queue
+import threading
+import weakref
+from typing import Callable, Iterable, Iterator
+
+# marks the end of the items in a queue
+_END = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable, workers: int = 1):
+        """A stage of StagePipeline.
+
+        Args:
+            name (str): the name of the stage, used in logs and errors
+            fn (Callable): called with each input item, returns an iterable of output items for the next stage
+            workers (int, optional): the number of threads running fn. Defaults to 1.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(workers, 1)
+
+
+class StagePipeline:
+    def __init__(self, stages: list[Stage], queue_size: int = 2):
+        """Run stages concurrently, each stage has its own worker threads and
+        the stages are connected by bounded queues, so the item i + 1 can be
+        in the first stage while the item i is in the second stage.
+
+        Args:
+            stages (list[Stage]): the stages in order
+            queue_size (int, optional): the max number of items waiting between two stages. Defaults to 2.
+        """
+        self._stages = stages
+        self._queue_size = max(queue_size, 1)
+
+    def run(self, items: Iterable) -> Iterator:
+        """Feed the items to the first stage and yield the outputs of the last
+        stage, the outputs are yielded in the order they are completed, which is
+        not the order of the items when a stage has several workers.
+
+        Args:
+            items (Iterable): the input items, consumed by a feeder thread
+
+        Raises:
+            Exception: the first exception raised by a stage, the pipeline is stopped
+
+        Yields:
+            Any: the outputs of the last stage
+        """
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in range(len(self._stages) + 1)]
+        stop = threading.Event()
+        errors = []
+        lock = threading.Lock()
+        finished = [0] * len(self._stages)
+
+        def put(q, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def fail(e: Exception):
+            with lock:
+                errors.append(e)
+            stop.set()
+
+        def feed():
+            try:
+                for item in items:
+                    if not put(queues[0], item):
+                        return
+            except Exception as e:  # noqa
+                fail(e)
+            finally:
+                for _ in range(self._stages[0].workers):
+                    put(queues[0], _END)
+
+        def work(index: int):
+            stage = self._stages[index]
+            try:
+                while True:
+                    item = get(queues[index])
+                    if item is _END:
+                        break
+                    for output in stage.fn(item):
+                        if not put(queues[index + 1], output):
+                            return
+            except Exception as e:  # noqa
+                fail(e)
+            finally:
+                with lock:
+                    finished[index] += 1
+                    last_worker = finished[index] == stage.workers
+                if last_worker:
+                    next_workers = self._stages[index + 1].workers if index + 1 < len(self._stages) else 1
+                    for _ in range(next_workers):
+                        put(queues[index + 1], _END)
+
+        threads = [threading.Thread(target=feed, name='pipeline-feed', daemon=True)]
+        for index, stage in enumerate(self._stages):
+            for worker_id in range(stage.workers):
+                threads.append(threading.Thread(target=work, args=(index,), name=f'pipeline-{stage.name}-{worker_id}', daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                output = get(queues[-1])
+                if output is _END:
+                    break
+                yield output
+        finally:
+            # the threads have finished unless the consumer stopped early or a stage failed
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+
+def _deadline_worker(conn, initializer: Callable | None, initargs: tuple):
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+    except Exception as e:  # noqa
+        conn.send((False, e))
+        return
+    conn.send((True, None))
+    while True:
+        try:
+            fn, args, kwargs = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = (True, fn(*args, **kwargs))
+        except Exception as e:  # noqa
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:  # noqa
+            # the return value or the exception can not be pickled
+            conn.send((False, RuntimeError(f'{type(e).__name__}: {e}')))
+
+
+def _stop_worker(worker: dict):
+    # a worker inherited through a fork belongs to the parent process
+    if worker.get('pid') != os.getpid():
+        return
+    worker['conn'].close()
+    if worker['process'].is_alive():
+        worker['process'].kill()
+    worker['process'].join()
+    worker.clear()
+
+
+class DeadlineRunner:
+    def __init__(
+        self,
+        name: str = 'deadline',
+        initializer: Callable | None = None,
+        initargs: tuple = (),
+        start_method: str = 'spawn',
+    ):
+        """Run calls in a dedicated worker process with a deadline. A call
+        exceeding its deadline is killed with the worker, the worker is
+        restarted for the next call, so a runaway call neither blocks the
+        caller longer than the deadline nor delays the later calls.
+
+        Args:
+            name (str, optional): the name of the worker process. Defaults to 'deadline'.
+            initializer (Callable | None, optional): called with initargs when a worker starts, e.g. to load a
+                model in the worker. Defaults to None.
+            initargs (tuple, optional): the arguments of initializer. Defaults to ().
+            start_method (str, optional): the multiprocessing start method, forking a process which has loaded
+                models is not safe. Defaults to 'spawn'.
+        """
+        self._name = name
+        self._initializer = initializer
+        self._initargs = initargs
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        # {'process', 'conn', 'pid': the owner process, 'ready': the initializer has finished}
+        self._worker = {}
+        # the worker is stopped when the runner is garbage collected, e.g. with an evicted model
+        weakref.finalize(self, _stop_worker, self._worker)
+
+    def _ensure_started(self):
+        if self._worker.get('pid') == os.getpid():
+            if self._worker['process'].is_alive():
+                return
+            _stop_worker(self._worker)
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_deadline_worker,
+            args=(child_conn, self._initializer, self._initargs),
+            name=self._name,
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._worker.clear()
+        self._worker.update(process=process, conn=parent_conn, pid=os.getpid(), ready=False)
+
+    def _wait_ready(self):
+        if self._worker['ready']:
+            return
+        try:
+            ok, error = self._worker['conn'].recv()
+        except EOFError:
+            ok, error = False, RuntimeError(f'{self._name} worker exited during its initialization')
+        if not ok:
+            _stop_worker(self._worker)
+            raise error
+        self._worker['ready'] = True
+
+    def start(self):
+        """Start the worker without waiting for its initializer, the first
+        call waits for it."""
+        with self._lock:
+            self._ensure_started()
+
+    def run(self, fn: Callable, *args, timeout: float | None = None, **kwargs):
+        """Call fn(*args, **kwargs) in the worker process.
+
+        Args:
+            fn (Callable): the function to call, fn and its arguments are pickled to the worker
+            timeout (float | None, optional): the deadline in seconds, counted from the start of the call, the
+                start of the worker is not counted. Defaults to None, no deadline.
+
+        Raises:
+            TimeoutError: fn did not return before the deadline, the worker is killed
+            RuntimeError: the worker exited during the call
+
+        Returns:
+            Any: the return value of fn, the exception raised by fn is re-raised
+        """
+        with self._lock:
+            self._ensure_started()
+            self._wait_ready()
+            conn = self._worker['conn']
+            conn.send((fn, args, kwargs))
+            if not conn.poll(timeout):
+                _stop_worker(self._worker)
+                raise TimeoutError(f'{self._name} exceeds the deadline of {timeout}s')
+            try:
+                ok, result = conn.recv()
+            except EOFError:
+                _stop_worker(self._worker)
+                raise RuntimeError(f'{self._name} worker exited during the call') from None
+        if ok:
+            return result
+        raise result
+
+    def close(self):
+        """Stop the worker, the next call starts a new one."""
+        with self._lock:
+            _stop_worker(self._worker)
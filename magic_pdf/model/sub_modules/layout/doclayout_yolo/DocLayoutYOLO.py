@@ -1,14 +1,60 @@
 from doclayout_yolo import YOLOv10
 
+from magic_pdf.model.sub_modules.onnx_backend import (export_yolo_onnx,
+                                                      load_yolo_onnx)
+
 
 class DocLayoutYOLOModel(object):
-    def __init__(self, weight, device):
-        self.model = YOLOv10(weight)
-        self.device = device
+    def __init__(self, weight, device, onnx_config: dict | None = None):
+        """DocLayout-YOLO layout model.
+
+        Args:
+            weight (str): the path of the weights
+            device (str): the device of the torch model
+            onnx_config (dict | None, optional): run the model on ONNX Runtime CPU,
+                {'cache_dir': str, 'intra_op_num_threads': int, 'inter_op_num_threads': int}. Defaults to None, torch.
+        """
+        if onnx_config is not None:
+            onnx_path = export_yolo_onnx(YOLOv10, weight, onnx_config['cache_dir'])
+            self.model = load_yolo_onnx(
+                YOLOv10,
+                onnx_path,
+                imgsz=1024,
+                intra_op_num_threads=onnx_config.get('intra_op_num_threads', 0),
+                inter_op_num_threads=onnx_config.get('inter_op_num_threads', 0),
+            )
+            self.device = 'cpu'
+        else:
+            self.model = YOLOv10(weight)
+            self.device = device
+
+    def predict(self, image, imgsz=1024):
+        doclayout_yolo_res = self.model.predict(image, imgsz=imgsz, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
+        return self._parse_res(doclayout_yolo_res)
+
+    def batch_predict(self, images: list, batch_size: int, imgsz=1024) -> list:
+        """Predict the layout of a list of images, batch_size images are sent
+        to the model in each call.
+
+        Args:
+            images (list): the page images
+            batch_size (int): the number of images in each model call
+            imgsz (int, optional): the inference size of the model. Defaults to 1024.
+
+        Returns:
+            list: the layout_res of each image, in the order of images
+        """
+        layout_res_list = []
+        for index in range(0, len(images), batch_size):
+            doclayout_yolo_res_list = self.model.predict(
+                images[index: index + batch_size], imgsz=imgsz, conf=0.25, iou=0.45, verbose=False, device=self.device
+            )
+            layout_res_list.extend(self._parse_res(doclayout_yolo_res) for doclayout_yolo_res in doclayout_yolo_res_list)
+        return layout_res_list
 
-    def predict(self, image):
+    @staticmethod
+    def _parse_res(doclayout_yolo_res):
         layout_res = []
-        doclayout_yolo_res = self.model.predict(image, imgsz=1024, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
         for xyxy, conf, cla in zip(doclayout_yolo_res.boxes.xyxy.cpu(), doclayout_yolo_res.boxes.conf.cpu(),
                                    doclayout_yolo_res.boxes.cls.cpu()):
             xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
@@ -18,4 +64,4 @@ class DocLayoutYOLOModel(object):
                 'score': round(float(conf.item()), 3),
             }
             layout_res.append(new_item)
-        return layout_res
\ No newline at end of file
+        return layout_res
@@ -1,3 +1,5 @@
+import torch
+
 from .visualizer import Visualizer
 from .rcnn_vl import *
 from .backbone import *
@@ -130,11 +132,37 @@ class Layoutlmv3_Predictor(object):
         # page_layout_result = {
         #     "layout_dets": []
         # }
-        layout_dets = []
         outputs = self.predictor(image)
-        boxes = outputs["instances"].to("cpu")._fields["pred_boxes"].tensor.tolist()
-        labels = outputs["instances"].to("cpu")._fields["pred_classes"].tolist()
-        scores = outputs["instances"].to("cpu")._fields["scores"].tolist()
+        return self._parse_outputs(outputs, ignore_catids)
+
+    def batch_predict(self, images, batch_size, ignore_catids=[]):
+        """
+        Predict the layout of several pages in one forward pass, the inputs are
+        prepared the same way as DefaultPredictor.__call__.
+        """
+        layout_dets_list = []
+        for index in range(0, len(images), batch_size):
+            inputs = []
+            for original_image in images[index: index + batch_size]:
+                if self.predictor.input_format == "RGB":
+                    original_image = original_image[:, :, ::-1]
+                height, width = original_image.shape[:2]
+                image = self.predictor.aug.get_transform(original_image).apply_image(original_image)
+                image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+                inputs.append({"image": image, "height": height, "width": width})
+            with torch.no_grad():
+                outputs_list = self.predictor.model(inputs)
+            for outputs in outputs_list:
+                layout_dets_list.append(self._parse_outputs(outputs, ignore_catids))
+        return layout_dets_list
+
+    @staticmethod
+    def _parse_outputs(outputs, ignore_catids):
+        layout_dets = []
+        instances = outputs["instances"].to("cpu")
+        boxes = instances._fields["pred_boxes"].tensor.tolist()
+        labels = instances._fields["pred_classes"].tolist()
+        scores = instances._fields["scores"].tolist()
         for bbox_idx in range(len(boxes)):
             if labels[bbox_idx] in ignore_catids:
                 continue
@@ -0,0 +1,75 @@
+import re
+
+import fitz
+
+# 公式常用字体, 子集字体名的前缀(ABCDEF+)已去除
+MATH_FONT_PATTERN = re.compile(
+    r'CMMI|CMSY|CMEX|CMBSY|MSAM|MSBM|EUFM|EUSM|RSFS|ESINT|STIX|XITS|Euclid|MT-?Extra|MathematicalPi|Symbol|Math',
+    re.IGNORECASE,
+)
+
+# 数学运算符、箭头和数学字母数字符号, 希腊字母也用于希腊语正文, 不作为判断依据
+MATH_GLYPH_PATTERN = re.compile(
+    '[±×÷←-⇿∀-⋿⟀-⟯⦀-⧿⨀-⫿'
+    '\U0001d400-\U0001d7ff]'
+)
+
+# 正文字体中用ASCII字符排版的行内公式, 如 x = a + b, f(x), a/b, x^2
+ASCII_MATH_PATTERN = re.compile(
+    r'(?:(?<![\w.])[A-Za-z]|\))\s*[=<>]\s*[-\w(]'
+    r'|(?<![\w\'])[A-Za-z]\s*[+*/^]\s*[A-Za-z0-9](?!\w)'
+    r'|(?<!\w)[A-Za-z]\([A-Za-z0-9]+(?:,\s*[A-Za-z0-9]+)*\)'
+)
+
+# Symbol等字体也常用来显示列表的项目符号, 只有项目符号的span不算公式
+BULLET_PATTERN = re.compile('[\\s•·‣▪●◦-]*')
+
+# 文本层的字符少于该值时, 认为页面没有可用的文本层
+MIN_TEXT_CHARS = 20
+
+# 图片覆盖页面的比例超过该值时, 文本层可能是扫描件的OCR结果, 不作为判断依据
+MAX_IMAGE_COVERAGE = 0.5
+
+
+def text_layer_math_hint(page: fitz.Page, text_dict: dict | None = None) -> bool | None:
+    """Check the text layer of the page for math, the math fonts (e.g.
+    CMMI, CMSY, Cambria Math), the math operator glyphs and the inline math
+    set with ASCII chars in the text font (e.g. x = a + b, f(x)).
+
+    Args:
+        page (fitz.Page): the pdf page
+        text_dict (dict | None, optional): the text layer from page.get_text('dict', flags=0), extracted from the
+            page if None. Defaults to None.
+
+    Returns:
+        bool | None: whether the text layer has math, None if the page has no reliable text layer (e.g. scanned pages),
+            the formula detector has to decide then
+    """
+    page_area = abs(page.rect)
+    if page_area == 0:
+        return None
+    image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+    if image_area / page_area > MAX_IMAGE_COVERAGE:
+        return None
+
+    if text_dict is None:
+        text_dict = page.get_text('dict', flags=0)
+    text_chars = 0
+    has_math = False
+    for block in text_dict['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                text = span['text']
+                text_chars += len(text) - text.count(' ')
+                if has_math:
+                    continue
+                font = span['font'].split('+')[-1]
+                if MATH_FONT_PATTERN.search(font) and not BULLET_PATTERN.fullmatch(text):
+                    has_math = True
+                elif MATH_GLYPH_PATTERN.search(text) or ASCII_MATH_PATTERN.search(text):
+                    has_math = True
+    if has_math:
+        return True
+    if text_chars < MIN_TEXT_CHARS:
+        return None
+    return False
@@ -1,12 +1,54 @@
 from ultralytics import YOLO
 
+from magic_pdf.model.sub_modules.onnx_backend import (export_yolo_onnx,
+                                                      load_yolo_onnx)
+
 
 class YOLOv8MFDModel(object):
-    def __init__(self, weight, device='cpu'):
-        self.mfd_model = YOLO(weight)
-        self.device = device
+    def __init__(self, weight, device='cpu', onnx_config: dict | None = None):
+        """YOLOv8 formula detection model.
+
+        Args:
+            weight (str): the path of the weights
+            device (str, optional): the device of the torch model. Defaults to 'cpu'.
+            onnx_config (dict | None, optional): run the model on ONNX Runtime CPU, see `DocLayoutYOLOModel`.
+                Defaults to None, torch.
+        """
+        if onnx_config is not None:
+            onnx_path = export_yolo_onnx(YOLO, weight, onnx_config['cache_dir'])
+            self.mfd_model = load_yolo_onnx(
+                YOLO,
+                onnx_path,
+                imgsz=1888,
+                intra_op_num_threads=onnx_config.get('intra_op_num_threads', 0),
+                inter_op_num_threads=onnx_config.get('inter_op_num_threads', 0),
+            )
+            self.device = 'cpu'
+        else:
+            self.mfd_model = YOLO(weight)
+            self.device = device
 
-    def predict(self, image):
-        mfd_res = self.mfd_model.predict(image, imgsz=1888, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
+    def predict(self, image, imgsz=1888):
+        mfd_res = self.mfd_model.predict(image, imgsz=imgsz, conf=0.25, iou=0.45, verbose=True, device=self.device)[0]
         return mfd_res
 
+    def batch_predict(self, images: list, batch_size: int, imgsz=1888) -> list:
+        """Detect the formulas of a list of images, batch_size images are sent
+        to the model in each call.
+
+        Args:
+            images (list): the page images
+            batch_size (int): the number of images in each model call
+            imgsz (int, optional): the inference size of the model. Defaults to 1888.
+
+        Returns:
+            list: the mfd_res of each image, in the order of images
+        """
+        mfd_res_list = []
+        for index in range(0, len(images), batch_size):
+            mfd_res_list.extend(
+                self.mfd_model.predict(
+                    images[index: index + batch_size], imgsz=imgsz, conf=0.25, iou=0.45, verbose=False, device=self.device
+                )
+            )
+        return mfd_res_list
@@ -10,6 +10,9 @@ from unimernet.common.config import Config
 import unimernet.tasks as tasks
 from unimernet.processors import load_processor
 
+from magic_pdf.config.constants import PRECISION_MODE
+from magic_pdf.model.sub_modules.model_utils import PageImage, apply_precision
+
 
 class MathDataset(Dataset):
     def __init__(self, image_paths, transform=None):
@@ -50,7 +53,7 @@ def latex_rm_whitespace(s: str):
 
 
 class UnimernetModel(object):
-    def __init__(self, weight_dir, cfg_path, _device_='cpu'):
+    def __init__(self, weight_dir, cfg_path, _device_='cpu', precision=PRECISION_MODE.AUTO):
 
         args = argparse.Namespace(cfg_path=cfg_path, options=None)
         cfg = Config(args)
@@ -62,13 +65,43 @@ class UnimernetModel(object):
         self.device = _device_
         self.model.to(_device_)
         self.model.eval()
+        self.model = apply_precision(self.model, precision, _device_)
+        # int8-dynamic quantized models still take fp32 inputs
+        self.dtype = torch.bfloat16 if precision == PRECISION_MODE.BF16 else torch.float32
         vis_processor = load_processor('formula_image_eval', cfg.config.datasets.formula_rec_eval.vis_processor.eval)
         self.mfr_transform = transforms.Compose([vis_processor, ])
 
     def predict(self, mfd_res, image):
 
+        formula_list, mf_image_list = self.get_formula_crops(mfd_res, PageImage(image))
+
+        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
+        dataloader = DataLoader(dataset, batch_size=64, num_workers=0)
+        mfr_res = []
+        for mf_img in dataloader:
+            mf_img = mf_img.to(self.device, dtype=self.dtype)
+            with torch.no_grad():
+                output = self.model.generate({'image': mf_img})
+            mfr_res.extend(output['pred_str'])
+        for res, latex in zip(formula_list, mfr_res):
+            res['latex'] = latex_rm_whitespace(latex)
+        return formula_list
+
+    @staticmethod
+    def get_formula_crops(mfd_res, page_image: PageImage):
+        """Build the formula items of the mfd result and crop their images,
+        the latex of the items is empty until they are recognized.
+
+        Args:
+            mfd_res (ultralytics.engine.results.Results): the formula detection result of the page
+            page_image (PageImage): the page image
+
+        Returns:
+            tuple: (formula_list, mf_image_list)
+        """
         formula_list = []
         mf_image_list = []
+        pil_img = page_image.pil
         for xyxy, conf, cla in zip(mfd_res.boxes.xyxy.cpu(), mfd_res.boxes.conf.cpu(), mfd_res.boxes.cls.cpu()):
             xmin, ymin, xmax, ymax = [int(p.item()) for p in xyxy]
             new_item = {
@@ -78,21 +111,30 @@ class UnimernetModel(object):
                 'latex': '',
             }
             formula_list.append(new_item)
-            pil_img = Image.fromarray(image)
             bbox_img = pil_img.crop((xmin, ymin, xmax, ymax))
             mf_image_list.append(bbox_img)
-
-        dataset = MathDataset(mf_image_list, transform=self.mfr_transform)
-        dataloader = DataLoader(dataset, batch_size=64, num_workers=0)
-        mfr_res = []
-        for mf_img in dataloader:
-            mf_img = mf_img.to(self.device)
+        return formula_list, mf_image_list
+
+    def batch_recognize(self, formula_list, mf_image_list, batch_size=64):
+        """Recognize the formulas of many pages, the images are sorted by
+        aspect ratio so that each batch holds formulas of similar latex length.
+
+        Args:
+            formula_list (list): the formula items, their latex is filled in place
+            mf_image_list (list): the PIL image of each formula item
+            batch_size (int, optional): the number of formulas in each generate call. Defaults to 64.
+        """
+        # 宽高比越大的公式latex越长, 从最长的开始以便尽早暴露显存不足
+        order = sorted(
+            range(len(mf_image_list)),
+            key=lambda idx: mf_image_list[idx].width / max(mf_image_list[idx].height, 1),
+            reverse=True,
+        )
+        for index in range(0, len(order), batch_size):
+            batch_idx = order[index: index + batch_size]
+            mf_img = torch.stack([self.mfr_transform(mf_image_list[idx]) for idx in batch_idx])
+            mf_img = mf_img.to(self.device, dtype=self.dtype)
             with torch.no_grad():
                 output = self.model.generate({'image': mf_img})
-            mfr_res.extend(output['pred_str'])
-        for res, latex in zip(formula_list, mfr_res):
-            res['latex'] = latex_rm_whitespace(latex)
-        return formula_list
-
-
-
+            for idx, latex in zip(batch_idx, output['pred_str']):
+                formula_list[idx]['latex'] = latex_rm_whitespace(latex)
@@ -1,7 +1,11 @@
+import threading
+
 from loguru import logger
 
-from magic_pdf.config.constants import MODEL_NAME
+from magic_pdf.config.constants import MODEL_NAME, PRECISION_MODE
+from magic_pdf.libs.config_reader import get_model_residency_config
 from magic_pdf.model.model_list import AtomicModel
+from magic_pdf.model.model_residency import ModelResidency
 from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import \
     DocLayoutYOLOModel
 from magic_pdf.model.sub_modules.layout.layoutlmv3.model_init import \
@@ -37,13 +41,13 @@ def table_model_init(table_model_type, model_path, max_time, _device_='cpu'):
     return table_model
 
 
-def mfd_model_init(weight, device='cpu'):
-    mfd_model = YOLOv8MFDModel(weight, device)
+def mfd_model_init(weight, device='cpu', onnx_config=None):
+    mfd_model = YOLOv8MFDModel(weight, device, onnx_config=onnx_config)
     return mfd_model
 
 
-def mfr_model_init(weight_dir, cfg_path, device='cpu'):
-    mfr_model = UnimernetModel(weight_dir, cfg_path, device)
+def mfr_model_init(weight_dir, cfg_path, device='cpu', precision=PRECISION_MODE.AUTO):
+    mfr_model = UnimernetModel(weight_dir, cfg_path, device, precision=precision)
     return mfr_model
 
 
@@ -52,8 +56,8 @@ def layout_model_init(weight, config_file, device):
     return model
 
 
-def doclayout_yolo_model_init(weight, device='cpu'):
-    model = DocLayoutYOLOModel(weight, device)
+def doclayout_yolo_model_init(weight, device='cpu', onnx_config=None):
+    model = DocLayoutYOLOModel(weight, device, onnx_config=onnx_config)
     return model
 
 
@@ -84,31 +88,93 @@ def ocr_model_init(show_log: bool = False,
 
 class AtomModelSingleton:
     _instance = None
-    _models = {}
+    # the loaded models are kept within the budget of model-residency-config, the idle ones are evicted first
+    _residency = None
+    _lock = threading.Lock()
+    # the models not loaded when a CustomPEKModel is built, they are loaded on their first use
+    _deferred_models = set()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def get_atom_model(self, atom_model_name: str, **kwargs):
+    def defer_atom_models(self, *atom_model_names: str):
+        """Load the atom models on their first use instead of when a
+        CustomPEKModel is built, e.g. to keep the models which do not survive a
+        fork out of the parent process."""
+        AtomModelSingleton._deferred_models.update(atom_model_names)
+
+    def is_deferred(self, atom_model_name: str) -> bool:
+        return atom_model_name in AtomModelSingleton._deferred_models
+
+    @property
+    def residency(self) -> ModelResidency:
+        with self._lock:
+            if AtomModelSingleton._residency is None:
+                max_memory_gb = get_model_residency_config().get('max_memory_gb', 0)
+                AtomModelSingleton._residency = ModelResidency(
+                    max_bytes=int(max_memory_gb * 1024 ** 3) if max_memory_gb > 0 else None
+                )
+        return AtomModelSingleton._residency
+
+    @staticmethod
+    def get_atom_model_key(atom_model_name: str, **kwargs):
 
         lang = kwargs.get('lang', None)
         layout_model_name = kwargs.get('layout_model_name', None)
         table_model_name = kwargs.get('table_model_name', None)
 
+        # the torch and the ONNX Runtime backend of a model are different models
+        backend = 'onnx' if kwargs.get('onnx_config') is not None else 'torch'
+
         if atom_model_name in [AtomicModel.OCR]:
             key = (atom_model_name, lang)
         elif atom_model_name in [AtomicModel.Layout]:
-            key = (atom_model_name, layout_model_name)
+            key = (atom_model_name, layout_model_name, backend)
+        elif atom_model_name in [AtomicModel.MFD]:
+            key = (atom_model_name, backend)
+        elif atom_model_name in [AtomicModel.MFR]:
+            key = (atom_model_name, kwargs.get('precision', None))
         elif atom_model_name in [AtomicModel.Table]:
             key = (atom_model_name, table_model_name)
         else:
             key = atom_model_name
+        return key
+
+    @staticmethod
+    def is_measured_by_rss(atom_model_name: str, **kwargs) -> bool:
+        """The models without torch modules, PaddleOCR, the ONNX Runtime
+        backends, RapidTable and TableMaster, are measured by the growth of the
+        process memory during their load."""
+        if atom_model_name in [AtomicModel.OCR]:
+            return True
+        if atom_model_name in [AtomicModel.Layout, AtomicModel.MFD]:
+            return kwargs.get('onnx_config') is not None
+        if atom_model_name in [AtomicModel.Table]:
+            return kwargs.get('table_model_name') != MODEL_NAME.STRUCT_EQTABLE
+        return False
+
+    def get_atom_model(self, atom_model_name: str, **kwargs):
+        key = self.get_atom_model_key(atom_model_name, **kwargs)
+        return self.residency.get(
+            key,
+            lambda: atom_model_init(model_name=atom_model_name, **kwargs),
+            measure_rss=self.is_measured_by_rss(atom_model_name, **kwargs),
+        )
+
+    def acquire_atom_model(self, atom_model_name: str, **kwargs):
+        """Get the atom model and keep it loaded until `release_atom_model`."""
+        key = self.get_atom_model_key(atom_model_name, **kwargs)
+        return self.residency.acquire(
+            key,
+            lambda: atom_model_init(model_name=atom_model_name, **kwargs),
+            measure_rss=self.is_measured_by_rss(atom_model_name, **kwargs),
+        )
+
+    def release_atom_model(self, atom_model_name: str, **kwargs):
+        self.residency.release(self.get_atom_model_key(atom_model_name, **kwargs))
 
-        if key not in self._models:
-            self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
-        return self._models[key]
 
 def atom_model_init(model_name: str, **kwargs):
     atom_model = None
@@ -122,18 +188,21 @@ def atom_model_init(model_name: str, **kwargs):
         elif kwargs.get('layout_model_name') == MODEL_NAME.DocLayout_YOLO:
             atom_model = doclayout_yolo_model_init(
                 kwargs.get('doclayout_yolo_weights'),
-                kwargs.get('device')
+                kwargs.get('device'),
+                kwargs.get('onnx_config'),
             )
     elif model_name == AtomicModel.MFD:
         atom_model = mfd_model_init(
             kwargs.get('mfd_weights'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            kwargs.get('onnx_config'),
         )
     elif model_name == AtomicModel.MFR:
         atom_model = mfr_model_init(
             kwargs.get('mfr_weight_dir'),
             kwargs.get('mfr_cfg_path'),
-            kwargs.get('device')
+            kwargs.get('device'),
+            kwargs.get('precision', PRECISION_MODE.AUTO),
         )
     elif model_name == AtomicModel.OCR:
         atom_model = ocr_model_init(
@@ -1,26 +1,94 @@
-import time
-
+import cv2
+import numpy as np
 import torch
 from PIL import Image
 from loguru import logger
 
-from magic_pdf.libs.clean_memory import clean_memory
+from magic_pdf.config.constants import PRECISION_MODE
+from magic_pdf.libs.clean_memory import maybe_clean_memory
+
+
+class PageImage:
+    """The page image shared by the models, each representation of the page
+    is converted lazily and only once."""
+
+    def __init__(self, image: np.ndarray):
+        """
+        Args:
+            image (np.ndarray): the RGB page image
+        """
+        self._rgb = image
+        self._bgr = None
+        self._pil = None
+
+    @property
+    def width(self) -> int:
+        return self._rgb.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self._rgb.shape[0]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._rgb
+
+    @property
+    def bgr(self) -> np.ndarray:
+        if self._bgr is None:
+            self._bgr = cv2.cvtColor(self._rgb, cv2.COLOR_RGB2BGR)
+        return self._bgr
 
+    @property
+    def pil(self) -> Image.Image:
+        if self._pil is None:
+            self._pil = Image.fromarray(self._rgb)
+        return self._pil
 
-def crop_img(input_res, input_pil_img, crop_paste_x=0, crop_paste_y=0):
-    crop_xmin, crop_ymin = int(input_res['poly'][0]), int(input_res['poly'][1])
-    crop_xmax, crop_ymax = int(input_res['poly'][4]), int(input_res['poly'][5])
-    # Create a white background with an additional width and height of 50
-    crop_new_width = crop_xmax - crop_xmin + crop_paste_x * 2
-    crop_new_height = crop_ymax - crop_ymin + crop_paste_y * 2
-    return_image = Image.new('RGB', (crop_new_width, crop_new_height), 'white')
+    def crop(self, input_res, crop_paste_x=0, crop_paste_y=0, mode='rgb'):
+        """Crop the region of input_res['poly'] and paste it on a white image
+        with a border of crop_paste_x and crop_paste_y, the part of the region
+        outside the page is black. The crop is a view of the page image when
+        there is no border and the region is inside the page.
 
-    # Crop image
-    crop_box = (crop_xmin, crop_ymin, crop_xmax, crop_ymax)
-    cropped_img = input_pil_img.crop(crop_box)
-    return_image.paste(cropped_img, (crop_paste_x, crop_paste_y))
-    return_list = [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height]
-    return return_image, return_list
+        Args:
+            input_res (dict): the layout result which has 'poly'
+            crop_paste_x (int, optional): the width of the white border on the left and right. Defaults to 0.
+            crop_paste_y (int, optional): the height of the white border on the top and bottom. Defaults to 0.
+            mode (str, optional): 'rgb' or 'bgr'. Defaults to 'rgb'.
+
+        Returns:
+            tuple: (np.ndarray, [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height])
+        """
+        if mode not in ('rgb', 'bgr'):
+            raise ValueError(f'mode: {mode} is not supported.')
+        crop_xmin, crop_ymin = int(input_res['poly'][0]), int(input_res['poly'][1])
+        crop_xmax, crop_ymax = int(input_res['poly'][4]), int(input_res['poly'][5])
+        crop_new_width = crop_xmax - crop_xmin + crop_paste_x * 2
+        crop_new_height = crop_ymax - crop_ymin + crop_paste_y * 2
+        return_list = [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height]
+
+        inside = crop_xmin >= 0 and crop_ymin >= 0 and crop_xmax <= self.width and crop_ymax <= self.height
+        if crop_paste_x == 0 and crop_paste_y == 0 and inside:
+            src = self.rgb if mode == 'rgb' else self.bgr
+            return src[crop_ymin:crop_ymax, crop_xmin:crop_xmax], return_list
+
+        # Create a white background with the additional border
+        return_image = np.full((crop_new_height, crop_new_width, 3), 255, dtype=np.uint8)
+        if not inside:
+            # the part of the region outside the page is black, the same as PIL.Image.crop
+            return_image[crop_paste_y:crop_new_height - crop_paste_y, crop_paste_x:crop_new_width - crop_paste_x] = 0
+        x0, y0 = max(crop_xmin, 0), max(crop_ymin, 0)
+        x1, y1 = min(crop_xmax, self.width), min(crop_ymax, self.height)
+        if x1 > x0 and y1 > y0:
+            region = self._rgb[y0:y1, x0:x1]
+            if mode == 'bgr':
+                region = region[:, :, ::-1]
+            return_image[
+                crop_paste_y + y0 - crop_ymin: crop_paste_y + y1 - crop_ymin,
+                crop_paste_x + x0 - crop_xmin: crop_paste_x + x1 - crop_xmin,
+            ] = region
+        return return_image, return_list
 
 
 # Select regions for OCR / formula regions / table regions
@@ -41,13 +109,34 @@ def get_res_list_from_layout_res(layout_res):
     return ocr_res_list, table_res_list, single_page_mfdetrec_res
 
 
+def apply_precision(model: torch.nn.Module, precision: str, device) -> torch.nn.Module:
+    """Convert the loaded model to the precision mode.
+
+    Args:
+        model (torch.nn.Module): the model on its device, in eval mode
+        precision (str): one of PRECISION_MODE, auto keeps the model as it is
+        device: the device of the model
+
+    Returns:
+        torch.nn.Module: the converted model, a new module for int8-dynamic
+    """
+    if precision == PRECISION_MODE.BF16:
+        return model.to(torch.bfloat16)
+    elif precision == PRECISION_MODE.INT8_DYNAMIC:
+        if not str(device).startswith('cpu'):
+            logger.warning(f'{precision} only runs on cpu, keep fp32 on {device}')
+            return model
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif precision not in [PRECISION_MODE.AUTO, PRECISION_MODE.FP32]:
+        logger.warning(f'precision mode {precision} not allow, keep fp32')
+    return model
+
+
 def clean_vram(device, vram_threshold=8):
     total_memory = get_vram(device)
     if total_memory and total_memory <= vram_threshold:
-        gc_start = time.time()
-        clean_memory()
-        gc_time = round(time.time() - gc_start, 2)
-        logger.info(f"gc time: {gc_time}")
+        # 显存较小时每页检查一次, 超过memory-config的阈值才回收
+        maybe_clean_memory()
 
 
 def get_vram(device):
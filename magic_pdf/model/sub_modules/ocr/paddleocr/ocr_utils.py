@@ -229,6 +229,26 @@ def merge_det_boxes(dt_boxes):
     return new_dt_boxes
 
 
+def get_text_layer_det_res(text_boxes, mfd_res=None):
+    """Turn the text boxes taken from the pdf text layer into the output of
+    the text detection, ocr(img, mfd_res=mfd_res, rec=False)[0], the boxes are
+    merged into lines and split around the formulas in the same way.
+
+    Args:
+        text_boxes (list): the four points arrays of the text boxes, see `crop_text_layer_boxes`
+        mfd_res (list | None, optional): the formulas in the region. Defaults to None.
+
+    Returns:
+        list | None: the text lines, None if there is none
+    """
+    dt_boxes = merge_det_boxes(text_boxes)
+    if mfd_res:
+        dt_boxes = update_det_boxes(dt_boxes, mfd_res)
+    if len(dt_boxes) == 0:
+        return None
+    return [box.tolist() for box in dt_boxes]
+
+
 def get_adjusted_mfdetrec_res(single_page_mfdetrec_res, useful_list):
     paste_x, paste_y, xmin, ymin, xmax, ymax, new_width, new_height = useful_list
     # Adjust the coordinates of the formula area
@@ -296,6 +316,25 @@ def get_ocr_result_list(ocr_res, useful_list):
     return ocr_result_list
 
 
+def get_table_ocr_result(ocr_res, useful_list):
+    """Convert the OCR result of a padded table crop to the text lines of
+    the table image cropped without padding, in the format of RapidOCR.
+
+    Args:
+        ocr_res (list | None): the OCR result of the padded crop, [[box, (text, score)], ...]
+        useful_list (list): the useful_list of the padded crop returned by `PageImage.crop`
+
+    Returns:
+        list: [[box, text, score], ...], the box is in the coordinates of the table image
+    """
+    paste_x, paste_y = useful_list[0], useful_list[1]
+    table_ocr_result = []
+    for box, (text, score) in ocr_res or []:
+        box = [[point[0] - paste_x, point[1] - paste_y] for point in box]
+        table_ocr_result.append([box, text, score])
+    return table_ocr_result
+
+
 def calculate_is_angle(poly):
     p1, p2, p3, p4 = poly
     height = ((p4[1] - p1[1]) + (p3[1] - p2[1])) / 2
@@ -112,6 +112,49 @@ class ModifiedPaddleOCR(PaddleOCR):
                 return cls_res
             return ocr_res
 
+    def batch_ocr(self, img_list, mfd_res_list=None, cls=True, alpha_color=(255, 255, 255)):
+        """
+        OCR several images, the text detection runs on each image and the text lines of all images are recognized together,
+        so that the recognizer gets full width-sorted batches instead of a few lines per image.
+        args：
+            img_list: list of ndarray images
+            mfd_res_list: the mfd_res of each image, None means no formula. Default is None
+            cls: use angle classifier or not. Default is True.
+            alpha_color: set RGB color Tuple for transparent parts replacement. Default is pure white.
+        return：
+            the result of each image, the same as ocr(img, mfd_res=mfd_res)[0]
+        """
+        if mfd_res_list is None:
+            mfd_res_list = [None] * len(img_list)
+
+        dt_boxes_list = []
+        img_crop_list = []
+        for img, mfd_res in zip(img_list, mfd_res_list):
+            img = alpha_to_color(check_img(img), alpha_color)
+            dt_boxes, img_crops, _ = self._detect(img, mfd_res=mfd_res)
+            dt_boxes_list.append(dt_boxes)
+            if dt_boxes is not None:
+                img_crop_list.extend(img_crops)
+
+        rec_res_all = []
+        if img_crop_list:
+            rec_res_all, _ = self._recognize(img_crop_list, cls)
+
+        ocr_res = []
+        offset = 0
+        for dt_boxes in dt_boxes_list:
+            if dt_boxes is None:
+                ocr_res.append(None)
+                continue
+            rec_res = rec_res_all[offset: offset + len(dt_boxes)]
+            offset += len(dt_boxes)
+            filter_boxes, filter_rec_res = self._filter_rec_res(dt_boxes, rec_res)
+            if not filter_boxes and not filter_rec_res:
+                ocr_res.append(None)
+                continue
+            ocr_res.append([[box.tolist(), res] for box, res in zip(filter_boxes, filter_rec_res)])
+        return ocr_res
+
     def __call__(self, img, cls=True, mfd_res=None):
         time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
 
@@ -120,15 +163,29 @@ class ModifiedPaddleOCR(PaddleOCR):
             return None, None, time_dict
 
         start = time.time()
-        ori_im = img.copy()
-        dt_boxes, elapse = self.text_detector(img)
+        dt_boxes, img_crop_list, elapse = self._detect(img, mfd_res=mfd_res)
         time_dict['det'] = elapse
 
         if dt_boxes is None:
-            logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
             end = time.time()
             time_dict['all'] = end - start
             return None, None, time_dict
+
+        rec_res, elapse_dict = self._recognize(img_crop_list, cls)
+        time_dict.update(elapse_dict)
+        filter_boxes, filter_rec_res = self._filter_rec_res(dt_boxes, rec_res)
+        end = time.time()
+        time_dict['all'] = end - start
+        return filter_boxes, filter_rec_res, time_dict
+
+    def _detect(self, img, mfd_res=None):
+        """detect the text lines and crop them from the image"""
+        ori_im = img.copy()
+        dt_boxes, elapse = self.text_detector(img)
+
+        if dt_boxes is None:
+            logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
+            return None, None, elapse
         else:
             logger.debug("dt_boxes num : {}, elapsed : {}".format(
                 len(dt_boxes), elapse))
@@ -153,26 +210,32 @@ class ModifiedPaddleOCR(PaddleOCR):
             else:
                 img_crop = get_minarea_rect_crop(ori_im, tmp_box)
             img_crop_list.append(img_crop)
+        return dt_boxes, img_crop_list, elapse
+
+    def _recognize(self, img_crop_list, cls=True):
+        """classify the angle and recognize the text of the cropped text lines"""
+        elapse_dict = {}
         if self.use_angle_cls and cls:
             img_crop_list, angle_list, elapse = self.text_classifier(
                 img_crop_list)
-            time_dict['cls'] = elapse
+            elapse_dict['cls'] = elapse
             logger.debug("cls num  : {}, elapsed : {}".format(
                 len(img_crop_list), elapse))
 
         rec_res, elapse = self.text_recognizer(img_crop_list)
-        time_dict['rec'] = elapse
+        elapse_dict['rec'] = elapse
         logger.debug("rec_res num  : {}, elapsed : {}".format(
             len(rec_res), elapse))
         if self.args.save_crop_res:
             self.draw_crop_rec_res(self.args.crop_res_save_dir, img_crop_list,
                                    rec_res)
+        return rec_res, elapse_dict
+
+    def _filter_rec_res(self, dt_boxes, rec_res):
         filter_boxes, filter_rec_res = [], []
         for box, rec_result in zip(dt_boxes, rec_res):
             text, score = rec_result
             if score >= self.drop_score:
                 filter_boxes.append(box)
                 filter_rec_res.append(rec_result)
-        end = time.time()
-        time_dict['all'] = end - start
-        return filter_boxes, filter_rec_res, time_dict
\ No newline at end of file
+        return filter_boxes, filter_rec_res
@@ -0,0 +1,66 @@
+import fitz
+import numpy as np
+
+
+def get_text_layer_lines(page: fitz.Page, matrix: fitz.Matrix) -> list | None:
+    """Get the horizontal text lines of the pdf page from the rawdict text
+    layer, in the coordinates of the page image rendered with matrix.
+
+    Args:
+        page (fitz.Page): the pdf page
+        matrix (fitz.Matrix): the matrix used to render the page image, see `fitz_doc_to_matrix`
+
+    Returns:
+        list | None: a (n, 4) array of the char bboxes of each line, None if the page has no text layer
+            or is rotated, the text lines have to be detected on the image then
+    """
+    if page.rotation != 0:
+        return None
+    text_blocks_raw = page.get_text('rawdict', flags=fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP)['blocks']
+    text_lines = []
+    for block in text_blocks_raw:
+        for line in block.get('lines', []):
+            # 与txt_spans_extract_v2一致, 只使用水平的文本行
+            cosine, sine = line['dir']
+            if abs(cosine) < 0.9 or abs(sine) > 0.1:
+                continue
+            char_bboxes = [char['bbox'] for span in line['spans'] for char in span['chars'] if char['c'].strip()]
+            if len(char_bboxes) == 0:
+                continue
+            char_bboxes = np.array(char_bboxes, dtype=np.float32)
+            char_bboxes[:, [0, 2]] = char_bboxes[:, [0, 2]] * matrix.a + matrix.e
+            char_bboxes[:, [1, 3]] = char_bboxes[:, [1, 3]] * matrix.d + matrix.f
+            text_lines.append(char_bboxes)
+    if len(text_lines) == 0:
+        return None
+    return text_lines
+
+
+def crop_text_layer_boxes(text_lines: list, useful_list: list) -> list:
+    """Get the text boxes of a region from the text lines of the page, a
+    text box is the bbox of the chars of a line whose center is in the region.
+
+    Args:
+        text_lines (list): the text lines of the page returned by `get_text_layer_lines`
+        useful_list (list): the useful_list of the region crop returned by `PageImage.crop`
+
+    Returns:
+        list: the text boxes as four points arrays in the coordinates of the region crop, like the text detector output
+    """
+    paste_x, paste_y, xmin, ymin, xmax, ymax = useful_list[:6]
+    text_boxes = []
+    for char_bboxes in text_lines:
+        center_x = (char_bboxes[:, 0] + char_bboxes[:, 2]) / 2
+        center_y = (char_bboxes[:, 1] + char_bboxes[:, 3]) / 2
+        in_region = (center_x >= xmin) & (center_x <= xmax) & (center_y >= ymin) & (center_y <= ymax)
+        if not in_region.any():
+            continue
+        chars = char_bboxes[in_region]
+        x0 = max(chars[:, 0].min(), xmin) - xmin + paste_x
+        y0 = max(chars[:, 1].min(), ymin) - ymin + paste_y
+        x1 = min(chars[:, 2].max(), xmax) - xmin + paste_x
+        y1 = min(chars[:, 3].max(), ymax) - ymin + paste_y
+        if x1 <= x0 or y1 <= y0:
+            continue
+        text_boxes.append(np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32))
+    return text_boxes
@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import numpy as np
+from loguru import logger
+
+
+def get_onnx_cache_dir(models_dir: str, cache_dir: str | None = None) -> str:
+    """Get the directory of the cached ONNX exports, next to models-dir by
+    default.
+
+    Args:
+        models_dir (str): the models-dir
+        cache_dir (str | None, optional): the configured cache directory. Defaults to None.
+
+    Returns:
+        str: the cache directory
+    """
+    if cache_dir:
+        return cache_dir
+    return os.path.abspath(models_dir).rstrip(os.sep) + '_onnx'
+
+
+def export_yolo_onnx(model_cls, weight: str, cache_dir: str) -> str:
+    """Export the YOLO weights to ONNX, the export is cached in cache_dir and
+    redone only when the weights are newer than the cached export.
+
+    Args:
+        model_cls (type): the ultralytics model class of the weights, e.g. YOLO, YOLOv10
+        weight (str): the path of the .pt weights
+        cache_dir (str): the directory of the cached exports
+
+    Returns:
+        str: the path of the ONNX model
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(weight))[0]
+    onnx_path = os.path.join(cache_dir, f'{stem}.onnx')
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(weight):
+        return onnx_path
+
+    logger.info(f'export {weight} to {onnx_path}, this may take some times')
+    # ultralytics writes the export next to the weights, export a copy of the weights in the cache dir since
+    # models-dir may be read-only, the pid keeps the concurrent exports of several processes apart
+    tmp_weight = os.path.join(cache_dir, f'{stem}.{os.getpid()}.pt')
+    try:
+        shutil.copyfile(weight, tmp_weight)
+        exported = model_cls(tmp_weight).export(format='onnx', dynamic=True, simplify=False)
+        os.replace(exported, onnx_path)
+    finally:
+        if os.path.exists(tmp_weight):
+            os.remove(tmp_weight)
+    return onnx_path
+
+
+def create_session_options(intra_op_num_threads: int = 0, inter_op_num_threads: int = 0):
+    """Create the ONNX Runtime session options.
+
+    Args:
+        intra_op_num_threads (int, optional): the threads used inside an operator, 0 means the number of cores. Defaults to 0.
+        inter_op_num_threads (int, optional): the threads running independent operators in parallel, 0 means the default.
+            Defaults to 0.
+
+    Returns:
+        onnxruntime.SessionOptions: the session options
+    """
+    import onnxruntime as ort
+
+    session_options = ort.SessionOptions()
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_num_threads > 0:
+        session_options.intra_op_num_threads = intra_op_num_threads
+    if inter_op_num_threads > 0:
+        session_options.inter_op_num_threads = inter_op_num_threads
+        if inter_op_num_threads > 1:
+            session_options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return session_options
+
+
+def load_yolo_onnx(model_cls, onnx_path: str, imgsz: int, intra_op_num_threads: int = 0, inter_op_num_threads: int = 0):
+    """Load the ONNX export as an ultralytics model running on ONNX Runtime
+    CPU, the pre- and post-processing and the results stay the ones of
+    ultralytics.
+
+    Args:
+        model_cls (type): the ultralytics model class, e.g. YOLO, YOLOv10
+        onnx_path (str): the path of the ONNX model
+        imgsz (int): the inference size used to warm up the model
+        intra_op_num_threads (int, optional): see `create_session_options`. Defaults to 0.
+        inter_op_num_threads (int, optional): see `create_session_options`. Defaults to 0.
+
+    Returns:
+        the ultralytics model
+    """
+    import onnxruntime as ort
+
+    model = model_cls(onnx_path, task='detect')
+    # ultralytics creates its ONNX Runtime session on the first predict, without thread settings,
+    # replace it with a session created with the configured options
+    model.predict(np.full((imgsz, imgsz, 3), 255, dtype=np.uint8), imgsz=imgsz, device='cpu', verbose=False)
+    model.predictor.model.session = ort.InferenceSession(
+        onnx_path,
+        sess_options=create_session_options(intra_op_num_threads, inter_op_num_threads),
+        providers=['CPUExecutionProvider'],
+    )
+    return model
@@ -0,0 +1,43 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import \
+    xy_cut
+
+
+def chunk_block_lines(block_line_ranges: List[Tuple[list, int, int]], max_len: int) -> List[List[int]]:
+    """Split the lines of a page into chunks the model can order, a page with
+    at most max_len lines is a single chunk. The blocks of longer pages are
+    ordered by xy-cut and the consecutive blocks are packed into chunks of at
+    most max_len lines, a block longer than max_len is split by its lines.
+
+    Args:
+        block_line_ranges (List[Tuple[list, int, int]]): (bbox, start, end) of each block, the lines of the block are
+            lines[start:end] of the page
+        max_len (int): the max number of lines of a chunk
+
+    Returns:
+        List[List[int]]: the index of the lines of each chunk, the chunks are in reading order
+    """
+    line_num = sum(end - start for _, start, end in block_line_ranges)
+    if line_num <= max_len:
+        return [[index for _, start, end in block_line_ranges for index in range(start, end)]]
+
+    block_order = xy_cut(np.array([bbox for bbox, _, _ in block_line_ranges], dtype=float))
+
+    chunks = []
+    chunk = []
+    for block_index in block_order:
+        _, start, end = block_line_ranges[block_index]
+        if chunk and len(chunk) + end - start > max_len:
+            chunks.append(chunk)
+            chunk = []
+        for index in range(start, end):
+            if len(chunk) == max_len:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(index)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
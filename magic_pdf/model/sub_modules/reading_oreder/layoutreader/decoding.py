@@ -0,0 +1,72 @@
+from typing import List
+
+import numpy as np
+
+# 未分配的行少于该值时逐行分配, 此时每轮只有少数行被挤出, 按轮向量化的开销大于逐行分配
+SEQUENTIAL_TAIL = 32
+
+
+def decode_orders(logits: np.ndarray) -> List[int]:
+    """Assign a distinct order to each line from the order logits.
+
+    Each line claims its orders by descending logit (the highest order on
+    ties, like the ascending argsort popped from its end did), an order
+    claimed by several lines goes to the line with the highest logit for it
+    (the lowest line on ties) and the others claim their next order. This is the result of
+    the conflict loop layoutreader used, i.e. the line-proposing stable
+    matching, which does not depend on the order the claims are made in: the
+    unassigned lines claim all at once while they are many and one by one
+    afterwards.
+
+    Args:
+        logits (np.ndarray): (length, length) logits, logits[i, j] is the score of line i at order j
+
+    Returns:
+        List[int]: the order of each line
+    """
+    length = logits.shape[0]
+    if length == 0:
+        return []
+    # 被拒绝过的顺序置为-inf, 每行的argmax即为下一个候选顺序, 在反转的列上取argmax使相同logit时取最大的顺序
+    masked = logits.astype(np.float32, copy=True)
+    reversed_masked = masked[:, ::-1]
+    holder = np.full(length, -1, dtype=np.int64)
+    orders = np.full(length, -1, dtype=np.int64)
+
+    free = np.arange(length)
+    while free.size > SEQUENTIAL_TAIL:
+        claimed = length - 1 - reversed_masked[free].argmax(axis=1)
+        # 已占有被争夺顺序的行也参与比较
+        held = holder[np.unique(claimed)]
+        held = held[held >= 0]
+        rows = np.concatenate([free, held])
+        cols = np.concatenate([claimed, orders[held]])
+        scores = logits[rows, cols]
+
+        # 按顺序分组, 组内logit最大(相同时行号最小)的行得到该顺序
+        rank = np.lexsort((rows, -scores, cols))
+        rows, cols = rows[rank], cols[rank]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = cols[1:] != cols[:-1]
+        holder[cols[first]] = rows[first]
+        orders[rows[first]] = cols[first]
+        free = rows[~first]
+        masked[free, cols[~first]] = -np.inf
+
+    holder = holder.tolist()
+    orders = orders.tolist()
+    free = free.tolist()
+    while free:
+        row = free.pop()
+        col = length - 1 - int(reversed_masked[row].argmax())
+        current = holder[col]
+        if current >= 0 and (logits[current, col], -current) > (logits[row, col], -row):
+            masked[row, col] = -np.inf
+            free.append(row)
+            continue
+        if current >= 0:
+            masked[current, col] = -np.inf
+            free.append(current)
+        holder[col] = row
+        orders[row] = col
+    return orders
@@ -1,9 +1,10 @@
-from collections import defaultdict
 from typing import List, Dict
 
 import torch
 from transformers import LayoutLMv3ForTokenClassification
 
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.decoding import decode_orders
+
 MAX_LEN = 510
 CLS_TOKEN_ID = 0
 UNK_TOKEN_ID = 3
@@ -95,30 +96,7 @@ def parse_logits(logits: torch.Tensor, length: int) -> List[int]:
     :return: orders
     """
     logits = logits[1 : length + 1, :length]
-    orders = logits.argsort(descending=False).tolist()
-    ret = [o.pop() for o in orders]
-    while True:
-        order_to_idxes = defaultdict(list)
-        for idx, order in enumerate(ret):
-            order_to_idxes[order].append(idx)
-        # filter idxes len > 1
-        order_to_idxes = {k: v for k, v in order_to_idxes.items() if len(v) > 1}
-        if not order_to_idxes:
-            break
-        # filter
-        for order, idxes in order_to_idxes.items():
-            # find original logits of idxes
-            idxes_to_logit = {}
-            for idx in idxes:
-                idxes_to_logit[idx] = logits[idx, order]
-            idxes_to_logit = sorted(
-                idxes_to_logit.items(), key=lambda x: x[1], reverse=True
-            )
-            # keep the highest logit as order, set others to next candidate
-            for idx, _ in idxes_to_logit[1:]:
-                ret[idx] = orders[idx].pop()
-
-    return ret
+    return decode_orders(logits.float().numpy())
 
 
 def check_duplicate(a: List[int]) -> bool:
@@ -17,11 +17,12 @@ def projection_by_bboxes(boxes: np.array, axis: int) -> np.ndarray:
     """
     assert axis in [0, 1]
     length = np.max(boxes[:, axis::2])
-    res = np.zeros(length, dtype=int)
-    # TODO: how to remove for loop?
-    for start, end in boxes[:, axis::2]:
-        res[start:end] += 1
-    return res
+    # 差分数组: 起点+1, 终点-1, 前缀和即为每个像素上的box数
+    starts = np.clip(boxes[:, axis], 0, length)
+    ends = np.clip(boxes[:, axis + 2], 0, length)
+    valid = starts < ends
+    diff = np.bincount(starts[valid], minlength=length + 1) - np.bincount(ends[valid], minlength=length + 1)
+    return np.cumsum(diff[:length])
 
 
 # from: https://dothinking.github.io/2021-06-19-%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%E7%AE%97%E6%B3%95/#:~:text=%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%EF%BC%88Recursive%20XY,%EF%BC%8C%E5%8F%AF%E4%BB%A5%E5%88%92%E5%88%86%E6%AE%B5%E8%90%BD%E3%80%81%E8%A1%8C%E3%80%82
@@ -68,61 +69,75 @@ def split_projection_profile(arr_values: np.array, min_value: float, min_gap: fl
     return arr_start, arr_end
 
 
+def _split_by_projection(boxes: np.ndarray, indices: np.ndarray, axis: int) -> List[np.ndarray]:
+    """Split the boxes into the groups separated by a gap of the projection
+    on axis, the groups are in ascending order of the coordinate and the boxes
+    of each group are sorted stably by their start on axis."""
+    if len(indices) == 1:
+        return [indices]
+    indices = indices[np.argsort(boxes[indices, axis], kind='stable')]
+    starts = boxes[indices, axis]
+    # 没有宽度或高度的box至少投影到一个像素, 保证每个box都落在某个分组中
+    ends = np.maximum(boxes[indices, axis + 2], starts + 1)
+    # 投影直方图只需在box起点处求值: 起点前一个像素上的box数 = 之前开始的box数 - 已结束的box数,
+    # 为0即为间隔, 与按像素的差分数组前缀和一致
+    covered = np.arange(len(indices)) - np.searchsorted(np.sort(ends), starts, side='left')
+    cuts = np.flatnonzero(covered[1:] == 0) + 1
+    if len(cuts) == 0:
+        return [indices]
+    bounds = [0, *cuts.tolist(), len(indices)]
+    return [indices[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def xy_cut(boxes: np.ndarray) -> List[int]:
+    """Order the boxes by recursive xy-cut: the boxes are split into rows by
+    the gaps of their projection on the y axis, each row into columns by the
+    gaps of its projection on the x axis and each column is cut again, a row
+    which can not be split is read from left to right. The cuts are done
+    iteratively and the ties are kept in the input order, so the order only
+    depends on the boxes.
+
+    Args:
+        boxes (np.ndarray): (N, 4) x0, y0, x1, y1 of the boxes
+
+    Returns:
+        List[int]: the index of the boxes in reading order
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int64)
+    if len(boxes) == 0:
+        return []
+
+    res = []
+    # 栈中为待切分的区域(False)或已排好序的行(True), 逆序入栈以保持阅读顺序
+    stack = [(False, np.arange(len(boxes)))]
+    while stack:
+        is_row, indices = stack.pop()
+        if is_row:
+            res.extend(indices.tolist())
+            continue
+        parts = []
+        for row in _split_by_projection(boxes, indices, axis=1):
+            columns = _split_by_projection(boxes, row, axis=0)
+            if len(columns) == 1:
+                # x 方向无法切分
+                parts.append((True, columns[0]))
+            else:
+                parts.extend((False, column) for column in columns)
+        stack.extend(reversed(parts))
+    return res
+
+
 def recursive_xy_cut(boxes: np.ndarray, indices: List[int], res: List[int]):
     """
 
     Args:
         boxes: (N, 4)
-        indices: 递归过程中始终表示 box 在原始数据中的索引
+        indices: box 在原始数据中的索引
         res: 保存输出结果
 
     """
-    # 向 y 轴投影
     assert len(boxes) == len(indices)
-
-    _indices = boxes[:, 1].argsort()
-    y_sorted_boxes = boxes[_indices]
-    y_sorted_indices = indices[_indices]
-
-    # debug_vis(y_sorted_boxes, y_sorted_indices)
-
-    y_projection = projection_by_bboxes(boxes=y_sorted_boxes, axis=1)
-    pos_y = split_projection_profile(y_projection, 0, 1)
-    if not pos_y:
-        return
-
-    arr_y0, arr_y1 = pos_y
-    for r0, r1 in zip(arr_y0, arr_y1):
-        # [r0, r1] 表示按照水平切分，有 bbox 的区域，对这些区域会再进行垂直切分
-        _indices = (r0 <= y_sorted_boxes[:, 1]) & (y_sorted_boxes[:, 1] < r1)
-
-        y_sorted_boxes_chunk = y_sorted_boxes[_indices]
-        y_sorted_indices_chunk = y_sorted_indices[_indices]
-
-        _indices = y_sorted_boxes_chunk[:, 0].argsort()
-        x_sorted_boxes_chunk = y_sorted_boxes_chunk[_indices]
-        x_sorted_indices_chunk = y_sorted_indices_chunk[_indices]
-
-        # 往 x 方向投影
-        x_projection = projection_by_bboxes(boxes=x_sorted_boxes_chunk, axis=0)
-        pos_x = split_projection_profile(x_projection, 0, 1)
-        if not pos_x:
-            continue
-
-        arr_x0, arr_x1 = pos_x
-        if len(arr_x0) == 1:
-            # x 方向无法切分
-            res.extend(x_sorted_indices_chunk)
-            continue
-
-        # x 方向上能分开，继续递归调用
-        for c0, c1 in zip(arr_x0, arr_x1):
-            _indices = (c0 <= x_sorted_boxes_chunk[:, 0]) & (
-                x_sorted_boxes_chunk[:, 0] < c1
-            )
-            recursive_xy_cut(
-                x_sorted_boxes_chunk[_indices], x_sorted_indices_chunk[_indices], res
-            )
+    res.extend(np.asarray(indices)[xy_cut(boxes)].tolist())
 
 
 def points_to_bbox(points):
@@ -0,0 +1,234 @@
+import fitz
+import numpy as np
+
+# 参考页面: A4的长边(pt)和10pt的正文, 检测模型的默认输入尺寸是按这样的页面确定的
+REFERENCE_PAGE_SIDE = 842
+REFERENCE_FONT_SIZE = 10
+
+# 文本层的字符少于该值时, 不估计字号
+MIN_TEXT_CHARS = 20
+
+
+def estimate_font_size(page: fitz.Page, text_dict: dict | None = None) -> float | None:
+    """Estimate how dense the text of the page is, by the median font size
+    of the chars of the text layer.
+
+    Args:
+        page (fitz.Page): the pdf page
+        text_dict (dict | None, optional): the text layer from page.get_text('dict', flags=0), extracted from the
+            page if None. Defaults to None.
+
+    Returns:
+        float | None: the median font size in pt, None if the page has no usable text layer, e.g. scanned pages
+    """
+    sizes = []
+    counts = []
+    if text_dict is None:
+        text_dict = page.get_text('dict', flags=0)
+    for block in text_dict['blocks']:
+        for line in block.get('lines', []):
+            for span in line['spans']:
+                chars = len(span['text']) - span['text'].count(' ')
+                if chars > 0 and span['size'] > 0:
+                    sizes.append(span['size'])
+                    counts.append(chars)
+    if sum(counts) < MIN_TEXT_CHARS:
+        return None
+    order = np.argsort(sizes)
+    cumsum = np.cumsum(np.asarray(counts)[order])
+    return float(np.asarray(sizes)[order][np.searchsorted(cumsum, cumsum[-1] / 2)])
+
+
+def _round_imgsz(imgsz: float) -> int:
+    # yolo的输入尺寸为32的倍数
+    return max(int(round(imgsz / 32)) * 32, 32)
+
+
+def plan_page_resolution(
+    page_width: float,
+    page_height: float,
+    font_size: float | None,
+    resolution_config: dict,
+    dpi: int = 200,
+    max_side: int | None = 4500,
+    layout_imgsz: int = 1024,
+    mfd_imgsz: int = 1888,
+) -> dict:
+    """Plan the render dpi and the detector input sizes of a page, so that the
+    text reaches the models at the size it has on a A4 page with 10pt text
+    rendered at dpi. Pages with large text get a lower dpi and smaller inputs,
+    pages whose text would be too small at the largest input are detected on
+    tiles.
+
+    Args:
+        page_width (float): the width of the page in pt
+        page_height (float): the height of the page in pt
+        font_size (float | None): the font size of the page, see `estimate_font_size`, None is taken as 10pt
+        resolution_config (dict): the resolution-config
+        dpi (int, optional): the render dpi of the reference page. Defaults to 200.
+        max_side (int | None, optional): the max side of the image of a page which is not tiled. Defaults to 4500.
+        layout_imgsz (int, optional): the layout model input size of the reference page. Defaults to 1024.
+        mfd_imgsz (int, optional): the formula detection input size of the reference page. Defaults to 1888.
+
+    Returns:
+        dict: {'dpi': int, 'max_side': int | None, 'layout_imgsz': int, 'mfd_imgsz': int,
+            'layout_tile': float | None, 'mfd_tile': float | None, 'tile_overlap': float}, the tiles are given as the
+            fraction of the long side of the page they cover, None if the page is not tiled
+    """
+    if not font_size:
+        font_size = REFERENCE_FONT_SIZE
+    scale = REFERENCE_FONT_SIZE / font_size
+    long_side = max(page_width, page_height, 1)
+    min_imgsz_ratio = resolution_config.get('min_imgsz_ratio', 0.5)
+    max_imgsz_ratio = resolution_config.get('max_imgsz_ratio', 1.5)
+    tile = resolution_config.get('tile', True)
+
+    plan = {}
+    for name, base_imgsz in (('layout', layout_imgsz), ('mfd', mfd_imgsz)):
+        # 检测模型看到的字高为 font_size * imgsz / long_side, 与参考页面保持一致
+        imgsz = base_imgsz * long_side / REFERENCE_PAGE_SIDE * scale
+        if tile and imgsz > base_imgsz * max_imgsz_ratio:
+            plan[f'{name}_imgsz'] = base_imgsz
+            plan[f'{name}_tile'] = min(base_imgsz / imgsz, 1.0)
+        else:
+            imgsz = min(max(imgsz, base_imgsz * min_imgsz_ratio), base_imgsz * max_imgsz_ratio)
+            plan[f'{name}_imgsz'] = _round_imgsz(imgsz)
+            plan[f'{name}_tile'] = None
+
+    plan['dpi'] = int(min(max(dpi * scale, resolution_config.get('min_dpi', 120)), resolution_config.get('max_dpi', 400)))
+    # 分块检测的页面不缩小到max_side, 以免小字无法识别
+    tiled = plan['layout_tile'] is not None or plan['mfd_tile'] is not None
+    plan['max_side'] = resolution_config.get('tile_max_side', 12000) if tiled else max_side
+    plan['tile_overlap'] = resolution_config.get('tile_overlap', 0.2)
+    return plan
+
+
+def get_tiles(width: int, height: int, tile_side: int, overlap: float = 0.2) -> list:
+    """Cover the image with square tiles overlapping each other by overlap.
+
+    Args:
+        width (int): the width of the image
+        height (int): the height of the image
+        tile_side (int): the side of the tiles, the tiles are cut at the image border
+        overlap (float, optional): the overlap of the neighbouring tiles, as a fraction of tile_side. Defaults to 0.2.
+
+    Returns:
+        list: the (xmin, ymin, xmax, ymax) of the tiles, row by row
+    """
+    tile_side = max(int(tile_side), 1)
+    stride = max(int(tile_side * (1 - overlap)), 1)
+
+    def starts(side):
+        if side <= tile_side:
+            return [0]
+        positions = list(range(0, side - tile_side, stride))
+        # 最后一块与图片边缘对齐
+        positions.append(side - tile_side)
+        return positions
+
+    return [
+        (x, y, min(x + tile_side, width), min(y + tile_side, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45) -> np.ndarray:
+    """Non maximum suppression.
+
+    Args:
+        boxes (np.ndarray): (n, 4) xyxy boxes
+        scores (np.ndarray): (n,) scores
+        iou_threshold (float, optional): the boxes overlapping a kept box by more than this iou are dropped. Defaults to 0.45.
+
+    Returns:
+        np.ndarray: the index of the kept boxes, by descending score
+    """
+    areas = (boxes[:, 2] - boxes[:, 0]).clip(0) * (boxes[:, 3] - boxes[:, 1]).clip(0)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size > 0:
+        index = order[0]
+        keep.append(index)
+        rest = order[1:]
+        inter_w = (np.minimum(boxes[index, 2], boxes[rest, 2]) - np.maximum(boxes[index, 0], boxes[rest, 0])).clip(0)
+        inter_h = (np.minimum(boxes[index, 3], boxes[rest, 3]) - np.maximum(boxes[index, 1], boxes[rest, 1])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[index] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def merge_tiled_detections(
+    page_dets: tuple,
+    tile_dets_list: list,
+    tiles: list,
+    width: int,
+    height: int,
+    iou_threshold: float = 0.45,
+) -> tuple:
+    """Merge the detections of the tiles and of the whole page. The tile
+    detections cut by an inner tile border are dropped, the objects smaller
+    than the overlap are found whole in a neighbouring tile and the larger ones
+    by the whole page detection, the duplicates are removed by class-wise NMS.
+
+    Args:
+        page_dets (tuple): (xyxy, conf, cls) arrays of the whole page detection, in page coordinates
+        tile_dets_list (list): (xyxy, conf, cls) arrays of each tile, in tile coordinates
+        tiles (list): the (xmin, ymin, xmax, ymax) of each tile, see `get_tiles`
+        width (int): the width of the page image
+        height (int): the height of the page image
+        iou_threshold (float, optional): see `nms`. Defaults to 0.45.
+
+    Returns:
+        tuple: (xyxy, conf, cls) arrays of the merged detections, in page coordinates
+    """
+    xyxy_list, conf_list, cls_list = [page_dets[0].reshape(-1, 4)], [page_dets[1]], [page_dets[2]]
+    for (xyxy, conf, cls), (x0, y0, x1, y1) in zip(tile_dets_list, tiles):
+        if len(xyxy) == 0:
+            continue
+        xyxy = xyxy.reshape(-1, 4) + np.array([x0, y0, x0, y0], dtype=np.float32)
+        margin = 0.01 * max(x1 - x0, y1 - y0)
+        cut = np.zeros(len(xyxy), dtype=bool)
+        if x0 > 0:
+            cut |= xyxy[:, 0] <= x0 + margin
+        if y0 > 0:
+            cut |= xyxy[:, 1] <= y0 + margin
+        if x1 < width:
+            cut |= xyxy[:, 2] >= x1 - margin
+        if y1 < height:
+            cut |= xyxy[:, 3] >= y1 - margin
+        xyxy_list.append(xyxy[~cut])
+        conf_list.append(conf[~cut])
+        cls_list.append(cls[~cut])
+
+    xyxy = np.concatenate(xyxy_list).astype(np.float32)
+    conf = np.concatenate(conf_list).astype(np.float32)
+    cls = np.concatenate(cls_list).astype(np.float32)
+    if len(xyxy) == 0:
+        return xyxy, conf, cls
+    # 不同类别的框平移到互不重叠的位置, 一次NMS即为按类别的NMS
+    offsets = cls[:, None] * (max(width, height) + 1)
+    keep = nms(xyxy + offsets, conf, iou_threshold)
+    return xyxy[keep], conf[keep], cls[keep]
+
+
+def layout_res_to_dets(layout_res: list) -> tuple:
+    """Convert the layout items to (xyxy, conf, cls) arrays."""
+    xyxy = np.array([[res['poly'][0], res['poly'][1], res['poly'][4], res['poly'][5]] for res in layout_res],
+                    dtype=np.float32).reshape(-1, 4)
+    conf = np.array([res['score'] for res in layout_res], dtype=np.float32)
+    cls = np.array([res['category_id'] for res in layout_res], dtype=np.float32)
+    return xyxy, conf, cls
+
+
+def dets_to_layout_res(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> list:
+    """Convert (xyxy, conf, cls) arrays to layout items."""
+    layout_res = []
+    for (xmin, ymin, xmax, ymax), score, category_id in zip(xyxy.astype(int).tolist(), conf.tolist(), cls.tolist()):
+        layout_res.append({
+            'category_id': int(category_id),
+            'poly': [xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax],
+            'score': round(float(score), 3),
+        })
+    return layout_res
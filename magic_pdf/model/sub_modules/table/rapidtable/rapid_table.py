@@ -1,16 +1,35 @@
 import numpy as np
 from rapid_table import RapidTable
-from rapidocr_paddle import RapidOCR
 
 
 class RapidTableModel(object):
     def __init__(self):
         self.table_model = RapidTable()
-        self.ocr_engine = RapidOCR(det_use_cuda=True, cls_use_cuda=True, rec_use_cuda=True)
+        # the table's own OCR engine is only loaded when the page OCR lines are not available
+        self._ocr_engine = None
 
-    def predict(self, image):
-        ocr_result, _ = self.ocr_engine(np.asarray(image))
+    @property
+    def ocr_engine(self):
+        if self._ocr_engine is None:
+            from rapidocr_paddle import RapidOCR
+            self._ocr_engine = RapidOCR(det_use_cuda=True, cls_use_cuda=True, rec_use_cuda=True)
+        return self._ocr_engine
+
+    def predict(self, image, ocr_result=None):
+        """Recognize the table structure.
+
+        Args:
+            image: the table image
+            ocr_result (list | None, optional): the text lines of the table, [[box, text, score], ...] with the box
+                in the coordinates of the table image, e.g. taken from the page OCR. Defaults to None, the text lines
+                are recognized by the table's own OCR engine.
+
+        Returns:
+            tuple: (html_code, table_cell_bboxes, elapse), all None if the table has no text
+        """
         if ocr_result is None:
+            ocr_result, _ = self.ocr_engine(np.asarray(image))
+        if not ocr_result:
             return None, None, None
         html_code, table_cell_bboxes, elapse = self.table_model(np.asarray(image), ocr_result)
-        return html_code, table_cell_bboxes, elapse
\ No newline at end of file
+        return html_code, table_cell_bboxes, elapse
@@ -8,15 +8,16 @@ import fitz
 import torch
 from loguru import logger
 
+from magic_pdf.config.constants import PRECISION_MODE
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.ocr_content_type import BlockType, ContentType
 from magic_pdf.data.dataset import Dataset, PageableData
 from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio
-from magic_pdf.libs.clean_memory import clean_memory
-from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir
+from magic_pdf.libs.clean_memory import maybe_clean_memory
+from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir, get_precision_mode
 from magic_pdf.libs.convert_utils import dict_to_list
 from magic_pdf.libs.hash_utils import compute_md5
-from magic_pdf.libs.pdf_image_tools import cut_image_to_pil_image
+from magic_pdf.libs.pdf_image_tools import PageCropper, cut_image_to_pil_image
 from magic_pdf.model.magic_model import MagicModel
 
 try:
@@ -28,6 +29,7 @@ except ImportError:
     pass
 
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+from magic_pdf.model.sub_modules.model_utils import apply_precision
 from magic_pdf.para.para_split_v3 import para_split
 from magic_pdf.pre_proc.construct_page_dict import ocr_construct_page_component_v2
 from magic_pdf.pre_proc.cut_image import ocr_cut_image_and_table
@@ -38,6 +40,9 @@ from magic_pdf.pre_proc.ocr_span_list_modify import get_qa_need_list_v2, remove_
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # 禁止albumentations检查更新
 os.environ['YOLO_VERBOSE'] = 'False'  # disable yolo logger
 
+# layoutreader每次推理的序列数, 多个页面的line一起排序
+LAYOUTREADER_BATCH_SIZE = 16
+
 
 def __replace_STX_ETX(text_str: str):
     """Replace \u0002 and \u0003, as these characters become garbled when extracted using pymupdf. In fact, they were originally quotation marks.
@@ -238,9 +243,11 @@ def txt_spans_extract_v2(pdf_page, spans, all_bboxes, all_discarded_blocks, lang
             lang=lang
         )
 
+        # 整页只渲染一次，所有span从同一张图片截图
+        cropper = PageCropper(pdf_page)
         for span in empty_spans:
             # 对span的bbox截图再ocr
-            span_img = cut_image_to_pil_image(span['bbox'], pdf_page, mode='cv2')
+            span_img = cut_image_to_pil_image(span['bbox'], pdf_page, mode='cv2', cropper=cropper)
             ocr_res = ocr_model.ocr(span_img, det=False)
             if ocr_res and len(ocr_res) > 0:
                 if len(ocr_res[0]) > 0:
@@ -286,10 +293,14 @@ def model_init(model_name: str):
             model = LayoutLMv3ForTokenClassification.from_pretrained(
                 'hantian/layoutreader'
             )
-        # 检查设备是否支持 bfloat16
-        if supports_bfloat16:
-            model.bfloat16()
         model.to(device).eval()
+        precision = get_precision_mode()
+        if precision == PRECISION_MODE.AUTO:
+            # 检查设备是否支持 bfloat16
+            if supports_bfloat16:
+                model.bfloat16()
+        else:
+            model = apply_precision(model, precision, device)
     else:
         logger.error('model name not allow')
         exit(1)
@@ -321,6 +332,39 @@ def do_predict(boxes: List[List[int]], model) -> List[int]:
     return parse_logits(logits, len(boxes))
 
 
+def batch_predict(boxes_list: List[List[List[int]]], model, batch_size: int = LAYOUTREADER_BATCH_SIZE) -> List[List[int]]:
+    """Order several sequences of line boxes, e.g. the lines of many pages,
+    the sequences are padded into batches of batch_size.
+
+    Args:
+        boxes_list (List[List[List[int]]]): the line boxes of each sequence, scaled to 0-1000, at most MAX_LEN boxes
+        model: the layoutreader model
+        batch_size (int, optional): the number of sequences in each model call. Defaults to LAYOUTREADER_BATCH_SIZE.
+
+    Returns:
+        List[List[int]]: the orders of each sequence, like `do_predict`
+    """
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import (
+        DataCollator, parse_logits, prepare_inputs)
+
+    data_collator = DataCollator()
+    orders_list = [[] for _ in boxes_list]
+    # 长度相近的序列放在同一批, 减少padding
+    indexes = sorted((i for i, boxes in enumerate(boxes_list) if len(boxes) > 0), key=lambda i: len(boxes_list[i]))
+    for start in range(0, len(indexes), batch_size):
+        batch_indexes = indexes[start: start + batch_size]
+        inputs = data_collator(
+            [{'source_boxes': boxes_list[i], 'target_index': [0] * len(boxes_list[i])} for i in batch_indexes]
+        )
+        # 推理不需要labels
+        inputs.pop('labels')
+        inputs = prepare_inputs(inputs, model)
+        logits = model(**inputs).logits.cpu()
+        for row, i in enumerate(batch_indexes):
+            orders_list[i] = parse_logits(logits[row], len(boxes_list[i]))
+    return orders_list
+
+
 def cal_block_index(fix_blocks, sorted_bboxes):
 
     if sorted_bboxes is not None:
@@ -353,20 +397,11 @@ def cal_block_index(fix_blocks, sorted_bboxes):
                 block['lines'] = copy.deepcopy(block['real_lines'])
                 del block['real_lines']
 
-        import numpy as np
-
         from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import \
-            recursive_xy_cut
-
-        random_boxes = np.array(block_bboxes)
-        np.random.shuffle(random_boxes)
-        res = []
-        recursive_xy_cut(np.asarray(random_boxes).astype(int), np.arange(len(block_bboxes)), res)
-        assert len(res) == len(block_bboxes)
-        sorted_boxes = random_boxes[np.array(res)].tolist()
+            xy_cut
 
-        for i, block in enumerate(fix_blocks):
-            block['index'] = sorted_boxes.index(block['bbox'])
+        for index, block_index in enumerate(xy_cut(block_bboxes)):
+            fix_blocks[block_index]['index'] = index
 
         # 生成line index
         sorted_blocks = sorted(fix_blocks, key=lambda b: b['index'])
@@ -421,9 +456,22 @@ def insert_lines_into_block(block_bbox, line_height, page_w, page_h):
         return [[x0, y0, x1, y1]]
 
 
-def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+def get_line_chunks(fix_blocks, page_w, page_h, line_height):
+    """Get the lines of the page to order and split them into the chunks
+    ordered by layoutreader, see `chunk_block_lines`.
+
+    Returns:
+        list: (chunk_lines, chunk_boxes) of each chunk, the line bboxes and the boxes scaled to 0-1000
+    """
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.chunking import \
+        chunk_block_lines
+    from magic_pdf.model.sub_modules.reading_oreder.layoutreader.helpers import \
+        MAX_LEN
+
     page_line_list = []
+    block_line_ranges = []
     for block in fix_blocks:
+        line_start = len(page_line_list)
         if block['type'] in [
             BlockType.Text, BlockType.Title, BlockType.InterlineEquation,
             BlockType.ImageCaption, BlockType.ImageFootnote,
@@ -447,9 +495,8 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             for line in lines:
                 block['lines'].append({'bbox': line, 'spans': []})
             page_line_list.extend(lines)
-
-    if len(page_line_list) > 200:  # layoutreader最高支持512line
-        return None
+        if len(page_line_list) > line_start:
+            block_line_ranges.append((block['bbox'], line_start, len(page_line_list)))
 
     # 使用layoutreader排序
     x_scale = 1000.0 / page_w
@@ -486,13 +533,43 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
             1000 >= right >= left >= 0 and 1000 >= bottom >= top >= 0
         ), f'Invalid box. right: {right}, left: {left}, bottom: {bottom}, top: {top}'  # noqa: E126, E121
         boxes.append([left, top, right, bottom])
+
+    # layoutreader最多支持MAX_LEN个line, 更长的页面分块排序
+    return [
+        ([page_line_list[i] for i in chunk], [boxes[i] for i in chunk])
+        for chunk in chunk_block_lines(block_line_ranges, MAX_LEN)
+    ]
+
+
+def sort_pages_lines_by_model(line_chunks_list: list) -> list:
+    """Order the lines of many pages with layoutreader, the chunks of all the
+    pages are ordered in batches.
+
+    Args:
+        line_chunks_list (list): the line chunks of each page, see `get_line_chunks`
+
+    Returns:
+        list: the sorted line bboxes of each page
+    """
+    boxes_list = [chunk_boxes for line_chunks in line_chunks_list for _, chunk_boxes in line_chunks]
     model_manager = ModelSingleton()
     model = model_manager.get_model('layoutreader')
     with torch.no_grad():
-        orders = do_predict(boxes, model)
-    sorted_bboxes = [page_line_list[i] for i in orders]
+        orders_list = batch_predict(boxes_list, model)
 
-    return sorted_bboxes
+    sorted_bboxes_list = []
+    orders_iter = iter(orders_list)
+    for line_chunks in line_chunks_list:
+        sorted_bboxes = []
+        for chunk_lines, _ in line_chunks:
+            sorted_bboxes.extend(chunk_lines[i] for i in next(orders_iter))
+        sorted_bboxes_list.append(sorted_bboxes)
+    return sorted_bboxes_list
+
+
+def sort_lines_by_model(fix_blocks, page_w, page_h, line_height):
+    line_chunks = get_line_chunks(fix_blocks, page_w, page_h, line_height)
+    return sort_pages_lines_by_model([line_chunks])[0]
 
 
 def get_line_height(blocks):
@@ -611,9 +688,15 @@ def remove_outside_spans(spans, all_bboxes, all_discarded_blocks):
     return new_spans
 
 
-def parse_page_core(
+def prepare_page_core(
     page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
-):
+) -> dict:
+    """Parse the page up to the reading order, the lines to order are
+    returned in 'line_chunks' and the page is finished by `finish_page_core`.
+
+    Returns:
+        dict: the state of the page, with 'page_info' instead if the page is done
+    """
     need_drop = False
     drop_reason = []
 
@@ -697,7 +780,7 @@ def parse_page_core(
     """如果当前页面没有有效的bbox则跳过"""
     if len(all_bboxes) == 0:
         logger.warning(f'skip this page, not found useful bbox, page_id: {page_id}')
-        return ocr_construct_page_component_v2(
+        page_info = ocr_construct_page_component_v2(
             [],
             [],
             page_id,
@@ -711,6 +794,7 @@ def parse_page_core(
             need_drop,
             drop_reason,
         )
+        return {'page_info': page_info}
 
     """对image和table截图"""
     spans = ocr_cut_image_and_table(
@@ -726,8 +810,33 @@ def parse_page_core(
     """获取所有line并计算正文line的高度"""
     line_height = get_line_height(fix_blocks)
 
-    """获取所有line并对line排序"""
-    sorted_bboxes = sort_lines_by_model(fix_blocks, page_w, page_h, line_height)
+    """获取所有line, 排序在finish_page_core之前批量进行"""
+    line_chunks = get_line_chunks(fix_blocks, page_w, page_h, line_height)
+
+    return {
+        'page_id': page_id,
+        'page_w': page_w,
+        'page_h': page_h,
+        'fix_blocks': fix_blocks,
+        'fix_discarded_blocks': fix_discarded_blocks,
+        'need_drop': need_drop,
+        'drop_reason': drop_reason,
+        'line_chunks': line_chunks,
+    }
+
+
+def finish_page_core(page_state: dict, sorted_bboxes) -> dict:
+    """Finish the page prepared by `prepare_page_core` with the sorted lines.
+
+    Args:
+        page_state (dict): the state returned by `prepare_page_core`
+        sorted_bboxes (list | None): the sorted line bboxes, see `sort_pages_lines_by_model`
+
+    Returns:
+        dict: the page_info
+    """
+    page_id = page_state['page_id']
+    fix_blocks = page_state['fix_blocks']
 
     """根据line的中位数算block的序列关系"""
     fix_blocks = cal_block_index(fix_blocks, sorted_bboxes)
@@ -746,19 +855,29 @@ def parse_page_core(
         sorted_blocks,
         [],
         page_id,
-        page_w,
-        page_h,
+        page_state['page_w'],
+        page_state['page_h'],
         [],
         images,
         tables,
         interline_equations,
-        fix_discarded_blocks,
-        need_drop,
-        drop_reason,
+        page_state['fix_discarded_blocks'],
+        page_state['need_drop'],
+        page_state['drop_reason'],
     )
     return page_info
 
 
+def parse_page_core(
+    page_doc: PageableData, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
+):
+    page_state = prepare_page_core(page_doc, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang)
+    if 'page_info' in page_state:
+        return page_state['page_info']
+    sorted_bboxes = sort_pages_lines_by_model([page_state['line_chunks']])[0]
+    return finish_page_core(page_state, sorted_bboxes)
+
+
 def pdf_parse_union(
     model_list,
     dataset: Dataset,
@@ -792,6 +911,7 @@ def pdf_parse_union(
 
     """初始化启动时间"""
     start_time = time.time()
+    page_states = []
 
     for page_id, page in enumerate(dataset):
         """debug时输出每页解析的耗时."""
@@ -802,11 +922,15 @@ def pdf_parse_union(
             )
             start_time = time_now
 
-        """解析pdf中的每一页"""
+        """解析pdf中的每一页, 需要排序的页面先保留中间状态"""
         if start_page_id <= page_id <= end_page_id:
-            page_info = parse_page_core(
+            page_state = prepare_page_core(
                 page, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
             )
+            if 'page_info' not in page_state:
+                page_states.append(page_state)
+                continue
+            page_info = page_state['page_info']
         else:
             page_info = page.get_page_info()
             page_w = page_info.w
@@ -816,6 +940,15 @@ def pdf_parse_union(
             )
         pdf_info_dict[f'page_{page_id}'] = page_info
 
+    """所有页面的line一起用layoutreader排序"""
+    if len(page_states) > 0:
+        sort_start = time.time()
+        sorted_bboxes_list = sort_pages_lines_by_model([page_state['line_chunks'] for page_state in page_states])
+        logger.info(f'layoutreader sort time: {round(time.time() - sort_start, 2)}, pages: {len(page_states)}')
+        for page_state, sorted_bboxes in zip(page_states, sorted_bboxes_list):
+            pdf_info_dict[f"page_{page_state['page_id']}"] = finish_page_core(page_state, sorted_bboxes)
+    pdf_info_dict = {f'page_{page_id}': pdf_info_dict[f'page_{page_id}'] for page_id in range(len(dataset))}
+
     """分段"""
     para_split(pdf_info_dict)
 
@@ -825,7 +958,7 @@ def pdf_parse_union(
         'pdf_info': pdf_info_list,
     }
 
-    clean_memory()
+    maybe_clean_memory()
 
     return new_pdf_info_dict
 
@@ -2,25 +2,28 @@ from loguru import logger
 
 from magic_pdf.config.ocr_content_type import ContentType
 from magic_pdf.libs.commons import join_path
-from magic_pdf.libs.pdf_image_tools import cut_image
+from magic_pdf.libs.pdf_image_tools import PageCropper, cut_image
 
 
 def ocr_cut_image_and_table(spans, page, page_id, pdf_bytes_md5, imageWriter):
     def return_path(type):
         return join_path(pdf_bytes_md5, type)
 
+    # 同一页的image和table共用一张整页图片截图
+    cropper = PageCropper(page)
+
     for span in spans:
         span_type = span['type']
         if span_type == ContentType.Image:
             if not check_img_bbox(span['bbox']) or not imageWriter:
                 continue
             span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('images'),
-                                           imageWriter=imageWriter)
+                                           imageWriter=imageWriter, cropper=cropper)
         elif span_type == ContentType.Table:
             if not check_img_bbox(span['bbox']) or not imageWriter:
                 continue
             span['image_path'] = cut_image(span['bbox'], page_id, page, return_path=return_path('tables'),
-                                           imageWriter=imageWriter)
+                                           imageWriter=imageWriter, cropper=cropper)
 
     return spans
 
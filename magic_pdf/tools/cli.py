@@ -10,7 +10,7 @@ from magic_pdf.libs.version import __version__
 from magic_pdf.tools.common import do_parse, parse_pdf_methods
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.version_option(__version__,
                       '--version',
                       '-v',
@@ -20,7 +20,6 @@ from magic_pdf.tools.common import do_parse, parse_pdf_methods
     '--path',
     'path',
     type=click.Path(exists=True),
-    required=True,
     help='local pdf filepath or directory',
 )
 @click.option(
@@ -28,7 +27,6 @@ from magic_pdf.tools.common import do_parse, parse_pdf_methods
     '--output-dir',
     'output_dir',
     type=click.Path(),
-    required=True,
     help='output local directory',
 )
 @click.option(
@@ -79,14 +77,21 @@ without method specified, auto will be used by default.""",
     help='The ending page for PDF parsing, beginning from 0.',
     default=None,
 )
-def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
+@click.pass_context
+def cli(ctx, path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
+    # `magic-pdf serve ...` runs the subcommand, `magic-pdf -p ... -o ...` parses the pdfs
+    if ctx.invoked_subcommand is not None:
+        return
+    if path is None or output_dir is None:
+        raise click.UsageError("Missing option '-p' / '--path' or '-o' / '--output-dir'.")
+
     model_config.__use_inside_model__ = True
     model_config.__model_mode__ = 'full'
     os.makedirs(output_dir, exist_ok=True)
 
     def read_fn(path):
         disk_rw = FileBasedDataReader(os.path.dirname(path))
-        return disk_rw.read(os.path.basename(path))
+        return disk_rw.read_mmap(os.path.basename(path))
 
     def parse_doc(doc_path: str):
         try:
@@ -114,5 +119,71 @@ def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
         parse_doc(path)
 
 
+@cli.command()
+@click.option('--host', 'host', type=str, default='127.0.0.1', help='the address to listen on')
+@click.option('--port', 'port', type=int, default=8000, help='the port to listen on')
+@click.option('-w', '--workers', 'workers', type=click.IntRange(min=1), default=1, help='the number of worker processes')
+@click.option(
+    '-o',
+    '--output-dir',
+    'output_dir',
+    type=click.Path(),
+    default='/tmp',
+    help='output local directory',
+)
+@click.option(
+    '-l',
+    '--lang',
+    'lang',
+    type=str,
+    help='the language of the ocr model preloaded, see the lang option of magic-pdf',
+    default=None,
+)
+@click.option(
+    '-t',
+    '--threads-per-worker',
+    'threads_per_worker',
+    type=int,
+    help='the torch threads of each worker, defaults to the cpu count divided by the workers',
+    default=None,
+)
+@click.option(
+    '--memory-report-interval',
+    'memory_report_interval',
+    type=float,
+    help='log the rss, pss and unique memory of each worker every interval seconds, 0 means never',
+    default=0,
+)
+def serve(host, port, workers, output_dir, lang, threads_per_worker, memory_report_interval):
+    """Serve POST /parse with workers forked from a process holding the
+    models, the workers share the model weights copy-on-write. GET /memory
+    returns the memory of each worker."""
+    import torch
+
+    from magic_pdf.libs.config_reader import get_device, get_onnx_config
+    from magic_pdf.tools.server import PreforkServer
+
+    device = get_device()
+    if device != 'cpu':
+        # cuda和mps在fork后不可用
+        raise click.UsageError(f'serve forks the workers and supports the cpu device only, got {device}')
+    if get_onnx_config().get('enable', False):
+        # onnxruntime的会话在fork后不可用
+        raise click.UsageError('serve forks the workers after loading the models, disable onnx-config to use it')
+
+    model_config.__use_inside_model__ = True
+    model_config.__model_mode__ = 'full'
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 线程数在加载模型前设置, 由fork出的worker继承
+    if threads_per_worker is None:
+        threads_per_worker = max((os.cpu_count() or 1) // workers, 1)
+    torch.set_num_threads(threads_per_worker)
+
+    server = PreforkServer(host, port, workers, output_dir, memory_report_interval)
+    server.preload(lang=lang)
+    server.serve()
+
+
 if __name__ == '__main__':
     cli()
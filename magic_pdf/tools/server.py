@@ -0,0 +1,297 @@
+import base64
+import gc
+import json
+import os
+import signal
+import socket
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from uuid import uuid4
+
+from loguru import logger
+
+# smaps的字段, USS为进程独占的内存, 即Private_Clean与Private_Dirty之和
+SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Private_Clean': 'uss',
+    'Private_Dirty': 'uss',
+    'Shared_Clean': 'shared',
+    'Shared_Dirty': 'shared',
+}
+
+
+def get_memory_usage(pid: int) -> dict:
+    """Get the memory of a process from /proc/<pid>/smaps_rollup, the pages
+    shared copy-on-write with the parent are counted in shared and not in
+    uss.
+
+    Args:
+        pid (int): the process id
+
+    Returns:
+        dict: {'rss': int, 'pss': int, 'uss': int, 'shared': int} in bytes
+    """
+    usage = {'rss': 0, 'pss': 0, 'uss': 0, 'shared': 0}
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        path = f'/proc/{pid}/smaps'
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in SMAPS_FIELDS:
+                usage[SMAPS_FIELDS[parts[0].rstrip(':')]] += int(parts[1]) * 1024
+    return usage
+
+
+def get_child_pids(parent_pid: int) -> list:
+    """Get the ids of the child processes of a process from /proc."""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名在括号中且可能包含空格, 括号后依次为state和ppid
+        fields = stat[stat.rindex(')') + 2:].split()
+        if int(fields[1]) == parent_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def get_workers_memory_usage(parent_pid: int) -> dict:
+    """Get the memory of the parent process and of each of its workers.
+
+    Args:
+        parent_pid (int): the id of the parent process
+
+    Returns:
+        dict: {'parent': usage, 'workers': {pid: usage}}, see `get_memory_usage`
+    """
+    workers = {}
+    for pid in get_child_pids(parent_pid):
+        try:
+            workers[pid] = get_memory_usage(pid)
+        except OSError:
+            # the worker exited in the meantime
+            continue
+    return {'parent': get_memory_usage(parent_pid), 'workers': workers}
+
+
+def freeze_models():
+    """Prepare the loaded models to be shared by the forked workers, the
+    models are put in eval mode without gradients and the objects allocated
+    so far are moved out of the garbage collector, so that neither the
+    inference nor the collections of the workers write to the shared pages."""
+    import torch
+
+    from magic_pdf.model.model_residency import find_torch_modules
+    from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+    for model in AtomModelSingleton().residency.models():
+        for module in find_torch_modules(model):
+            module.eval()
+            module.requires_grad_(False)
+    torch.set_grad_enabled(False)
+    gc.collect()
+    gc.freeze()
+
+
+def to_pdf(file_bytes: bytes) -> bytes:
+    import fitz
+
+    with fitz.open(stream=file_bytes) as f:
+        if f.is_pdf:
+            return f.tobytes()
+        return f.convert_to_pdf()
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    """POST /parse {'file': base64 of the pdf or image, 'kwargs': the
+    arguments of do_parse} returns {'output_dir': the name of the output},
+    GET /memory returns the memory of the server processes and the memory
+    collections of the worker."""
+
+    def send_json(self, code: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'pid': os.getpid()})
+        elif self.path == '/memory':
+            from magic_pdf.libs.clean_memory import get_memory_manager
+
+            usage = get_workers_memory_usage(os.getppid())
+            # 回收次数和耗时是处理该请求的worker的
+            usage['memory_manager'] = {'pid': os.getpid(), **get_memory_manager().stats()}
+            self.send_json(200, usage)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != '/parse':
+            self.send_error(404)
+            return
+
+        from magic_pdf.libs.clean_memory import maybe_clean_memory
+        from magic_pdf.tools.common import do_parse
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            pdf_bytes = to_pdf(base64.b64decode(request['file']))
+            opts = request.get('kwargs', {})
+            opts.setdefault('debug_able', False)
+            opts.setdefault('parse_method', 'auto')
+            pdf_name = str(uuid4())
+            do_parse(self.server.output_dir, pdf_name, pdf_bytes, [], **opts)
+        except Exception as e:
+            logger.exception(e)
+            self.send_json(500, {'detail': str(e)})
+        else:
+            self.send_json(200, {'output_dir': pdf_name})
+        finally:
+            maybe_clean_memory()
+
+    def log_message(self, format, *args):
+        logger.debug(f'worker {os.getpid()}: {format % args}')
+
+
+class PreforkServer:
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        workers: int = 1,
+        output_dir: str = '/tmp',
+        memory_report_interval: float = 0,
+    ):
+        """Load the models once in the parent process and fork the workers
+        serving the parse requests, the workers share the weights of the parent
+        copy-on-write.
+
+        Args:
+            host (str, optional): the address to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): the port to listen on. Defaults to 8000.
+            workers (int, optional): the number of worker processes. Defaults to 1.
+            output_dir (str, optional): the directory of the parse outputs. Defaults to '/tmp'.
+            memory_report_interval (float, optional): log the memory of the workers every interval seconds,
+                0 means never. Defaults to 0.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.output_dir = output_dir
+        self.memory_report_interval = memory_report_interval
+        self._socket = None
+        self._worker_pids = set()
+        self._stopping = False
+
+    def preload(self, lang=None):
+        """Load the models of the ocr and the txt mode and freeze them, must
+        be called before `serve`. PaddleOCR is not fork-safe, each worker loads
+        its own on its first use."""
+        from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
+        from magic_pdf.model.model_list import AtomicModel
+        from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+        AtomModelSingleton().defer_atom_models(AtomicModel.OCR)
+        model_manager = ModelSingleton()
+        for ocr in [True, False]:
+            custom_model = model_manager.get_model(ocr, False, lang)
+            # 模型在后台线程中加载, fork前必须加载完成且加载线程已退出, 子进程中不存在这些线程
+            if hasattr(custom_model, 'wait_models'):
+                custom_model.wait_models()
+            # 表格模型在子进程中运行, 每个worker在fork后启动自己的子进程
+            if hasattr(custom_model, 'close_workers'):
+                custom_model.close_workers()
+        freeze_models()
+
+    def serve(self):
+        self._socket = socket.create_server((self.host, self.port), backlog=128)
+        # 所有worker在同一个socket上accept, 非阻塞避免未抢到连接的worker阻塞在accept中
+        self._socket.setblocking(False)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info(f'serving on http://{self.host}:{self.port} with {self.workers} workers')
+
+        next_report = time.time() + self.memory_report_interval
+        try:
+            while not self._stopping:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    pid, status = 0, 0
+                if pid in self._worker_pids:
+                    self._worker_pids.remove(pid)
+                    if not self._stopping:
+                        logger.warning(f'worker {pid} exited with status {status}, restart it')
+                        self._spawn()
+                    continue
+                if self.memory_report_interval > 0 and time.time() >= next_report:
+                    self.log_memory_usage()
+                    next_report = time.time() + self.memory_report_interval
+                time.sleep(0.5)
+        finally:
+            self._shutdown()
+
+    def log_memory_usage(self):
+        usage = get_workers_memory_usage(os.getpid())
+        mb = 1024 * 1024
+        logger.info(f"parent {os.getpid()}: rss {usage['parent']['rss'] // mb}MB, uss {usage['parent']['uss'] // mb}MB")
+        for pid, worker_usage in usage['workers'].items():
+            logger.info(
+                f"worker {pid}: rss {worker_usage['rss'] // mb}MB, pss {worker_usage['pss'] // mb}MB, "
+                f"uss {worker_usage['uss'] // mb}MB, shared {worker_usage['shared'] // mb}MB"
+            )
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid != 0:
+            self._worker_pids.add(pid)
+            return
+
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            httpd = HTTPServer((self.host, self.port), ParseRequestHandler, bind_and_activate=False)
+            httpd.socket.close()
+            httpd.socket = self._socket
+            httpd.output_dir = self.output_dir
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            logger.exception(e)
+            exit_code = 1
+        finally:
+            # 不执行父进程注册的清理函数
+            os._exit(exit_code)
+
+    def _shutdown(self):
+        for pid in self._worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self._worker_pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self._worker_pids.clear()
+        self._socket.close()
+        logger.info('server stopped')
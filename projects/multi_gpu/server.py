@@ -46,11 +46,8 @@ class MinerUAPI(ls.LitAPI):
         return {'output_dir': response}
 
     def clean_memory(self):
-        import gc
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            torch.cuda.ipc_collect()
-        gc.collect()
+        from magic_pdf.libs.clean_memory import maybe_clean_memory
+        maybe_clean_memory()
 
     def to_pdf(self, file_base64):
         try:
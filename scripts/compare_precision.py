@@ -0,0 +1,191 @@
+"""Compare the accuracy and latency of the precision modes of UniMerNet and
+LayoutReader on the pdf_dev sample.
+
+Each precision mode runs in its own process with a copy of magic-pdf.json
+whose precision-mode is replaced, the outputs of each mode are compared to
+the fp32 outputs: the formulas by their latex and the pages by their
+markdown, and to the cleaned annotations when they exist.
+
+usage:
+    python scripts/compare_precision.py --modes fp32 bf16 int8-dynamic
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_PDF_DEV_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'test_cli', 'pdf_dev')
+
+
+def run_mode(pdf_dir: str, output_dir: str, parse_method: str):
+    """Parse the pdfs with the precision mode of the current config, runs in
+    the worker process."""
+    from magic_pdf.config.enums import SupportedPdfParseMethod
+    from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+    from magic_pdf.data.read_api import read_local_pdfs
+    from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+
+    report = {}
+    for pdf_path in sorted(glob.glob(os.path.join(pdf_dir, '*.pdf'))):
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        ds = read_local_pdfs(pdf_path)[0]
+        ocr = parse_method == 'ocr' or (parse_method == 'auto' and ds.classify() == SupportedPdfParseMethod.OCR)
+
+        analyze_start = time.time()
+        infer_result = ds.apply(doc_analyze, ocr=ocr)
+        analyze_time = time.time() - analyze_start
+
+        image_writer = FileBasedDataWriter(os.path.join(output_dir, 'images'))
+        pipe_start = time.time()
+        if ocr:
+            pipe_result = infer_result.pipe_ocr_mode(image_writer)
+        else:
+            pipe_result = infer_result.pipe_txt_mode(image_writer)
+        pipe_time = time.time() - pipe_start
+
+        md_writer = FileBasedDataWriter(output_dir)
+        pipe_result.dump_md(md_writer, f'{name}.md', 'images')
+        with open(os.path.join(output_dir, f'{name}_model.json'), 'w', encoding='utf-8') as f:
+            json.dump(infer_result.get_infer_res(), f, ensure_ascii=False)
+        report[name] = {'pages': len(ds), 'analyze_time': analyze_time, 'pipe_time': pipe_time}
+
+    with open(os.path.join(output_dir, 'timing.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f)
+
+
+def spawn_mode(mode: str, args) -> str:
+    """Run `run_mode` in a new process with the precision mode set in a copy
+    of the config."""
+    config_file = os.getenv('MINERU_TOOLS_CONFIG_JSON', 'magic-pdf.json')
+    if not os.path.isabs(config_file):
+        config_file = os.path.join(os.path.expanduser('~'), config_file)
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['precision-mode'] = mode
+
+    output_dir = os.path.join(args.output_dir, mode)
+    os.makedirs(output_dir, exist_ok=True)
+    mode_config_file = os.path.join(args.output_dir, f'magic-pdf.{mode}.json')
+    with open(mode_config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+
+    env = dict(os.environ, MINERU_TOOLS_CONFIG_JSON=mode_config_file)
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', '--pdf-dir', args.pdf_dir, '--output-dir', output_dir,
+         '--method', args.method],
+        env=env,
+        check=True,
+    )
+    return output_dir
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def formula_latex(model_json: list) -> dict:
+    """The latex of the formulas by (page_no, poly)."""
+    formulas = {}
+    for page in model_json:
+        for det in page['layout_dets']:
+            if int(det['category_id']) in [13, 14]:
+                formulas[(page['page_info']['page_no'], tuple(det['poly']))] = det.get('latex', '')
+    return formulas
+
+
+def find_annotation(annotation_dir: str, name: str, single_pdf: bool) -> str | None:
+    """The cleaned annotation of the pdf, the pdf_dev sample has a single pdf
+    whose annotation is not named after it."""
+    annotation_files = sorted(glob.glob(os.path.join(annotation_dir, '*.md')))
+    for annotation_file in annotation_files:
+        if name in os.path.basename(annotation_file):
+            return annotation_file
+    if single_pdf and len(annotation_files) == 1:
+        return annotation_files[0]
+    return None
+
+
+def compare_mode(mode_dir: str, base_dir: str, annotation_dir: str) -> dict:
+    with open(os.path.join(mode_dir, 'timing.json'), 'r', encoding='utf-8') as f:
+        timing = json.load(f)
+
+    pages = sum(item['pages'] for item in timing.values())
+    analyze_time = sum(item['analyze_time'] for item in timing.values())
+    result = {
+        'pages': pages,
+        'analyze_time': round(analyze_time, 2),
+        'pipe_time': round(sum(item['pipe_time'] for item in timing.values()), 2),
+        'sec_per_page': round(analyze_time / max(pages, 1), 3),
+    }
+
+    formula_total, formula_same, formula_sim = 0, 0, 0.0
+    md_sim, annotation_sim, annotation_num = [], [], 0
+    for name in timing:
+        with open(os.path.join(mode_dir, f'{name}_model.json'), 'r', encoding='utf-8') as f:
+            mode_formulas = formula_latex(json.load(f))
+        with open(os.path.join(base_dir, f'{name}_model.json'), 'r', encoding='utf-8') as f:
+            base_formulas = formula_latex(json.load(f))
+        # 检测结果不受精度影响, 按位置一一对应比较latex
+        for key, latex in base_formulas.items():
+            if key in mode_formulas:
+                formula_total += 1
+                formula_same += int(mode_formulas[key] == latex)
+                formula_sim += similarity(mode_formulas[key], latex)
+
+        with open(os.path.join(mode_dir, f'{name}.md'), 'r', encoding='utf-8') as f:
+            mode_md = f.read()
+        with open(os.path.join(base_dir, f'{name}.md'), 'r', encoding='utf-8') as f:
+            md_sim.append(similarity(mode_md, f.read()))
+        annotation_file = find_annotation(annotation_dir, name, len(timing) == 1)
+        if annotation_file is not None:
+            with open(annotation_file, 'r', encoding='utf-8') as f:
+                annotation_sim.append(similarity(mode_md, f.read()))
+                annotation_num += 1
+
+    result['formulas'] = formula_total
+    result['formula_exact_match'] = round(formula_same / formula_total, 4) if formula_total else None
+    result['formula_similarity'] = round(formula_sim / formula_total, 4) if formula_total else None
+    result['markdown_similarity_to_fp32'] = round(sum(md_sim) / len(md_sim), 4) if md_sim else None
+    result['markdown_similarity_to_annotation'] = (
+        round(sum(annotation_sim) / annotation_num, 4) if annotation_num else None
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the precision modes of UniMerNet and LayoutReader')
+    parser.add_argument('--modes', nargs='+', default=['fp32', 'bf16', 'int8-dynamic'],
+                        help='the precision modes to compare, fp32 is always run as the baseline')
+    parser.add_argument('--pdf-dir', default=os.path.join(DEFAULT_PDF_DEV_DIR, 'pdf'))
+    parser.add_argument('--annotation-dir', default=os.path.join(DEFAULT_PDF_DEV_DIR, 'annotations', 'cleaned'))
+    parser.add_argument('--output-dir', default=None, help='defaults to a temporary directory')
+    parser.add_argument('--method', default='auto', choices=['auto', 'txt', 'ocr'])
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_mode(args.pdf_dir, args.output_dir, args.method)
+        return
+
+    if args.output_dir is None:
+        args.output_dir = tempfile.mkdtemp(prefix='compare_precision_')
+    modes = ['fp32'] + [mode for mode in args.modes if mode != 'fp32']
+    mode_dirs = {mode: spawn_mode(mode, args) for mode in modes}
+
+    report = {mode: compare_mode(mode_dirs[mode], mode_dirs['fp32'], args.annotation_dir) for mode in modes}
+    base_time = report['fp32']['analyze_time']
+    for mode in modes:
+        report[mode]['speedup'] = round(base_time / report[mode]['analyze_time'], 2) if report[mode]['analyze_time'] else None
+
+    print(json.dumps(report, ensure_ascii=False, indent=4))
+    with open(os.path.join(args.output_dir, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    main()
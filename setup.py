@@ -51,6 +51,7 @@ if __name__ == '__main__':
                      "doclayout_yolo==0.0.2",  # doclayout_yolo
                      "rapidocr-paddle",  # rapidocr-paddle
                      "rapid_table",  # rapid_table
+                     "onnxruntime",  # doclayout_yolo和公式检测模型的onnx cpu推理
                      "PyYAML",  # yaml
                      "detectron2"
                      ],
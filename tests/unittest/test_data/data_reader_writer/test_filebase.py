@@ -22,3 +22,22 @@ def test_filebased_reader_writer():
     writer.write(abs_fn, b'hello world')
     assert reader.read(abs_fn) == b'hello world'
     shutil.rmtree(unitest_dir)
+
+
+def test_filebased_reader_mmap():
+
+    unitest_dir = '/tmp/magic_pdf/unittest/data/filebased_reader_mmap'
+    os.makedirs(unitest_dir, exist_ok=True)
+
+    writer = FileBasedDataWriter(unitest_dir)
+    reader = FileBasedDataReader(unitest_dir)
+
+    writer.write('test.txt', b'hello world')
+    bits = reader.read_mmap('test.txt')
+    assert isinstance(bits, memoryview)
+    assert bits.readonly
+    assert bits == b'hello world'
+
+    writer.write('empty.txt', b'')
+    assert reader.read_mmap('empty.txt') == b''
+    shutil.rmtree(unitest_dir)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from magic_pdf.data.cache import PageImageCache
+
+
+def _img_dict(nbytes):
+    return {'img': np.zeros(nbytes, dtype=np.uint8), 'width': nbytes, 'height': 1}
+
+
+def test_page_image_cache_lru_eviction():
+    cache = PageImageCache(max_bytes=300)
+    cache.put((0, 200), _img_dict(100))
+    cache.put((1, 200), _img_dict(100))
+    cache.put((2, 200), _img_dict(100))
+    assert cache.nbytes == 300
+
+    # touch page 0, so page 1 becomes the least recently used
+    assert cache.get((0, 200)) is not None
+    cache.put((3, 200), _img_dict(100))
+    assert (1, 200) not in cache
+    assert (0, 200) in cache
+    assert len(cache) == 3
+    assert cache.nbytes == 300
+
+
+def test_page_image_cache_oversize():
+    cache = PageImageCache(max_bytes=100)
+    cache.put((0, 200), _img_dict(101))
+    assert cache.get((0, 200)) is None
+    assert cache.nbytes == 0
+
+    cache.put((0, 200), _img_dict(100))
+    cache.put((0, 200), _img_dict(50))
+    assert cache.nbytes == 50
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_page_image_cache_shared_image_is_read_only():
+    cache = PageImageCache(max_bytes=300)
+    cache.put((0, 200), _img_dict(100))
+    first = cache.get((0, 200))
+    second = cache.get((0, 200))
+    assert first is not second
+    assert first['img'] is second['img']
+    with pytest.raises(ValueError):
+        first['img'][0] = 1
+
+    # the callers may change their own dict
+    first['img'] = first['img'].copy()
+    first['img'][0] = 1
+    assert cache.get((0, 200))['img'][0] == 0
@@ -1,5 +1,6 @@
 
-from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
+from magic_pdf.data.dataset import (ImageDataset, PymuDocDataset,
+                                    PymuDocFileDataset)
 
 
 def test_pymudataset():
@@ -16,3 +17,30 @@ def test_imagedataset():
     datasets = ImageDataset(bits)
     assert len(datasets) == 1
     assert datasets.get_page(0).get_page_info().w > 100
+
+
+def test_pymudataset_image_cache():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocDataset(bits)
+    page = datasets.get_page(0)
+    assert page.get_image_size() == (page.get_image()['width'], page.get_image()['height'])
+    assert page.get_image()['img'] is page.get_image()['img']
+
+    datasets = PymuDocDataset(bits, image_cache_bytes=0)
+    page = datasets.get_page(0)
+    assert page.get_image()['img'] is not page.get_image()['img']
+
+
+def test_pymudocfiledataset():
+    pdf_path = 'tests/unittest/test_data/assets/pdfs/test_01.pdf'
+    with open(pdf_path, 'rb') as f:
+        bits = f.read()
+    datasets = PymuDocFileDataset(pdf_path)
+    assert len(datasets) == len(PymuDocDataset(bits))
+    assert datasets.data_bits() == bits
+    assert datasets.get_page(0).get_page_info().w > 0
+
+    cloned = datasets.clone()
+    assert isinstance(cloned, PymuDocFileDataset)
+    assert len(cloned) == len(datasets)
@@ -0,0 +1,50 @@
+import os
+
+import fitz
+import numpy as np
+
+from magic_pdf.data.rasterizer import PageRasterizer
+from magic_pdf.data.utils import fitz_doc_to_image
+
+
+def test_page_rasterizer():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    doc = fitz.open('pdf', bits)
+    page_ids = list(range(len(doc)))[::-1]
+
+    with PageRasterizer(bits, workers=2, dpi=72, prefetch=2) as rasterizer:
+        images = list(rasterizer.imap(page_ids))
+
+    assert len(images) == len(page_ids)
+    for page_id, img_dict in zip(page_ids, images):
+        expected = fitz_doc_to_image(doc[page_id], dpi=72)
+        assert img_dict['width'] == expected['width']
+        assert img_dict['height'] == expected['height']
+        assert np.array_equal(img_dict['img'], expected['img'])
+
+
+def test_page_rasterizer_early_close():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    shm_before = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+    with PageRasterizer(bits, workers=2, dpi=72, prefetch=4) as rasterizer:
+        images = rasterizer.imap([0, 0, 0, 0, 0])
+        next(images)
+        images.close()
+
+    if os.path.isdir('/dev/shm'):
+        assert set(os.listdir('/dev/shm')) - shm_before == set()
+
+
+def test_page_rasterizer_render_options():
+    with open('tests/unittest/test_data/assets/pdfs/test_01.pdf', 'rb') as f:
+        bits = f.read()
+    doc = fitz.open('pdf', bits)
+
+    with PageRasterizer(bits, workers=2, dpi=72) as rasterizer:
+        images = list(rasterizer.imap([0], render_options={0: (36, None)}))
+
+    assert images[0]['width'] == fitz_doc_to_image(doc[0], dpi=36, max_side=None)['width']
+    assert images[0]['width'] != fitz_doc_to_image(doc[0], dpi=72)['width']
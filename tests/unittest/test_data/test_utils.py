@@ -0,0 +1,34 @@
+import fitz
+import numpy as np
+import pytest
+from PIL import Image
+
+from magic_pdf.data.utils import fitz_doc_image_size, fitz_doc_to_image
+
+
+def test_fitz_doc_to_image():
+    doc = fitz.open('tests/unittest/test_data/assets/pdfs/test_01.pdf')
+    page = doc[0]
+
+    img_dict = fitz_doc_to_image(page)
+    pm = page.get_pixmap(matrix=fitz.Matrix(200 / 72, 200 / 72), alpha=False)
+    expected = np.array(Image.frombytes('RGB', (pm.width, pm.height), pm.samples))
+    assert np.array_equal(img_dict['img'], expected)
+    assert fitz_doc_image_size(page) == (img_dict['width'], img_dict['height'])
+
+    gray_dict = fitz_doc_to_image(page, mode='L')
+    assert gray_dict['img'].shape == (img_dict['height'], img_dict['width'])
+    assert gray_dict['img'].nbytes * 3 == img_dict['img'].nbytes
+
+    with pytest.raises(ValueError):
+        fitz_doc_to_image(page, mode='CMYK')
+
+
+def test_fitz_doc_to_image_max_side():
+    doc = fitz.open('tests/unittest/test_data/assets/pdfs/test_01.pdf')
+    page = doc[0]
+
+    img_dict = fitz_doc_to_image(page, dpi=200, max_side=500)
+    assert 499 <= max(img_dict['width'], img_dict['height']) <= 500
+    assert img_dict['img'].shape[:2] == (img_dict['height'], img_dict['width'])
+    assert fitz_doc_image_size(page, dpi=200, max_side=500) == (img_dict['width'], img_dict['height'])
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('paddleocr')
+
+from magic_pdf.model.sub_modules.ocr.paddleocr.ocr_utils import \
+    get_table_ocr_result  # noqa: E402
+from magic_pdf.model.sub_modules.ocr.paddleocr.ppocr_273_mod import \
+    ModifiedPaddleOCR  # noqa: E402
+
+
+def text_detector(img):
+    # a text line for each band of dark rows, spanning the dark columns of the band
+    dark_pixels = (img < 250).any(axis=2)
+    dark = dark_pixels.any(axis=1)
+    boxes = []
+    y = 0
+    while y < len(dark):
+        if dark[y]:
+            y0 = y
+            while y < len(dark) and dark[y]:
+                y += 1
+            columns = np.flatnonzero(dark_pixels[y0:y].any(axis=0))
+            x0, x1 = columns[0], columns[-1]
+            boxes.append([[x0, y0], [x1, y0], [x1, y - 1], [x0, y - 1]])
+        y += 1
+    if not boxes:
+        return None, 0.0
+    return np.array(boxes, dtype=np.float32), 0.0
+
+
+def text_classifier(img_crop_list):
+    return img_crop_list, [['0', 1.0]] * len(img_crop_list), 0.0
+
+
+def text_recognizer(img_crop_list):
+    # the text depends on the crop only, the light lines are dropped by drop_score
+    rec_res = []
+    for crop in img_crop_list:
+        darkness = 1 - float(crop.mean()) / 255
+        rec_res.append((f'{crop.shape[1]}x{crop.shape[0]}', round(darkness, 4)))
+    return rec_res, 0.0
+
+
+@pytest.fixture
+def ocr_model():
+    model = object.__new__(ModifiedPaddleOCR)
+    model.args = SimpleNamespace(det_box_type='quad', save_crop_res=False)
+    model.use_angle_cls = True
+    model.drop_score = 0.3
+    model.page_num = 0
+    model.text_detector = text_detector
+    model.text_classifier = text_classifier
+    model.text_recognizer = text_recognizer
+    return model
+
+
+def make_crop(width, height, lines):
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    for y0, y1, value in lines:
+        img[y0:y1] = value
+    return img
+
+
+def test_batch_ocr_matches_ocr(ocr_model):
+    img_list = [
+        make_crop(120, 60, [(10, 20, 0), (30, 40, 0)]),
+        make_crop(40, 30, []),  # 没有文本行
+        make_crop(300, 80, [(5, 15, 0), (40, 70, 220)]),  # 颜色浅的文本行被drop_score过滤
+        make_crop(50, 20, [(2, 18, 230)]),  # 所有文本行都被过滤
+        make_crop(200, 100, [(10, 30, 0), (50, 60, 30), (80, 95, 0)]),
+    ]
+    mfd_res_list = [None, None, [], None, None]
+    expected = [
+        ocr_model.ocr(img, mfd_res=mfd_res)[0] for img, mfd_res in zip(img_list, mfd_res_list)
+    ]
+    assert expected[1] is None and expected[3] is None
+    assert ocr_model.batch_ocr(img_list, mfd_res_list=mfd_res_list) == expected
+    assert ocr_model.batch_ocr(img_list) == expected
+    assert ocr_model.batch_ocr([]) == []
+
+
+def test_table_ocr_result_matches_table_image_ocr(ocr_model):
+    # the text lines RapidTable got from its own OCR of the table image are now taken from the page OCR of the
+    # padded table crop
+    page = np.full((400, 300, 3), 255, dtype=np.uint8)
+    page[100:112, 70:200] = 0
+    page[130:150, 90:250] = 40
+    page[170:180, 65:120] = 0
+    # the table at (60, 80, 260, 200), cropped as PageImage.crop does without and with a white border of 50
+    table_image = page[80:200, 60:260]
+    before = [[box, text, score] for box, (text, score) in ocr_model.ocr(table_image)[0]]
+
+    padded_image = np.full((220, 300, 3), 255, dtype=np.uint8)
+    padded_image[50:170, 50:250] = table_image[:, :, ::-1]
+    useful_list = [50, 50, 60, 80, 260, 200, 300, 220]
+    after = get_table_ocr_result(ocr_model.batch_ocr([padded_image])[0], useful_list)
+    assert len(after) == 3
+    assert after == before
+
+    assert get_table_ocr_result(None, useful_list) == []
+
+
+def test_rapid_table_uses_the_given_ocr_result():
+    pytest.importorskip('rapid_table')
+    from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import \
+        RapidTableModel
+
+    calls = []
+
+    def table_model(image, ocr_result):
+        calls.append(ocr_result)
+        return '<table></table>', [], 0.0
+
+    model = object.__new__(RapidTableModel)
+    model.table_model = table_model
+    model._ocr_engine = None
+    ocr_result = [[[[0, 0], [10, 0], [10, 5], [0, 5]], 'cell', 0.9]]
+    assert model.predict(np.full((20, 30, 3), 255, dtype=np.uint8), ocr_result)[0] == '<table></table>'
+    assert calls == [ocr_result]
+    # the table's own OCR engine is not loaded
+    assert model._ocr_engine is None
+    # a table without text lines is not recognized
+    assert model.predict(np.full((20, 30, 3), 255, dtype=np.uint8), []) == (None, None, None)
@@ -0,0 +1,25 @@
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.chunking import \
+    chunk_block_lines
+
+
+def test_chunk_block_lines_short_page():
+    block_line_ranges = [([0, 0, 100, 50], 0, 3), ([0, 60, 100, 90], 3, 5)]
+    assert chunk_block_lines(block_line_ranges, 510) == [[0, 1, 2, 3, 4]]
+
+
+def test_chunk_block_lines_long_page():
+    # 两栏, 每栏两个block, xy-cut的顺序为左栏从上到下再右栏从上到下
+    block_line_ranges = [
+        ([0, 0, 40, 40], 0, 4),
+        ([60, 0, 100, 60], 4, 8),
+        ([0, 50, 40, 100], 8, 12),
+        ([60, 70, 100, 100], 12, 16),
+    ]
+    chunks = chunk_block_lines(block_line_ranges, 8)
+    assert chunks == [[0, 1, 2, 3, 8, 9, 10, 11], [4, 5, 6, 7, 12, 13, 14, 15]]
+
+
+def test_chunk_block_lines_long_block():
+    chunks = chunk_block_lines([([0, 0, 100, 100], 0, 7), ([0, 110, 100, 120], 7, 8)], 3)
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert all(len(chunk) <= 3 for chunk in chunks)
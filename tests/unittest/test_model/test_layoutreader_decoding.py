@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.decoding import \
+    decode_orders
+
+
+def parse_logits_loop(logits):
+    # the conflict loop of the former parse_logits
+    orders = np.argsort(logits, axis=1, kind='stable').tolist()
+    ret = [o.pop() for o in orders]
+    while True:
+        order_to_idxes = defaultdict(list)
+        for idx, order in enumerate(ret):
+            order_to_idxes[order].append(idx)
+        order_to_idxes = {k: v for k, v in order_to_idxes.items() if len(v) > 1}
+        if not order_to_idxes:
+            break
+        for order, idxes in order_to_idxes.items():
+            idxes_to_logit = sorted(((idx, logits[idx, order]) for idx in idxes), key=lambda x: x[1], reverse=True)
+            for idx, _ in idxes_to_logit[1:]:
+                ret[idx] = orders[idx].pop()
+    return ret
+
+
+def page_logits(length, noise, seed):
+    # logits of a model which mostly agrees with a shuffled reading order
+    rng = np.random.default_rng(seed)
+    target = rng.permutation(length)
+    logits = rng.normal(0, noise, (length, length)).astype(np.float32)
+    logits[np.arange(length), target] += 1
+    return logits
+
+
+def test_decode_orders_empty():
+    assert decode_orders(np.zeros((0, 0), dtype=np.float32)) == []
+
+
+@pytest.mark.parametrize('length', [1, 2, 7, 50, 200])
+@pytest.mark.parametrize('noise', [0.1, 1.0, 10.0])
+def test_decode_orders_matches_loop(length, noise):
+    for seed in range(3):
+        logits = page_logits(length, noise, seed)
+        orders = decode_orders(logits)
+        assert orders == parse_logits_loop(logits)
+        assert sorted(orders) == list(range(length))
+
+
+def test_decode_orders_all_lines_claim_the_same_orders():
+    # every line prefers order 0, then 1, ...; the line with the highest logits wins each
+    length = 30
+    logits = np.tile(np.linspace(1, 0, length, dtype=np.float32), (length, 1))
+    logits *= np.linspace(1, 2, length, dtype=np.float32)[:, None]
+    orders = decode_orders(logits)
+    assert orders == parse_logits_loop(logits)
+    assert orders == list(range(length))[::-1]
+
+
+def test_decode_orders_ties():
+    # each line claims the highest of its tied orders first, a tied order goes to the lowest line
+    logits = np.ones((4, 4), dtype=np.float32)
+    assert decode_orders(logits) == parse_logits_loop(logits) == [3, 2, 1, 0]
+
+
+@pytest.mark.parametrize('length', [7, 50, 200])
+def test_decode_orders_matches_loop_on_tied_logits(length):
+    # low precision logits, e.g. bf16, have many ties
+    for seed in range(3):
+        logits = np.round(page_logits(length, 1.0, seed), 1)
+        assert decode_orders(logits) == parse_logits_loop(logits)
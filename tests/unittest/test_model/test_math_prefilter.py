@@ -0,0 +1,50 @@
+import fitz
+
+from magic_pdf.model.sub_modules.mfd.math_prefilter import text_layer_math_hint
+
+PROSE = 'It was a bright cold day in April, and the clocks were striking thirteen.'
+
+
+def test_text_layer_math_hint():
+    doc = fitz.open()
+
+    # 纯文本页面
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontname='tiro')
+    assert text_layer_math_hint(page) is False
+
+    # 公式字体
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontname='tiro')
+    page.insert_text((50, 80), 'a+b', fontname='symb')
+    assert text_layer_math_hint(page) is True
+    assert text_layer_math_hint(page, page.get_text('dict', flags=0)) is True
+
+    # 正文字体中用ASCII字符排版的行内公式
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontname='tiro')
+    page.insert_text((50, 80), 'Hence f(x) = a + b for all x.', fontname='tiro')
+    assert text_layer_math_hint(page) is True
+
+    # 希腊语正文不算公式
+    page = doc.new_page()
+    page.insert_font(fontname='greek', fontbuffer=fitz.Font('cjk').buffer)
+    page.insert_text((50, 50), 'Η Αθήνα είναι η πρωτεύουσα και η μεγαλύτερη πόλη της Ελλάδας.', fontname='greek')
+    assert text_layer_math_hint(page) is False
+
+    # Symbol字体的项目符号不算公式
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontname='tiro')
+    page.insert_text((50, 80), chr(0xb7), fontname='symb')
+    assert text_layer_math_hint(page) is False
+
+    # 没有文本层
+    page = doc.new_page()
+    assert text_layer_math_hint(page) is None
+
+    # 扫描页面的文本层不可靠
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontname='tiro')
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 10, 10), False)
+    page.insert_image(page.rect, pixmap=pix)
+    assert text_layer_math_hint(page) is None
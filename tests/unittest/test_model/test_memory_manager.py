@@ -0,0 +1,97 @@
+from magic_pdf.libs.clean_memory import MemoryManager, get_process_rss
+
+GB = 1024 ** 3
+
+
+class FakeMemory:
+    def __init__(self, rss=0, vram=None):
+        self.rss = rss
+        self.vram = vram
+        # 每次回收释放的内存
+        self.freed_rss = 0
+        self.freed_vram = 0
+        self.collections = 0
+
+    def collect(self):
+        self.collections += 1
+        self.rss -= self.freed_rss
+        if self.vram is not None:
+            self.vram = (self.vram[0] - self.freed_vram, self.vram[1])
+
+
+def make_manager(memory, **kwargs):
+    return MemoryManager(
+        rss_reader=lambda: memory.rss,
+        vram_reader=lambda device: memory.vram,
+        collector=memory.collect,
+        **kwargs,
+    )
+
+
+def test_get_process_rss():
+    assert get_process_rss() > 0
+
+
+def test_collect_only_above_rss_high_water():
+    memory = FakeMemory(rss=2 * GB)
+    manager = make_manager(memory, rss_high_water=4 * GB)
+    assert not manager.maybe_collect()
+    memory.rss = 5 * GB
+    memory.freed_rss = 3 * GB
+    assert manager.maybe_collect()
+    assert not manager.maybe_collect()
+    assert memory.collections == 1
+
+    stats = manager.stats()
+    assert stats['checks'] == 3
+    assert stats['collections'] == 1
+    assert stats['reasons']['rss'] == 1
+    assert stats['collect_time'] >= stats['last_collect_time'] >= 0
+
+
+def test_resident_memory_raises_the_mark():
+    # 常驻的模型使内存一直高于阈值, 只有继续增长时才再次回收
+    memory = FakeMemory(rss=5 * GB)
+    manager = make_manager(memory, rss_high_water=4 * GB)
+    assert manager.maybe_collect()
+    assert not manager.maybe_collect()
+    memory.rss = int(5.2 * GB)
+    assert not manager.maybe_collect()
+    memory.rss = 6 * GB
+    assert manager.maybe_collect()
+    assert memory.collections == 2
+
+    # 内存回落到阈值以下后恢复原阈值
+    memory.rss = 3 * GB
+    memory.freed_rss = 2 * GB
+    assert not manager.maybe_collect()
+    memory.rss = int(4.1 * GB)
+    assert manager.maybe_collect()
+    assert memory.collections == 3
+
+
+def test_collect_above_vram_high_water():
+    memory = FakeMemory(vram=(5 * GB, 8 * GB))
+    manager = make_manager(memory, vram_high_water_ratio=0.8, device='cuda')
+    assert not manager.maybe_collect()
+    memory.vram = (7 * GB, 8 * GB)
+    memory.freed_vram = 3 * GB
+    assert manager.maybe_collect()
+    assert manager.stats()['reasons']['vram'] == 1
+
+    # 不检查显存
+    memory.vram = (8 * GB, 8 * GB)
+    assert not make_manager(memory, vram_high_water_ratio=None).maybe_collect()
+
+
+def test_force_and_not_adaptive():
+    memory = FakeMemory(rss=GB)
+    manager = make_manager(memory, rss_high_water=4 * GB)
+    assert manager.maybe_collect(force=True)
+    assert manager.stats()['reasons']['force'] == 1
+
+    manager = make_manager(memory, rss_high_water=4 * GB, adaptive=False)
+    assert manager.maybe_collect()
+    assert manager.maybe_collect()
+    assert manager.stats()['reasons']['always'] == 2
+    assert memory.collections == 3
@@ -0,0 +1,186 @@
+import threading
+import time
+
+import pytest
+
+from magic_pdf.model.model_residency import ModelResidency
+
+
+def loader(name):
+    return lambda: {'name': name}
+
+
+def test_model_residency_get():
+    residency = ModelResidency(sizeof=lambda model: 10)
+    model = residency.get('layout', loader('layout'))
+    assert residency.get('layout', loader('other')) is model
+    assert residency.stats() == {'models': 1, 'nbytes': 10, 'hits': 1, 'loads': 1, 'evictions': 0}
+
+
+def test_model_residency_evict_lru():
+    residency = ModelResidency(max_bytes=25, sizeof=lambda model: 10)
+    residency.get('layout', loader('layout'))
+    residency.get('mfd', loader('mfd'))
+    residency.get('layout', loader('layout'))
+    residency.get('ocr', loader('ocr'))
+    # mfd is the least recently used model
+    assert 'mfd' not in residency
+    assert 'layout' in residency and 'ocr' in residency
+    stats = residency.stats()
+    assert stats['evictions'] == 1 and stats['nbytes'] == 20
+
+
+def test_model_residency_acquire_release():
+    residency = ModelResidency(max_models=1, sizeof=None)
+    residency.acquire('layout', loader('layout'))
+    residency.get('ocr', loader('ocr'))
+    # the acquired model is kept, the just loaded model is kept too until the budget allows it
+    assert 'layout' in residency and 'ocr' in residency
+    residency.get('mfd', loader('mfd'))
+    assert 'ocr' not in residency and len(residency) == 2
+    residency.release('layout')
+    assert 'layout' not in residency and 'mfd' in residency
+    assert residency.stats()['nbytes'] == 0
+
+
+def test_model_residency_load_once():
+    residency = ModelResidency(sizeof=None)
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(residency.get('mfr', slow_loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(model is models[0] for model in models)
+    # the lock of a key is only kept while the key is loaded
+    assert residency._key_locks == {}
+
+
+def test_model_residency_drops_key_locks():
+    residency = ModelResidency(max_models=1, sizeof=None)
+    for lang in ['ch', 'en', 'korean', 'japan', 'ch']:
+        residency.get(('ocr', lang), loader(lang))
+    assert residency.stats()['evictions'] == 4
+    assert residency._key_locks == {}
+
+
+def test_model_residency_measure_rss_loads_alone():
+    residency = ModelResidency(max_bytes=1024 ** 4, sizeof=lambda model: model['nbytes'])
+    lock = threading.Lock()
+    loading = []
+    overlaps = []
+
+    def tracked_loader(name, nbytes):
+        def load():
+            with lock:
+                if loading and (name.startswith('ocr') or any(other.startswith('ocr') for other in loading)):
+                    overlaps.append((name, list(loading)))
+                loading.append(name)
+            time.sleep(0.05)
+            with lock:
+                loading.remove(name)
+            return {'name': name, 'nbytes': nbytes}
+        return load
+
+    threads = [threading.Thread(target=residency.get, args=(f'mfr{i}', tracked_loader(f'mfr{i}', 10))) for i in range(3)]
+    threads += [
+        threading.Thread(target=residency.get, args=(f'ocr{i}', tracked_loader(f'ocr{i}', 0)), kwargs={'measure_rss': True})
+        for i in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
+    assert residency.stats()['loads'] == 5
+
+
+def test_model_residency_measure_rss_without_budget_loads_concurrently():
+    # without max_bytes the models are not measured, the loads are not serialized
+    residency = ModelResidency(sizeof=lambda model: model['nbytes'])
+    barrier = threading.Barrier(2, timeout=5)
+
+    def load():
+        barrier.wait()
+        return {'nbytes': 0}
+
+    threads = [
+        threading.Thread(target=residency.get, args=(('ocr', lang), load), kwargs={'measure_rss': True})
+        for lang in ['ch', 'en']
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not barrier.broken
+    assert residency.stats() == {'models': 2, 'nbytes': 0, 'hits': 0, 'loads': 2, 'evictions': 0}
+
+
+def make_pek_model(monkeypatch, names, deferred=()):
+    # a CustomPEKModel whose atom models are stubs, loaded by the init threads like in __init__
+    from concurrent.futures import ThreadPoolExecutor
+
+    from magic_pdf.model.pdf_extract_kit import CustomPEKModel
+    from magic_pdf.model.sub_modules import model_init
+    from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+    monkeypatch.setattr(model_init, 'atom_model_init', lambda model_name, **kwargs: {'name': model_name})
+    monkeypatch.setattr(AtomModelSingleton, '_residency', ModelResidency(max_models=1, sizeof=None))
+    monkeypatch.setattr(AtomModelSingleton, '_deferred_models', set())
+    AtomModelSingleton().defer_atom_models(*deferred)
+    model = object.__new__(CustomPEKModel)
+    model._pinned_models = {}
+    model._pin_count = 0
+    model._pin_lock = threading.Lock()
+    model._atom_models = {}
+    model._atom_model_kwargs = {}
+    model.model_init_timings = {}
+    model._init_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='model-init')
+    for name in names:
+        model._atom_models[name] = model._init_executor.submit(model._init_atom_model, name, atom_model_name=name)
+    model._init_executor.shutdown(wait=False)
+    return model
+
+
+def test_pek_model_resolves_pinned_models_once(monkeypatch):
+    pytest.importorskip('torch')
+    from magic_pdf.model.model_list import AtomicModel
+    from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+    model = make_pek_model(monkeypatch, [AtomicModel.MFD, AtomicModel.MFR])
+    model.wait_models()
+    residency = AtomModelSingleton().residency
+    with model.in_use():
+        stats = residency.stats()
+        with model.in_use():
+            for _ in range(3):
+                assert model.mfd_model is model._pinned_models[AtomicModel.MFD]
+                assert model.mfr_model is model._pinned_models[AtomicModel.MFR]
+        # the accesses do not go through the residency, the models are not evicted while pinned
+        assert residency.stats() == stats
+        assert len(residency) == 2
+    assert model._pinned_models == {}
+    assert len(residency) == 1
+
+
+def test_pek_model_deferred_models_load_on_first_use(monkeypatch):
+    pytest.importorskip('torch')
+    from magic_pdf.model.model_list import AtomicModel
+    from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+    model = make_pek_model(monkeypatch, [AtomicModel.MFD, AtomicModel.OCR], deferred=[AtomicModel.OCR])
+    assert set(model.wait_models()) == {AtomicModel.MFD}
+    # the init threads have exited, e.g. before a fork
+    assert not any(thread.name.startswith('model-init') for thread in threading.enumerate())
+    residency = AtomModelSingleton().residency
+    assert residency.stats()['loads'] == 1
+    assert model.ocr_model == {'name': AtomicModel.OCR}
+    assert residency.stats()['loads'] == 2
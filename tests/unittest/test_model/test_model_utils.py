@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from magic_pdf.model.sub_modules.model_utils import PageImage
+
+
+def pil_crop(input_res, input_pil_img, crop_paste_x=0, crop_paste_y=0):
+    # the former crop_img
+    crop_xmin, crop_ymin = int(input_res['poly'][0]), int(input_res['poly'][1])
+    crop_xmax, crop_ymax = int(input_res['poly'][4]), int(input_res['poly'][5])
+    crop_new_width = crop_xmax - crop_xmin + crop_paste_x * 2
+    crop_new_height = crop_ymax - crop_ymin + crop_paste_y * 2
+    return_image = Image.new('RGB', (crop_new_width, crop_new_height), 'white')
+    cropped_img = input_pil_img.crop((crop_xmin, crop_ymin, crop_xmax, crop_ymax))
+    return_image.paste(cropped_img, (crop_paste_x, crop_paste_y))
+    return_list = [crop_paste_x, crop_paste_y, crop_xmin, crop_ymin, crop_xmax, crop_ymax, crop_new_width, crop_new_height]
+    return return_image, return_list
+
+
+@pytest.mark.parametrize('poly, crop_paste_x, crop_paste_y', [
+    ([10, 20, 0, 0, 110, 90], 0, 0),  # 页面内
+    ([10, 20, 0, 0, 110, 90], 50, 50),  # 页面内, 白边
+    ([-30, -10, 0, 0, 80, 60], 0, 0),  # 超出页面
+    ([150, 250, 0, 0, 260, 340], 50, 50),  # 超出页面, 白边
+    ([0, 0, 0, 0, 200, 300], 100, 0),  # 整页
+])
+def test_page_image_crop(poly, crop_paste_x, crop_paste_y):
+    image = np.random.default_rng(0).integers(0, 255, (300, 200, 3), dtype=np.uint8)
+    page_image = PageImage(image)
+
+    expected, expected_list = pil_crop({'poly': poly}, Image.fromarray(image), crop_paste_x, crop_paste_y)
+    rgb, rgb_list = page_image.crop({'poly': poly}, crop_paste_x, crop_paste_y)
+    bgr, _ = page_image.crop({'poly': poly}, crop_paste_x, crop_paste_y, mode='bgr')
+
+    assert rgb_list == expected_list
+    assert np.array_equal(rgb, np.asarray(expected))
+    assert np.array_equal(bgr, np.asarray(expected)[:, :, ::-1])
+
+
+def test_page_image_conversions():
+    image = np.random.default_rng(0).integers(0, 255, (30, 20, 3), dtype=np.uint8)
+    page_image = PageImage(image)
+
+    assert page_image.pil is page_image.pil
+    assert page_image.bgr is page_image.bgr
+    assert np.array_equal(page_image.bgr, image[:, :, ::-1])
+    # 页面内且无白边时截图为原图的视图
+    crop, _ = page_image.crop({'poly': [1, 2, 0, 0, 10, 12]})
+    assert np.shares_memory(crop, image)
@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from magic_pdf.model.sub_modules.onnx_backend import (create_session_options,
+                                                      get_onnx_cache_dir)
+
+
+def test_get_onnx_cache_dir(tmp_path):
+    models_dir = os.path.join(str(tmp_path), 'models')
+    assert get_onnx_cache_dir(models_dir + os.sep) == models_dir + '_onnx'
+    assert get_onnx_cache_dir(models_dir, '/data/onnx') == '/data/onnx'
+
+
+def test_create_session_options():
+    ort = pytest.importorskip('onnxruntime')
+    session_options = create_session_options(intra_op_num_threads=4, inter_op_num_threads=2)
+    assert session_options.intra_op_num_threads == 4
+    assert session_options.inter_op_num_threads == 2
+    assert session_options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
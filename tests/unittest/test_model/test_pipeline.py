@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+import pytest
+
+from magic_pdf.model.pipeline import DeadlineRunner, Stage, StagePipeline
+
+
+def test_stage_pipeline():
+    def double(x):
+        return [x * 2]
+
+    def split(x):
+        time.sleep(0.001 * (x % 3))
+        return [x, -x]
+
+    pipeline = StagePipeline([Stage('double', double), Stage('split', split, workers=3)], queue_size=1)
+    outputs = list(pipeline.run(range(20)))
+    assert sorted(outputs) == sorted([2 * x for x in range(20)] + [-2 * x for x in range(20)])
+
+
+def test_stage_pipeline_overlap():
+    # 第二个阶段处理第i项时第一个阶段已经在处理第i + 1项
+    events = []
+    lock = threading.Lock()
+
+    def stage_fn(name):
+        def fn(x):
+            with lock:
+                events.append((name, 'start', x))
+            time.sleep(0.02)
+            with lock:
+                events.append((name, 'end', x))
+            return [x]
+        return fn
+
+    pipeline = StagePipeline([Stage('a', stage_fn('a')), Stage('b', stage_fn('b'))])
+    assert list(pipeline.run(range(3))) == [0, 1, 2]
+    assert events.index(('a', 'start', 1)) < events.index(('b', 'end', 0))
+
+
+def test_stage_pipeline_error():
+    def fail(x):
+        if x == 5:
+            raise ValueError('stage failed')
+        return [x]
+
+    def items():
+        yield from range(1000)
+
+    pipeline = StagePipeline([Stage('fail', fail), Stage('identity', lambda x: [x])])
+    with pytest.raises(ValueError, match='stage failed'):
+        list(pipeline.run(items()))
+
+
+def add(x, y):
+    return x + y
+
+
+def fail():
+    raise ValueError('call failed')
+
+
+def hang():
+    time.sleep(600)
+
+
+# set in the worker process by the initializer
+_worker_value = None
+
+
+def init_worker(value):
+    global _worker_value
+    _worker_value = value
+
+
+def worker_state():
+    return os.getpid(), _worker_value
+
+
+def test_deadline_runner():
+    # fork is enough for the functions of the test, the models are run with spawn
+    runner = DeadlineRunner('test', initializer=init_worker, initargs=('ready',), start_method='fork')
+    try:
+        assert runner.run(add, 1, y=2, timeout=5) == 3
+        with pytest.raises(ValueError, match='call failed'):
+            runner.run(fail, timeout=5)
+        pid, value = runner.run(worker_state, timeout=5)
+        assert pid != os.getpid()
+        assert value == 'ready'
+
+        # 超时的调用连同子进程被终止, 之后的调用不会排在它后面
+        start = time.time()
+        with pytest.raises(TimeoutError):
+            runner.run(hang, timeout=0.2)
+        assert runner.run(add, 1, 2, timeout=5) == 3
+        assert time.time() - start < 5
+        new_pid, value = runner.run(worker_state, timeout=5)
+        assert new_pid != pid
+        assert value == 'ready'
+    finally:
+        runner.close()
+
+
+def test_deadline_runner_initializer_fails():
+    runner = DeadlineRunner('test', initializer=fail, start_method='fork')
+    with pytest.raises(ValueError, match='call failed'):
+        runner.run(add, 1, 2, timeout=5)
+
+
+def test_table_page_keeps_failed_tables_as_images():
+    pytest.importorskip('torch')
+    import numpy as np
+
+    from magic_pdf.model.pdf_extract_kit import CustomPEKModel
+    from magic_pdf.model.sub_modules.model_utils import PageImage
+
+    class FailingRunner:
+        def __init__(self, errors):
+            self.errors = list(errors)
+
+        def run(self, fn, *args, timeout=None):
+            error = self.errors.pop(0)
+            if error is None:
+                return '<table></table>'
+            raise error
+
+    model = object.__new__(CustomPEKModel)
+    model.apply_table = True
+    model.table_max_time = 1
+    model._table_runner = FailingRunner([TimeoutError(), RuntimeError('worker exited'), ValueError('bad table'), None])
+    page_image = PageImage(np.zeros((100, 100, 3), dtype=np.uint8))
+    layout_res = [{'category_id': 5, 'poly': [0, 0, 50, 0, 50, 50, 0, 50]} for _ in range(4)]
+    model.table_page(page_image, layout_res)
+    assert layout_res[0]['timeout'] is True
+    assert all('html' not in res for res in layout_res[:3])
+    assert layout_res[3]['html'] == '<table></table>'
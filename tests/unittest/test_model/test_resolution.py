@@ -0,0 +1,76 @@
+import fitz
+import numpy as np
+
+from magic_pdf.model.sub_modules.resolution import (estimate_font_size,
+                                                    get_tiles,
+                                                    merge_tiled_detections,
+                                                    nms, plan_page_resolution)
+
+PROSE = 'It was a bright cold day in April, and the clocks were striking thirteen.'
+
+
+def test_estimate_font_size():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 50), PROSE, fontsize=9)
+    page.insert_text((50, 100), 'Title', fontsize=30)
+    assert estimate_font_size(page) == 9
+    # the text layer extracted for the formula prefilter is reused
+    assert estimate_font_size(page, page.get_text('dict', flags=0)) == 9
+
+    page = doc.new_page()
+    assert estimate_font_size(page) is None
+
+
+def test_plan_page_resolution():
+    # A4, 10pt正文, 与默认配置相同
+    plan = plan_page_resolution(595, 842, 10, {}, dpi=200, max_side=4500)
+    assert plan['dpi'] == 200 and plan['max_side'] == 4500
+    assert plan['layout_imgsz'] == 1024 and plan['mfd_imgsz'] == 1888
+    assert plan['layout_tile'] is None and plan['mfd_tile'] is None
+
+    # 幻灯片, 大字号的页面使用更低的dpi和更小的输入尺寸
+    plan = plan_page_resolution(720, 405, 24, {}, dpi=200)
+    assert plan['dpi'] == 120
+    assert plan['layout_imgsz'] < 1024 and plan['mfd_imgsz'] < 1888
+
+    # A0海报, 10pt正文, 分块检测且不缩小到max_side
+    plan = plan_page_resolution(2384, 3370, 10, {}, dpi=200, max_side=4500)
+    assert plan['layout_tile'] is not None and plan['mfd_tile'] is not None
+    assert plan['layout_imgsz'] == 1024 and plan['max_side'] == 12000
+
+    # 关闭分块时只放大输入尺寸
+    plan = plan_page_resolution(2384, 3370, 10, {'tile': False}, dpi=200, max_side=4500)
+    assert plan['layout_tile'] is None and plan['layout_imgsz'] == 1536
+    assert plan['max_side'] == 4500
+
+
+def test_get_tiles():
+    tiles = get_tiles(1000, 500, 400, overlap=0.25)
+    assert tiles[0] == (0, 0, 400, 400)
+    assert max(x1 for _, _, x1, _ in tiles) == 1000
+    assert max(y1 for _, _, _, y1 in tiles) == 500
+    covered = np.zeros((500, 1000), dtype=bool)
+    for x0, y0, x1, y1 in tiles:
+        covered[y0:y1, x0:x1] = True
+    assert covered.all()
+    assert get_tiles(300, 200, 400) == [(0, 0, 300, 200)]
+
+
+def test_nms():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.5, 0.9, 0.8], dtype=np.float32)
+    assert nms(boxes, scores).tolist() == [1, 2]
+
+
+def test_merge_tiled_detections():
+    tiles = [(0, 0, 60, 100), (40, 0, 100, 100)]
+    page_dets = (np.array([[5, 5, 95, 20]], dtype=np.float32), np.array([0.9]), np.array([1]))
+    tile_dets_list = [
+        # 被内部边界截断的框和两个分块重叠区域中的框
+        (np.array([[30, 50, 59, 60], [45, 80, 55, 90]], dtype=np.float32), np.array([0.8, 0.7]), np.array([0, 0])),
+        (np.array([[5, 80, 15, 90], [20, 30, 30, 40]], dtype=np.float32), np.array([0.6, 0.7]), np.array([0, 0])),
+    ]
+    xyxy, conf, cls = merge_tiled_detections(page_dets, tile_dets_list, tiles, 100, 100)
+    assert sorted(map(tuple, xyxy.tolist())) == [(5, 5, 95, 20), (45, 80, 55, 90), (60, 30, 70, 40)]
+    assert len(conf) == len(cls) == 3
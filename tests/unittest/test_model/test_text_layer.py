@@ -0,0 +1,37 @@
+import fitz
+import numpy as np
+
+from magic_pdf.model.sub_modules.ocr.text_layer import (
+    crop_text_layer_boxes, get_text_layer_lines)
+
+
+def test_text_layer_boxes():
+    doc = fitz.open()
+    page = doc.new_page(width=300, height=400)
+    page.insert_text((50, 50), 'Hello world', fontname='tiro', fontsize=20)
+    page.insert_text((50, 200), 'Second line', fontname='tiro', fontsize=20)
+
+    text_lines = get_text_layer_lines(page, fitz.Matrix(2, 2))
+    assert len(text_lines) == 2
+    line_rect = fitz.Rect(page.get_text('dict')['blocks'][0]['lines'][0]['bbox']) * fitz.Matrix(2, 2)
+    assert abs(text_lines[0][:, 0].min() - line_rect.x0) < 1
+    assert abs(text_lines[0][:, 2].max() - line_rect.x1) < 1
+
+    # 区域只包含第一行, 坐标相对于带白边的区域图片
+    paste_x, paste_y, xmin, ymin = 50, 50, 80, 40
+    useful_list = [paste_x, paste_y, xmin, ymin, 500, 150, 420, 110]
+    text_boxes = crop_text_layer_boxes(text_lines, useful_list)
+    assert len(text_boxes) == 1
+    x0, y0 = text_boxes[0][0]
+    x1, y1 = text_boxes[0][2]
+    assert np.isclose(x0, max(text_lines[0][:, 0].min(), xmin) - xmin + paste_x)
+    assert np.isclose(y1, text_lines[0][:, 3].max() - ymin + paste_y)
+    assert x0 < x1 and y0 < y1
+
+    # 没有文字的区域
+    assert crop_text_layer_boxes(text_lines, [50, 50, 0, 600, 600, 790, 600, 190]) == []
+
+    # 没有文本层和旋转的页面
+    page.set_rotation(90)
+    assert get_text_layer_lines(page, fitz.Matrix(2, 2)) is None
+    assert get_text_layer_lines(doc.new_page(), fitz.Matrix(2, 2)) is None
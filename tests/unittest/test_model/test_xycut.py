@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import (
+    projection_by_bboxes, recursive_xy_cut, split_projection_profile, xy_cut)
+
+
+def projection_loop(boxes, axis):
+    res = np.zeros(np.max(boxes[:, axis::2]), dtype=int)
+    for start, end in boxes[:, axis::2]:
+        res[start:end] += 1
+    return res
+
+
+def recursive_xy_cut_reference(boxes, indices, res):
+    # the former recursive implementation, with stable sorts
+    _indices = boxes[:, 1].argsort(kind='stable')
+    y_sorted_boxes = boxes[_indices]
+    y_sorted_indices = indices[_indices]
+    pos_y = split_projection_profile(projection_loop(y_sorted_boxes, 1), 0, 1)
+    if not pos_y:
+        return
+    for r0, r1 in zip(*pos_y):
+        _indices = (r0 <= y_sorted_boxes[:, 1]) & (y_sorted_boxes[:, 1] < r1)
+        chunk_boxes = y_sorted_boxes[_indices]
+        chunk_indices = y_sorted_indices[_indices]
+        _indices = chunk_boxes[:, 0].argsort(kind='stable')
+        x_sorted_boxes = chunk_boxes[_indices]
+        x_sorted_indices = chunk_indices[_indices]
+        pos_x = split_projection_profile(projection_loop(x_sorted_boxes, 0), 0, 1)
+        if not pos_x:
+            continue
+        if len(pos_x[0]) == 1:
+            res.extend(x_sorted_indices.tolist())
+            continue
+        for c0, c1 in zip(*pos_x):
+            _indices = (c0 <= x_sorted_boxes[:, 0]) & (x_sorted_boxes[:, 0] < c1)
+            recursive_xy_cut_reference(x_sorted_boxes[_indices], x_sorted_indices[_indices], res)
+
+
+def random_boxes(num, seed):
+    rng = np.random.default_rng(seed)
+    x0 = rng.integers(0, 500, num)
+    y0 = rng.integers(0, 800, num)
+    return np.stack([x0, y0, x0 + rng.integers(1, 150, num), y0 + rng.integers(1, 40, num)], axis=1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_projection_by_bboxes(seed):
+    boxes = random_boxes(50, seed)
+    for axis in [0, 1]:
+        np.testing.assert_array_equal(projection_by_bboxes(boxes, axis), projection_loop(boxes, axis))
+
+
+@pytest.mark.parametrize('num', [1, 10, 100, 400])
+def test_xy_cut_matches_recursive(num):
+    for seed in range(5):
+        boxes = random_boxes(num, seed)
+        expected = []
+        recursive_xy_cut_reference(boxes, np.arange(num), expected)
+        assert xy_cut(boxes) == expected
+
+
+def test_xy_cut_columns():
+    boxes = np.array([
+        [300, 250, 500, 340],  # 右栏第二段
+        [50, 10, 500, 40],  # 标题
+        [50, 200, 250, 340],  # 左栏第二段
+        [300, 100, 500, 250],  # 右栏第一段
+        [50, 100, 250, 200],  # 左栏第一段
+    ])
+    assert xy_cut(boxes) == [1, 4, 2, 3, 0]
+    res = []
+    recursive_xy_cut(boxes, np.arange(10, 15), res)
+    assert res == [11, 14, 12, 13, 10]
+
+
+def test_xy_cut_is_deterministic_and_keeps_all_boxes():
+    boxes = random_boxes(200, 0)
+    # 重复的box, 没有面积的box和负坐标
+    boxes = np.concatenate([boxes, boxes[:5], [[10, 10, 10, 10], [20, 900, 60, 900], [-30, -20, 40, 5]]])
+    order = xy_cut(boxes)
+    assert sorted(order) == list(range(len(boxes)))
+    assert xy_cut(boxes) == order
+    assert xy_cut(boxes.astype(float) + 0.25) == order
+
+
+def test_xy_cut_empty():
+    assert xy_cut(np.zeros((0, 4))) == []
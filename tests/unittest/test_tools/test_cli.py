@@ -124,3 +124,39 @@ def test_cli_path():
 
     # teardown
     shutil.rmtree(temp_output_dir)
+
+
+def test_cli_parses_without_subcommand(monkeypatch, tmp_path):
+    import magic_pdf.tools.cli as cli_module
+
+    calls = []
+    monkeypatch.setattr(cli_module, 'do_parse', lambda output_dir, pdf_file_name, *args, **kwargs: calls.append(pdf_file_name))
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ['-p', 'tests/unittest/test_tools/assets/cli/pdf/cli_test_01.pdf', '-o', str(tmp_path), '-m', 'txt'],
+    )
+    assert result.exit_code == 0, result.output
+    assert calls == ['cli_test_01']
+
+
+def test_cli_requires_path_and_output_dir(tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(cli, ['-o', str(tmp_path)])
+    assert result.exit_code == 2
+    assert "Missing option '-p' / '--path'" in result.output
+
+    result = runner.invoke(cli, ['-p', 'tests/unittest/test_tools/assets/cli/pdf/cli_test_01.pdf'])
+    assert result.exit_code == 2
+    assert "'-o' / '--output-dir'" in result.output
+
+
+def test_cli_serve_refuses_onnx(monkeypatch):
+    from magic_pdf.libs import config_reader
+
+    monkeypatch.setattr(config_reader, 'get_device', lambda: 'cpu')
+    monkeypatch.setattr(config_reader, 'get_onnx_config', lambda: {'enable': True})
+    runner = CliRunner()
+    result = runner.invoke(cli, ['serve', '--port', '0'])
+    assert result.exit_code == 2
+    assert 'onnx-config' in result.output
@@ -4,7 +4,8 @@ import tempfile
 
 import pytest
 
-from magic_pdf.tools.common import do_parse
+from magic_pdf.tools.common import (convert_pdf_bytes_to_bytes_by_pymupdf,
+                                    do_parse)
 
 
 @pytest.mark.parametrize('method', ['auto', 'txt', 'ocr'])
@@ -57,3 +58,24 @@ def test_common_do_parse(method):
 
     # teardown
     shutil.rmtree(temp_output_dir)
+
+
+def test_convert_pdf_bytes_repairs_the_whole_document():
+    import fitz
+
+    with fitz.open() as doc:
+        for i in range(3):
+            doc.new_page().insert_text((50, 50), f'page {i}')
+        pdf_bytes = doc.tobytes()
+    # break the xref offset, the pdf is repaired when it is opened
+    start = pdf_bytes.rindex(b'startxref') + len(b'startxref')
+    broken = pdf_bytes[:start] + b'\n1\n%%EOF\n'
+    with fitz.open('pdf', broken) as doc:
+        assert doc.is_repaired
+
+    # the whole document is still serialized again, the output opens without a repair
+    output = convert_pdf_bytes_to_bytes_by_pymupdf(memoryview(broken))
+    assert output != broken
+    with fitz.open('pdf', output) as doc:
+        assert not doc.is_repaired
+        assert [page.get_text().strip() for page in doc] == ['page 0', 'page 1', 'page 2']
@@ -0,0 +1,108 @@
+import base64
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import types
+import urllib.request
+
+import pytest
+
+from magic_pdf.tools.server import (PreforkServer, get_child_pids,
+                                    get_memory_usage, get_workers_memory_usage)
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc')
+
+
+def test_get_memory_usage():
+    usage = get_memory_usage(os.getpid())
+    assert usage['rss'] > 0
+    assert 0 < usage['uss'] <= usage['rss']
+    assert usage['uss'] + usage['shared'] == usage['rss']
+
+
+def test_forked_worker_shares_memory():
+    # 64MB touched by the parent are shared with the forked child until written
+    data = bytearray(os.urandom(64 * 1024 * 1024))
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(write_fd)
+        os.read(read_fd, 1)
+        os._exit(0 if data[0] == data[0] else 1)
+    os.close(read_fd)
+    try:
+        assert pid in get_child_pids(os.getpid())
+        usage = get_workers_memory_usage(os.getpid())
+        worker_usage = usage['workers'][pid]
+        assert worker_usage['shared'] >= len(data)
+        assert worker_usage['uss'] < len(data)
+    finally:
+        os.write(write_fd, b'x')
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request_json(url, data=None, retries=50):
+    for _ in range(retries):
+        try:
+            request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return json.loads(response.read())
+        except ConnectionError:
+            time.sleep(0.1)
+        except urllib.error.URLError as e:
+            if not isinstance(e.reason, ConnectionError):
+                raise
+            time.sleep(0.1)
+    raise TimeoutError(url)
+
+
+def test_prefork_server_parses_with_preloaded_model(monkeypatch, tmp_path):
+    import fitz
+
+    # the stub model is loaded by the parent before the workers are forked
+    model = {'loaded_by': os.getpid(), 'weights': bytearray(b'w' * 1024)}
+
+    def do_parse(output_dir, pdf_file_name, pdf_bytes, model_list, **kwargs):
+        with fitz.open(stream=pdf_bytes) as doc:
+            pages = doc.page_count
+        with open(os.path.join(output_dir, pdf_file_name), 'w') as f:
+            json.dump({'loaded_by': model['loaded_by'], 'parsed_by': os.getpid(), 'pages': pages}, f)
+
+    # the handler imports do_parse on each request
+    common = types.ModuleType('magic_pdf.tools.common')
+    common.do_parse = do_parse
+    monkeypatch.setitem(sys.modules, 'magic_pdf.tools.common', common)
+    port = get_free_port()
+    server_pid = os.fork()
+    if server_pid == 0:
+        try:
+            PreforkServer(port=port, workers=2, output_dir=str(tmp_path)).serve()
+        finally:
+            os._exit(0)
+
+    try:
+        with fitz.open() as doc:
+            doc.new_page()
+            pdf_bytes = doc.tobytes()
+        data = json.dumps({'file': base64.b64encode(pdf_bytes).decode('ascii')}).encode('utf-8')
+        worker_pid = request_json(f'http://127.0.0.1:{port}/health')['pid']
+        assert worker_pid in get_child_pids(server_pid)
+        output = request_json(f'http://127.0.0.1:{port}/parse', data=data)
+        with open(tmp_path / output['output_dir'], 'r') as f:
+            result = json.load(f)
+        assert result['loaded_by'] == os.getpid()
+        assert result['parsed_by'] in get_child_pids(server_pid)
+        assert result['pages'] == 1
+    finally:
+        os.kill(server_pid, signal.SIGTERM)
+        os.waitpid(server_pid, 0)
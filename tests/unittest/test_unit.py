@@ -1,5 +1,6 @@
 import os
 
+import fitz
 import pytest
 
 from magic_pdf.libs.boxbase import (__is_overlaps_y_exceeds_threshold,
@@ -21,6 +22,7 @@ from magic_pdf.libs.boxbase import (__is_overlaps_y_exceeds_threshold,
 from magic_pdf.libs.commons import get_top_percent_list, join_path, mymax
 from magic_pdf.libs.config_reader import get_s3_config
 from magic_pdf.libs.path_utils import parse_s3path
+from magic_pdf.libs.pdf_image_tools import PageCropper
 
 
 # 输入一个列表，如果列表空返回0，否则返回最大元素
@@ -540,3 +542,16 @@ def convert_string_to_list(s):
     items = cleaned_s.split(',')
     cleaned_items = [item.strip() for item in items]
     return cleaned_items
+
+
+# 整页截图和按区域渲染的截图尺寸一致
+@pytest.mark.parametrize('bbox', [
+    (100, 100, 300, 250),
+    (-20, -20, 50, 50),  # 超出页面
+    (500, 700, 700, 900),  # 超出页面
+])
+def test_page_cropper(bbox: tuple) -> None:
+    page = fitz.open('tests/unittest/test_data/assets/pdfs/test_01.pdf')[0]
+    pix = page.get_pixmap(clip=fitz.Rect(*bbox), matrix=fitz.Matrix(3, 3))
+    assert PageCropper(page).crop(bbox).shape == (pix.height, pix.width, 3)
+    assert PageCropper(page, max_page_bytes=0).crop(bbox).shape == (pix.height, pix.width, 3)